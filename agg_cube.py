@@ -0,0 +1,106 @@
+"""
+Pre-aggregated count cube for the dashboard charts
+Built once per loaded dataset: one cell per distinct combination of the chart
+dimensions (and deadline day) with its row count. Chart counts for a filter
+state are roll-ups over the cells, so they do not depend on the number of rows.
+"""
+
+import numpy as np
+import pandas as pd
+
+# Dimensions the dashboard charts count over
+CUBE_DIMENSIONS = ['country', 'region', 'opportunity_type', 'career_stage',
+                   'field_of_study', 'acceptance_rate_category']
+
+DEADLINE_DIMENSION = 'deadline_day'
+
+UPCOMING_YEAR = 2026
+
+# Deadline filters the cube can answer from the deadline day alone
+DEADLINE_FILTERS = ["Upcoming (2026)", "Past deadlines", "No deadline info"]
+
+
+class AggregationCube:
+    """Cells (dimension codes) and their counts, with the value behind every code"""
+
+    def __init__(self, df, dimensions=CUBE_DIMENSIONS, deadline_col=None):
+        self.dimensions = [col for col in dimensions if col in df.columns]
+        self.values = {}
+        codes = {}
+        for col in self.dimensions:
+            codes[col], self.values[col] = self._factorize(df[col])
+
+        self.has_deadline = deadline_col is not None and deadline_col in df.columns
+        if self.has_deadline:
+            days = df[deadline_col].dt.normalize()
+            codes[DEADLINE_DIMENSION], self.values[DEADLINE_DIMENSION] = self._factorize(days)
+
+        # Missing values get their own code (-1) so every row lands in a cell
+        cells = pd.DataFrame(codes).groupby(list(codes), sort=False).size()
+        self.codes = {name: cells.index.get_level_values(name).to_numpy() for name in codes}
+        self.counts = cells.to_numpy()
+        self.rows = int(self.counts.sum())
+
+    @staticmethod
+    def _factorize(values):
+        codes, uniques = pd.factorize(values, sort=True, use_na_sentinel=True)
+        return codes.astype(np.int32), pd.Index(uniques)
+
+    def supports(self, state):
+        """Whether a filter state only touches cube dimensions (numeric ranges need the rows)"""
+        for name in state:
+            if name == 'deadline':
+                label = state[name][0] if isinstance(state[name], tuple) else state[name]
+                if not self.has_deadline or label not in DEADLINE_FILTERS:
+                    return False
+            elif name not in self.dimensions:
+                return False
+        return True
+
+    def cell_mask(self, state):
+        mask = np.ones(len(self.counts), dtype=bool)
+        for name, value in state.items():
+            if name == 'deadline':
+                mask &= self._deadline_mask(value)
+                continue
+            position = self.values[name].get_indexer([value])[0]
+            # A value not in the data matches nothing (code -1 is "missing")
+            mask &= (self.codes[name] == position) & (position >= 0)
+        return mask
+
+    def _deadline_mask(self, value):
+        codes = self.codes[DEADLINE_DIMENSION]
+        if value == "No deadline info":
+            return codes < 0
+        label, today = value
+        days = self.values[DEADLINE_DIMENSION]
+        today = pd.Timestamp(today)
+        # Filters compare parsed deadlines with the current time, so a
+        # deadline today (midnight) is already past
+        if label == "Past deadlines":
+            wanted = days <= today
+        else:
+            wanted = (days > today) & (days.year == UPCOMING_YEAR)
+        return (codes >= 0) & np.append(np.asarray(wanted), False)[codes]
+
+    def value_counts(self, dimension, state):
+        """Like df[dimension].value_counts() over the filtered rows: non-zero counts, largest first"""
+        mask = self.cell_mask(state)
+        codes = self.codes[dimension][mask]
+        present = codes >= 0
+        totals = np.bincount(codes[present], weights=self.counts[mask][present],
+                             minlength=len(self.values[dimension])).astype(np.int64)
+        counts = pd.Series(totals, index=self.values[dimension], name='count')
+        counts.index.name = dimension
+        counts = counts[counts > 0]
+        return counts.iloc[np.argsort(-counts.to_numpy(), kind='stable')]
+
+    def deadline_months(self, state):
+        """Deadline counts per (Year, Month) over the filtered rows"""
+        mask = self.cell_mask(state)
+        codes = self.codes[DEADLINE_DIMENSION][mask]
+        present = codes >= 0
+        days = self.values[DEADLINE_DIMENSION][codes[present]]
+        counts = pd.DataFrame({'Year': days.year, 'Month': days.month,
+                               'Count': self.counts[mask][present]})
+        return counts.groupby(['Year', 'Month'], as_index=False)['Count'].sum()
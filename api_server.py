@@ -0,0 +1,393 @@
+"""
+Local JSON query API over the research opportunities
+Serves the dataset the dashboard shows, for other tools, from one loaded
+copy: the same loader, indexes and filters (dashboard_data.py), the same
+hot reload when merge_batches.py publishes a new version (dataset_watch.py).
+
+    GET /health                          dataset version and row count
+    GET /filters                         filter choices and numeric ranges
+    GET /opportunities?<filters>&q=...   filtered (and searched) rows, paginated
+    GET /opportunities/<opportunity_id>  one record, every loaded column
+    GET /opportunities/<id>/similar      the most similar programs
+    GET /aggregate?by=<column>&<filters> counts per value (with value=<numeric
+                                         column>: count, mean and median)
+
+Filters: country, region, field_of_study, career_stage, opportunity_type,
+nationality (+ include_unclear=0/1), deadline (a dashboard deadline choice),
+duration_min/duration_max (months), funding_min/funding_max; q is a full-text
+search (best matches first, at most text_search.MAX_RESULTS). Lists take
+limit and the next_cursor of the previous page as cursor.
+
+Responses are cached in process per dataset version, day and query (with
+their gzip encoding), carry an ETag and answer If-None-Match with 304.
+Each request is handled in its own thread; the data is only read.
+
+    python api_server.py [merged file] --port 8502
+    curl 'http://127.0.0.1:8502/opportunities?country=Canada&limit=5'
+"""
+
+import argparse
+import base64
+import binascii
+import gzip
+import hashlib
+import json
+import threading
+from collections import namedtuple
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+import numpy as np
+import pandas as pd
+
+import dashboard_data
+import dataset_watch
+import result_cache
+
+DATASET_PATH = r'D:\D1\WTF\Hakathon\Data Batches\research_opportunities_complete.csv'
+
+DEFAULT_PORT = 8502
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+
+# Cached encoded responses and filtered row sets
+RESPONSE_CACHE_ENTRIES = 1024
+ROWS_CACHE_ENTRIES = 256
+
+# Bodies smaller than this are sent uncompressed
+GZIP_MIN_BYTES = 1024
+
+# Columns of list results (when present); `fields=a,b` picks others
+LIST_COLUMNS = [
+    'opportunity_id', 'program_name', 'opportunity_name', 'institution', 'country', 'region',
+    'opportunity_type', 'career_stage', 'field_of_study', 'duration_numeric',
+    'funding_amount_min', 'funding_amount_max', 'funding_amount_avg', 'deadline_next', 'deadline_rolling',
+    'application_url',
+]
+
+# Query parameters that are filters, besides the categorical columns
+RANGE_PARAMETERS = {'duration': ('duration_min', 'duration_max'), 'funding': ('funding_min', 'funding_max')}
+
+Response = namedtuple('Response', ['status', 'body', 'gzipped', 'etag'])
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def encode(status, payload):
+    """A Response for a JSON payload (a dict, or a str already holding JSON)"""
+    body = (payload if isinstance(payload, str) else json.dumps(payload, default=str)).encode('utf-8')
+    etag = '"' + hashlib.sha1(body).hexdigest()[:20] + '"'
+    gzipped = gzip.compress(body, compresslevel=6) if len(body) >= GZIP_MIN_BYTES else None
+    return Response(status, body, gzipped, etag)
+
+
+def records_json(frame):
+    """Rows as a JSON array (NaN as null, dates in ISO format)"""
+    return frame.to_json(orient='records', date_format='iso', default_handler=str)
+
+
+def with_data(meta, data_json):
+    """`meta` with a "data" member spliced in from already encoded JSON"""
+    return json.dumps(meta, default=str)[:-1] + ', "data": ' + data_json + '}'
+
+
+def number(params, name):
+    value = params.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        raise ApiError(400, f"{name} must be a number")
+
+
+def flag(params, name, default):
+    value = params.get(name)
+    return default if value is None else value.lower() in ('1', 'true', 'yes')
+
+
+class OpportunityApi:
+    """Request handling independent of HTTP: (path, params) -> Response, per loaded dataset version"""
+
+    def __init__(self, dataset_path, interval=dataset_watch.POLL_INTERVAL):
+        self.responses = result_cache.LRUCache(RESPONSE_CACHE_ENTRIES)
+        self.row_sets = result_cache.LRUCache(ROWS_CACHE_ENTRIES)
+
+        # A new dataset version never serves cached results of the previous one
+        def drop_caches(old, new):
+            self.responses.clear()
+            self.row_sets.clear()
+        self.watcher = dataset_watch.DatasetWatcher(dataset_path, dashboard_data.load_dataset_version,
+                                                    interval=interval, on_swap=drop_caches,
+                                                    expired=dashboard_data.expired)
+
+    def start(self):
+        self.watcher.start()
+        return self
+
+    def respond(self, path, params):
+        """The (cached) response to one GET"""
+        dataset = self.watcher.current()
+        if dataset is None or dataset.error is not None:
+            return encode(503, {'error': f"Dataset not available: {dataset.error if dataset else 'loading'}"})
+        # Deadline windows move with the day
+        key = (dataset.version, date.today().isoformat(), path, tuple(sorted(params.items())))
+        return self.responses.get_or_compute(key, lambda: self._respond(dataset, path, params))
+
+    def _respond(self, dataset, path, params):
+        parts = [unquote(part) for part in path.strip('/').split('/')] if path.strip('/') else []
+        try:
+            if parts in ([], ['health']):
+                payload = self.health(dataset)
+            elif parts == ['filters']:
+                payload = self.filters(dataset)
+            elif parts == ['opportunities']:
+                payload = self.opportunities(dataset, params)
+            elif len(parts) == 2 and parts[0] == 'opportunities':
+                payload = self.opportunity(dataset, parts[1])
+            elif len(parts) == 3 and parts[0] == 'opportunities' and parts[2] == 'similar':
+                payload = self.similar(dataset, parts[1], params)
+            elif parts == ['aggregate']:
+                payload = self.aggregate(dataset, params)
+            else:
+                raise ApiError(404, f"Unknown endpoint: {path}")
+        except ApiError as error:
+            return encode(error.status, {'error': str(error)})
+        return encode(200, payload)
+
+    # -- filtering
+
+    def select(self, dataset, params):
+        """
+        Row positions for the filter and search parameters (search results
+        best first), their cache key and the filter state
+        """
+        version = dataset.value
+        index = version['filter_index']
+        filters = {col: params[col] for col in dashboard_data.FILTER_CATEGORICAL_COLUMNS if params.get(col)}
+        for name, (low_name, high_name) in RANGE_PARAMETERS.items():
+            low, high = number(params, low_name), number(params, high_name)
+            if low is not None or high is not None:
+                filters[name] = (low, high)
+        if params.get('nationality'):
+            if version['eligibility_index'] is None:
+                raise ApiError(400, "This dataset has no nationality eligibility to filter on")
+            filters['nationality'] = (params['nationality'], flag(params, 'include_unclear', True))
+        if params.get('deadline'):
+            if params['deadline'] not in dashboard_data.DEADLINE_FILTERS:
+                raise ApiError(400, f"deadline must be one of {dashboard_data.DEADLINE_FILTERS}")
+            filters['deadline'] = params['deadline']
+
+        try:
+            selected, state = dashboard_data.select(version, filters)
+        except KeyError as error:
+            raise ApiError(400, f"Unknown value: {error}")
+        query = params.get('q', '').strip()
+        filter_key = result_cache.canonical_key({**state, 'q': query or None, 'dataset_version': dataset.version})
+
+        def compute():
+            if not query:
+                return index.rows(selected)
+            search_index = version['search_index']
+            if search_index is None:
+                raise ApiError(400, "No search index for this dataset (run merge_batches.py)")
+            return search_index.search(query, allowed=index.mask(selected))
+        return self.row_sets.get_or_compute(filter_key, compute), filter_key, state
+
+    # -- endpoints
+
+    def health(self, dataset):
+        return {'status': 'ok', 'dataset_version': dataset.version, 'rows': len(dataset.value['df']),
+                'loaded_at': dataset.loaded_at}
+
+    def filters(self, dataset):
+        version = dataset.value
+        index = version['filter_index']
+        payload = {col: index.values(col) for col in dashboard_data.FILTER_CATEGORICAL_COLUMNS if index.has(col)}
+        payload['deadline'] = dashboard_data.DEADLINE_FILTERS
+        if version['eligibility_index'] is not None:
+            payload['nationality'] = version['eligibility_index'].countries
+        for name, col in [('duration', 'duration_numeric'), ('funding', dashboard_data.funding_column(index))]:
+            bounds = index.bounds(col) if col and index.has(col) else None
+            if bounds:
+                payload[name] = [float(bounds[0]), float(bounds[1])]
+        return payload
+
+    def opportunities(self, dataset, params):
+        df = dataset.value['df']
+        rows, filter_key, _ = self.select(dataset, params)
+        try:
+            limit = min(max(int(params.get('limit', DEFAULT_LIMIT)), 1), MAX_LIMIT)
+        except ValueError:
+            raise ApiError(400, "limit must be an integer")
+
+        # Cursors are offsets into the cached row list, bound to the dataset
+        # version and the query they were issued for
+        query_digest = hashlib.sha1(repr(filter_key).encode()).hexdigest()[:12]
+        offset = 0
+        if params.get('cursor'):
+            try:
+                cursor = json.loads(base64.urlsafe_b64decode(params['cursor'].encode()))
+                offset, digest = int(cursor['offset']), cursor['query']
+            except (ValueError, KeyError, TypeError, binascii.Error):
+                raise ApiError(400, "Invalid cursor")
+            if digest != query_digest:
+                raise ApiError(410, "Cursor belongs to another query or dataset version")
+            if not 0 <= offset <= len(rows):
+                raise ApiError(400, "Invalid cursor")
+        page = rows[offset:offset + limit]
+        next_cursor = None
+        if offset + limit < len(rows):
+            next_cursor = base64.urlsafe_b64encode(
+                json.dumps({'offset': offset + limit, 'query': query_digest}).encode()).decode()
+
+        if params.get('fields'):
+            columns = [col for col in params['fields'].split(',') if col in df.columns]
+        else:
+            columns = [col for col in LIST_COLUMNS if col in df.columns]
+        meta = {'dataset_version': dataset.version, 'total': int(len(rows)), 'count': int(len(page)),
+                'next_cursor': next_cursor}
+        return with_data(meta, records_json(df[columns].take(page)))
+
+    def _position(self, dataset, opportunity_id):
+        position = dataset.value['record_store'].position_of.get(opportunity_id)
+        if position is None:
+            raise ApiError(404, f"Unknown opportunity_id: {opportunity_id}")
+        return position
+
+    def opportunity(self, dataset, opportunity_id):
+        df = dataset.value['df']
+        position = self._position(dataset, opportunity_id)
+        return with_data({'dataset_version': dataset.version}, records_json(df.iloc[[position]])[1:-1])
+
+    def similar(self, dataset, opportunity_id, params):
+        version = dataset.value
+        index = version['similar_index']
+        if index is None:
+            raise ApiError(400, "No similarity index for this dataset (run merge_batches.py)")
+        position = self._position(dataset, opportunity_id)
+        try:
+            limit = min(max(int(params.get('limit', 10)), 1), MAX_LIMIT)
+        except ValueError:
+            raise ApiError(400, "limit must be an integer")
+        rows, scores = index.neighbours(position, limit)
+        columns = [col for col in LIST_COLUMNS if col in version['df'].columns]
+        frame = version['df'][columns].take(rows).assign(similarity=np.round(scores, 4))
+        return with_data({'dataset_version': dataset.version, 'count': int(len(rows))}, records_json(frame))
+
+    def aggregate(self, dataset, params):
+        df = dataset.value['df']
+        by = params.get('by')
+        if by not in df.columns:
+            raise ApiError(400, "by must be a column of the dataset")
+        value = params.get('value')
+        if value is not None and (value not in df.columns or not pd.api.types.is_numeric_dtype(df[value])):
+            raise ApiError(400, "value must be a numeric column")
+        rows, _, state = self.select(dataset, params)
+
+        cube = dataset.value['cube']
+        searched = bool(params.get('q', '').strip())
+        if value is None and not searched and cube is not None and by in cube.dimensions and cube.supports(state):
+            # Same roll-up as the dashboard charts: independent of the row count
+            counts = cube.value_counts(by, state)
+            groups = [{'value': key, 'count': int(count)} for key, count in counts.items()]
+        elif value is None:
+            counts = df[by].take(rows).value_counts()
+            counts = counts[counts > 0]
+            groups = [{'value': key, 'count': int(count)} for key, count in counts.items()]
+        else:
+            frame = df[list(dict.fromkeys([by, value]))].take(rows)
+            stats = frame.groupby(by, observed=True, sort=False)[value].agg(['size', 'mean', 'median'])
+            stats = stats.sort_values('size', ascending=False, kind='stable')
+            groups = [{'value': key, 'count': int(row['size']),
+                       'mean': None if pd.isna(row['mean']) else float(row['mean']),
+                       'median': None if pd.isna(row['median']) else float(row['median'])}
+                      for key, row in stats.iterrows()]
+        return {'dataset_version': dataset.version, 'by': by, 'value': value, 'total': int(len(rows)),
+                'groups': groups}
+
+
+class ApiHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server_version = 'OpportunitiesAPI/1.0'
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        response = self.server.api.respond(url.path, dict(parse_qsl(url.query)))
+
+        compressed = response.gzipped is not None and 'gzip' in self.headers.get('Accept-Encoding', '')
+        body = response.gzipped if compressed else response.body
+        # Each encoding is a different representation, with its own tag
+        etag = response.etag[:-1] + '-gzip"' if compressed else response.etag
+
+        if response.status == 200 and self._matches(etag):
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        self.send_response(response.status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', etag)
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Vary', 'Accept-Encoding')
+        if compressed:
+            self.send_header('Content-Encoding', 'gzip')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _matches(self, etag):
+        header = self.headers.get('If-None-Match')
+        if not header:
+            return False
+        return header.strip() == '*' or etag in [tag.strip() for tag in header.split(',')]
+
+    def log_message(self, *args):
+        if self.server.verbose:
+            super().log_message(*args)
+
+
+def serve(dataset_path=DATASET_PATH, host='127.0.0.1', port=DEFAULT_PORT, verbose=False, background=False):
+    """
+    Load the dataset and serve the API; with `background=True` the server
+    runs in a daemon thread and is returned (port 0 picks a free port, see
+    server.server_address), otherwise this blocks
+    """
+    server = ThreadingHTTPServer((host, port), ApiHandler)
+    server.daemon_threads = True
+    server.api = OpportunityApi(dataset_path).start()
+    server.verbose = verbose
+    if background:
+        threading.Thread(target=server.serve_forever, name='opportunities-api', daemon=True).start()
+        return server
+    print(f"✓ Serving {dataset_path} on http://{host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local JSON API over the merged research opportunities")
+    parser.add_argument('dataset', nargs='?', default=DATASET_PATH, help="Merged dataset (CSV or Parquet)")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--verbose', action='store_true', help="Log every request")
+    args = parser.parse_args(argv)
+    serve(args.dataset, args.host, args.port, args.verbose)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,289 @@
+"""
+Benchmark harness for the data pipeline
+Generates synthetic batches (synthetic_data.py) at each requested size and
+times the pipeline stages on them, each stage in a fresh process so its peak
+memory is its own:
+  - merge_ingest          batch CSVs -> sorted runs (merge_batches.ingest_batches)
+  - merge                 full merge_batches.py run (CSV + Parquet + search/similarity indexes)
+  - load_data             typed, compacted load of the merged dataset
+  - duration_parse        duration text -> months (dataset_store.parse_duration_months)
+  - apply_filters         filter index build + a fixed set of filter states
+  - visualization_prep    aggregation cube build + the chart counts
+  - csv_export            chunked CSV export of the whole merged file
+
+Results are compared with a stored baseline (--save-baseline writes it);
+a stage slower or larger than the baseline by more than --tolerance is a
+regression and makes the run exit with status 1.
+
+    python benchmark.py --rows 1000 100000 1000000 [--save-baseline]
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+import warnings
+from pathlib import Path
+
+import agg_cube
+import dataset_store
+import export_data
+import filter_index
+import merge_batches
+import synthetic_data
+
+try:
+    import resource
+except ImportError:  # Windows: times only, no peak RSS
+    resource = None
+
+BASELINE_PATH = Path(__file__).resolve().parent / 'benchmark_baseline.json'
+
+DEFAULT_ROWS = [1000, 10000, 100000]
+
+STAGES = ['merge_ingest', 'merge', 'load_data', 'duration_parse', 'apply_filters',
+          'visualization_prep', 'csv_export']
+
+# Allowed slowdown / growth over the baseline before a stage counts as a regression
+TOLERANCE = 0.25
+
+# Differences below these are noise, whatever the ratio
+MIN_SECONDS = 0.05
+MIN_RSS_MB = 16
+
+FILTER_CATEGORICAL_COLUMNS = ['country', 'region', 'field_of_study', 'career_stage', 'program_type']
+# Typed numeric columns the range filters use
+FILTER_NUMERIC_COLUMNS = [dataset_store.DURATION_COLUMN] + dataset_store.FUNDING_COLUMNS
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1024 ** 2 if sys.platform == 'darwin' else 1024)
+
+
+def merged_path(data_dir):
+    return os.path.join(data_dir, 'research_opportunities_complete.csv')
+
+
+def setup_stage(name, data_dir):
+    """Inputs of a stage, prepared before timing starts"""
+    if name == 'merge_ingest':
+        return [os.path.join(data_dir, filename) for filename in merge_batches.batch_files]
+    if name == 'merge':
+        return None
+    if name == 'duration_parse':
+        raw = dataset_store.load_dataset(merged_path(data_dir), columns=dataset_store.DURATION_SOURCE_COLUMNS)
+        source = dataset_store.duration_sources(raw.columns)
+        return raw[source[0]] if source else raw.iloc[:, 0]
+    if name in ('load_data', 'csv_export'):
+        return None
+    return dataset_store.load_dataset(merged_path(data_dir), memory_map=True, compact=True)
+
+
+def run_stage(name, data_dir, workers, inputs):
+    """The measured work of one stage"""
+    if name == 'merge_ingest':
+        spill_dir = tempfile.mkdtemp(prefix='bench_runs_')
+        try:
+            merge_batches.ingest_batches(inputs, spill_dir, merge_batches.CHUNK_SIZE, workers)
+        finally:
+            shutil.rmtree(spill_dir, ignore_errors=True)
+
+    elif name == 'merge':
+        merge_batches.main(['--data-dir', data_dir, '--workers', str(workers)])
+
+    elif name == 'load_data':
+        df = dataset_store.load_dataset(merged_path(data_dir), memory_map=True, compact=True)
+        if dataset_store.DURATION_COLUMN not in df.columns:
+            dataset_store.add_duration_column(df)
+
+    elif name == 'duration_parse':
+        dataset_store.parse_duration_months(inputs)
+
+    elif name == 'apply_filters':
+        df = inputs
+        numeric = [col for col in FILTER_NUMERIC_COLUMNS if col in df.columns]
+        index = filter_index.FilterIndex(df, categorical=FILTER_CATEGORICAL_COLUMNS, numeric=numeric)
+        states = [index.full]
+        for col in FILTER_CATEGORICAL_COLUMNS:
+            if index.has(col) and index.values(col):
+                states.append(index.equals(col, index.values(col)[0]))
+        for col in numeric:
+            bounds = index.bounds(col)
+            if bounds:
+                middle = (bounds[0] + bounds[1]) / 2
+                states.append(index.between(col, bounds[0], middle, include_missing=True))
+        states.append(states[1] & states[-1] if len(states) > 2 else index.full)
+        for bitset in states:
+            index.rows(bitset)
+
+    elif name == 'visualization_prep':
+        df = inputs
+        deadline_col = next((col for col in df.columns if col.endswith(dataset_store.PARSED_SUFFIX)), None)
+        cube = agg_cube.AggregationCube(df, agg_cube.CUBE_DIMENSIONS, deadline_col)
+        states = [{}] + [{dim: cube.values[dim][0]} for dim in cube.dimensions if len(cube.values[dim])]
+        for state in states:
+            for dim in cube.dimensions:
+                cube.value_counts(dim, state)
+            if cube.has_deadline:
+                cube.deadline_months(state)
+
+    elif name == 'csv_export':
+        fd, path = tempfile.mkstemp(suffix='.csv')
+        os.close(fd)
+        try:
+            export_data.write_export(export_data.iter_rows(merged_path(data_dir)), 'csv', path)
+        finally:
+            os.remove(path)
+
+
+def measure_stage(name, data_dir, workers):
+    """Runs in a fresh process: (seconds, peak RSS MB, RSS growth during the stage MB)"""
+    # Stages print progress (merge summary etc.) and parser warnings; keep
+    # the benchmark output readable
+    warnings.filterwarnings('ignore')
+    with contextlib.redirect_stdout(io.StringIO()):
+        inputs = setup_stage(name, data_dir)
+        before = peak_rss_mb()
+        started = time.perf_counter()
+        run_stage(name, data_dir, workers, inputs)
+        seconds = time.perf_counter() - started
+    peak = peak_rss_mb()
+    growth = None if peak is None else max(0.0, peak - before)
+    return seconds, peak, growth
+
+
+def measure(name, data_dir, workers, repeat=1):
+    """Best of `repeat` runs, each in its own process"""
+    context = multiprocessing.get_context('spawn')
+    best = None
+    for _ in range(repeat):
+        with context.Pool(1) as pool:
+            result = pool.apply(measure_stage, (name, data_dir, workers))
+        if best is None or result[0] < best[0]:
+            best = result
+    seconds, peak, growth = best
+    return {'seconds': round(seconds, 4),
+            'peak_rss_mb': None if peak is None else round(peak, 1),
+            'rss_growth_mb': None if growth is None else round(growth, 1)}
+
+
+def prepare_data(work_dir, rows, seed):
+    """Synthetic batches for one size, reused while rows and seed are unchanged"""
+    data_dir = os.path.join(work_dir, f'rows_{rows}')
+    marker = os.path.join(data_dir, '.generated.json')
+    spec = {'rows': rows, 'seed': seed}
+    if os.path.exists(marker):
+        with open(marker, encoding='utf-8') as f:
+            if json.load(f) == spec:
+                return data_dir
+    shutil.rmtree(data_dir, ignore_errors=True)
+    started = time.perf_counter()
+    synthetic_data.generate(data_dir, rows, seed)
+    with open(marker, 'w', encoding='utf-8') as f:
+        json.dump(spec, f)
+    print(f"  generated {rows:,} rows in {time.perf_counter() - started:.2f}s")
+    return data_dir
+
+
+def compare(result, baseline, tolerance=TOLERANCE):
+    """Regression messages for one stage against its baseline entry"""
+    regressions = []
+    if baseline is None:
+        return regressions
+    if (result['seconds'] > baseline['seconds'] * (1 + tolerance) and
+            result['seconds'] - baseline['seconds'] > MIN_SECONDS):
+        regressions.append(f"time {baseline['seconds']:.3f}s -> {result['seconds']:.3f}s")
+    if (result['peak_rss_mb'] is not None and baseline.get('peak_rss_mb') is not None and
+            result['peak_rss_mb'] > baseline['peak_rss_mb'] * (1 + tolerance) and
+            result['peak_rss_mb'] - baseline['peak_rss_mb'] > MIN_RSS_MB):
+        regressions.append(f"peak RSS {baseline['peak_rss_mb']:.0f} MB -> {result['peak_rss_mb']:.0f} MB")
+    return regressions
+
+
+def format_mb(value):
+    return 'n/a' if value is None else f'{value:,.0f}'
+
+
+def load_baseline(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_baseline(path, results):
+    with open(f'{path}.tmp', 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+    os.replace(f'{path}.tmp', path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline stages on synthetic data")
+    parser.add_argument('--rows', type=int, nargs='+', default=DEFAULT_ROWS,
+                        help="Dataset sizes to run (total rows over the five batches)")
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=STAGES)
+    parser.add_argument('--work-dir', default=os.path.join(tempfile.gettempdir(), 'opportunity_bench'),
+                        help="Where the synthetic data is generated and kept between runs")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=1, help="Worker processes for the merge stages")
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per stage; the fastest counts")
+    parser.add_argument('--baseline', default=str(BASELINE_PATH), help="Baseline results (JSON)")
+    parser.add_argument('--save-baseline', action='store_true', help="Store these results as the baseline")
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE,
+                        help="Allowed slowdown/growth over the baseline (0.25 = 25%%)")
+    args = parser.parse_args(argv)
+
+    baseline = load_baseline(args.baseline)
+    results = {}
+    failures = []
+    for rows in args.rows:
+        print(f"\n{'='*72}\n{rows:,} rows\n{'='*72}")
+        data_dir = prepare_data(args.work_dir, rows, args.seed)
+        # Every stage after the merge reads the merged output
+        stages = args.stages
+        if 'merge' not in stages and not os.path.exists(merged_path(data_dir)):
+            stages = ['merge'] + stages
+        print(f"  {'stage':<20} {'time (s)':>10} {'peak MB':>9} {'+MB':>7}  vs baseline")
+        for name in stages:
+            result = measure(name, data_dir, args.workers, args.repeat)
+            results.setdefault(str(rows), {})[name] = result
+            base = baseline.get(str(rows), {}).get(name)
+            regressions = compare(result, base, args.tolerance)
+            if base is None:
+                verdict = '(no baseline)'
+            elif regressions:
+                verdict = '✗ ' + '; '.join(regressions)
+                failures.append(f"{rows:,} rows {name}: " + '; '.join(regressions))
+            else:
+                verdict = f"✓ {result['seconds'] / max(base['seconds'], 1e-9):.2f}x"
+            print(f"  {name:<20} {result['seconds']:>10.3f} {format_mb(result['peak_rss_mb']):>9} "
+                  f"{format_mb(result['rss_growth_mb']):>7}  {verdict}")
+
+    if args.save_baseline:
+        merged = dict(baseline)
+        for rows, stages in results.items():
+            merged.setdefault(rows, {}).update(stages)
+        save_baseline(args.baseline, merged)
+        print(f"\n✓ Baseline saved: {args.baseline}")
+
+    if failures:
+        print(f"\n✗ {len(failures)} regression(s):")
+        for failure in failures:
+            print(f"  {failure}")
+        return 1
+    print("\n✓ No regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,208 @@
+"""
+Data layer shared by the Streamlit dashboard and the JSON API
+Loads one dataset version with every index built from it, and turns filter
+values into row bitsets over those indexes. Nothing here imports Streamlit,
+so api_server.py and scripts serve exactly what the dashboard shows.
+"""
+
+from datetime import date, datetime
+from pathlib import Path
+
+import numpy as np
+
+import agg_cube
+import dataset_store
+import deadlines
+import eligibility
+import filter_index
+import recommend
+import record_store
+import similar
+import sql_query
+import text_search
+
+# Columns the dashboard views use; the rest of the 95 stay on disk
+DASHBOARD_COLUMNS = [
+    'opportunity_id', 'program_name', 'opportunity_name', 'institution', 'country', 'region',
+    'opportunity_type', 'career_stage', *recommend.CAREER_STAGE_COLUMNS[1:], 'field_of_study',
+    *dataset_store.DURATION_SOURCE_COLUMNS,
+    'funding_amount_min', 'funding_amount_max', 'funding_amount_avg',
+    'acceptance_rate_category', 'application_url', 'description', 'eligibility_criteria',
+    *eligibility.ELIGIBILITY_SOURCE_COLUMNS,
+]
+
+# Sidebar filters served by the bitmap index (see filter_index.py)
+FILTER_CATEGORICAL_COLUMNS = ['country', 'region', 'field_of_study', 'career_stage', 'opportunity_type']
+FILTER_NUMERIC_COLUMNS = ['duration_numeric', 'funding_amount_avg', 'funding_amount_min', 'funding_amount_max']
+
+# Deadline windows answered by the sorted deadline index (any date of the row counts)
+DEADLINE_WINDOWS = {"Next 30 days": 30, "Next 90 days": 90}
+
+# Funding columns the funding range filter uses, in order of preference
+FUNDING_FILTER_COLUMNS = ['funding_amount_avg', 'funding_amount_min', 'funding_amount_max']
+
+# Deadline filter choices ("All" keeps every row)
+DEADLINE_FILTERS = ["All", *DEADLINE_WINDOWS, "Upcoming (2026)", "Past deadlines", "Rolling / open",
+                    "No deadline info"]
+
+
+def dashboard_column(col):
+    """Projection used when loading: dashboard columns plus every deadline column"""
+    return col in DASHBOARD_COLUMNS or 'deadline' in col.lower()
+
+
+def read_dataset(path):
+    """Load one version of the dataset (raises when it is missing or unreadable)"""
+    if not Path(path).exists() and not dataset_store.parquet_path_for(path).exists():
+        raise FileNotFoundError("Dataset not found. Please run merge_batches.py first!")
+
+    # Typed Parquet copy (memory-mapped) when available, CSV otherwise:
+    # deadlines come back parsed, funding numeric, country/region categorical;
+    # compaction turns the other low-cardinality text into categories too.
+    # The compacted frame is snapshotted to a memory-mapped Arrow file, so
+    # worker processes share its text buffers through the page cache
+    df = dataset_store.load_shared(path, columns=dashboard_column, compact=True)
+
+    # Duration in months is parsed once at merge time (duration_numeric);
+    # only files written before that need it computed here
+    if dataset_store.DURATION_COLUMN not in df.columns:
+        dataset_store.add_duration_column(df)
+    if eligibility.ELIGIBILITY_COLUMN not in df.columns:
+        eligibility.add_eligibility_column(df)
+
+    return df
+
+
+def load_dataset_version(path):
+    """
+    The frame and every index built from it, for one dataset version. Runs in
+    the watcher thread on reloads, so sessions keep using the previous
+    version until all of it is ready.
+    """
+    # Read before the data: indexes of a merge published meanwhile then do
+    # not match, rather than being paired with the frame they were not built from
+    dataset_version = dataset_store.dataset_version(path)
+    df = read_dataset(path)
+    version = {'df': df, 'filter_index': None, 'cube': None, 'record_store': None, 'search_index': None,
+               'deadline_index': None, 'eligibility_index': None, 'recommender': None, 'similar_index': None,
+               'sql_engine': None, 'day': date.today()}
+    if len(df) > 0:
+        # Every deadline date of every row, sorted; adds deadline_next and
+        # deadline_rolling to the frame
+        version['deadline_index'] = deadlines.normalize_deadlines(df)
+        deadline_col = deadline_column(df)
+        version['filter_index'] = filter_index.FilterIndex(
+            df,
+            categorical=FILTER_CATEGORICAL_COLUMNS,
+            numeric=FILTER_NUMERIC_COLUMNS + ([deadline_col] if deadline_col else []),
+        )
+        version['eligibility_index'] = eligibility.EligibilityIndex(df)
+        version['recommender'] = recommend.Recommender(df, version['eligibility_index'])
+        version['cube'] = agg_cube.AggregationCube(df, agg_cube.CUBE_DIMENSIONS, deadline_col)
+        version['record_store'] = record_store.RecordStore(df)
+        version['search_index'] = text_search.load_index(path, dataset_version)
+        version['similar_index'] = similar.load_index(path, dataset_version)
+        version['sql_engine'] = sql_query.QueryEngine(path)
+    return version
+
+
+def expired(version):
+    """
+    Whether a loaded version is from an earlier day: its next deadlines (and
+    what is built on them) are then reloaded (see dataset_watch.py)
+    """
+    return version['day'] != date.today()
+
+
+def deadline_column(df):
+    """The next-deadline column (first parsed one as a fallback), used by the deadline filter and timeline"""
+    if deadlines.DEADLINE_NEXT_COLUMN in df.columns:
+        return deadlines.DEADLINE_NEXT_COLUMN
+    for col in df.columns:
+        if 'deadline' in col.lower() and '_parsed' in col:
+            return col
+    return None
+
+
+def funding_column(index):
+    """The column the funding range filter applies to, or None"""
+    return next((col for col in FUNDING_FILTER_COLUMNS if index.has(col)), None)
+
+
+def deadline_bitset(version, label, now):
+    """Rows passing one deadline filter, or None when the dataset has no deadline to filter on"""
+    index = version['filter_index']
+    deadline_index = version['deadline_index']
+    deadline_col = deadline_column(version['df'])
+    if not deadline_col:
+        return None
+    if label in DEADLINE_WINDOWS and deadline_index is not None:
+        # Two binary searches over every deadline date of every row
+        return index.bitset(deadline_index.upcoming(DEADLINE_WINDOWS[label], start=now))
+    if label == "Upcoming (2026)":
+        if deadline_index is not None:
+            return index.bitset(deadline_index.between(now, datetime(2027, 1, 1)))
+        return index.between(deadline_col, now, datetime(2027, 1, 1), inclusive_high=False)
+    if label == "Past deadlines":
+        if deadline_index is not None:
+            # Dated rows without a deadline still ahead
+            return index.bitset(np.setdiff1d(deadline_index.dated(), deadline_index.after(now),
+                                             assume_unique=True))
+        return index.between(deadline_col, None, now, inclusive_high=False)
+    if label == "Rolling / open" and deadline_index is not None:
+        return index.bitset(np.flatnonzero(deadline_index.rolling))
+    if label == "No deadline info":
+        return index.missing(deadline_col)
+    return None
+
+
+def deadline_state(label, now):
+    """The deadline filter in the filter state: date windows move with the clock, so the day is kept"""
+    if label in ("All", "Rolling / open", "No deadline info"):
+        return label
+    return (label, now.date().isoformat())
+
+
+def filter_bitset(version, name, value, now=None):
+    """
+    Rows passing one filter: a categorical filter column equal to `value`,
+    'duration' or 'funding' within (low, high) (rows without a value kept),
+    'nationality' as (country, include_unclear), or a 'deadline' label.
+    None when the filter does not apply to this dataset.
+    """
+    index = version['filter_index']
+    if name in FILTER_CATEGORICAL_COLUMNS:
+        return index.equals(name, value) if index.has(name) else None
+    if name == 'duration':
+        col = dataset_store.DURATION_COLUMN
+        return index.between(col, *value, include_missing=True) if index.has(col) else None
+    if name == 'funding':
+        col = funding_column(index)
+        return index.between(col, *value, include_missing=True) if col else None
+    if name == 'nationality':
+        country, include_unclear = value
+        return version['eligibility_index'].eligible(country, include_unclear)
+    if name == 'deadline':
+        return deadline_bitset(version, value, now or datetime.now())
+    raise ValueError(f"Unknown filter: {name}")
+
+
+def select(version, filters, now=None, narrow=None):
+    """
+    Rows passing every filter of a {name: value} dict (see filter_bitset;
+    'All'/None values are skipped) and the filter state to key cached
+    results on. `narrow(selected, name, bitset)` intersects one step
+    (default: plain AND).
+    """
+    now = now or datetime.now()
+    index = version['filter_index']
+    selected = index.full
+    state = {}
+    for name, value in filters.items():
+        if value is None or value == 'All':
+            continue
+        bitset = filter_bitset(version, name, value, now)
+        if bitset is not None:
+            selected = narrow(selected, name, bitset) if narrow else selected & bitset
+        state[name] = deadline_state(value, now) if name == 'deadline' else value
+    return selected, state
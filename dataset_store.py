@@ -0,0 +1,470 @@
+"""
+Columnar storage for the merged research opportunities dataset
+Typed Parquet output written by merge_batches.py and read by the dashboard and notebook
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import os
+import time
+import re
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import deadlines
+import eligibility
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet support is optional; everything falls back to CSV
+    pa = None
+    pq = None
+
+FUNDING_COLUMNS = ['funding_amount_min', 'funding_amount_max', 'funding_amount_avg', 'funding_amount_typical']
+
+CATEGORICAL_COLUMNS = ['country', 'region']
+
+PARSED_SUFFIX = deadlines.PARSED_SUFFIX
+
+# Written by merge_batches.py once every output of a merge is in place
+VERSION_SUFFIX = '.version'
+
+# Free-text duration columns, in order of preference, and the typed column
+# (months, float) derived from them at ingestion
+DURATION_SOURCE_COLUMNS = ['duration', 'duration_months', 'funding_duration_months']
+DURATION_COLUMN = 'duration_numeric'
+
+# One pass over each value: the first quantity ("24", "2-3 years",
+# "1.5 years", "4-year program", "up to 36 months", "6 weeks") plus a
+# trailing month part ("2 years 6 months"). Bare numbers are months; the
+# number of a "Year 1:" label is not a quantity.
+DURATION_PATTERN = re.compile(
+    r'(?<![\d.])(?<!year )(?<!year)(?P<low>\d+(?:\.\d+)?)'
+    r'(?:\s*(?:-|–|to)\s*(?P<high>\d+(?:\.\d+)?))?'
+    r'[\s-]*(?P<unit>year|yr|month|mo|week|wk|day)?'
+    r'(?:\D{0,20}?(?P<extra>\d+(?:\.\d+)?)\s*month)?',
+    re.IGNORECASE,
+)
+
+# Bumped when the layout of the shared Arrow snapshots changes, so older
+# snapshots are rewritten
+SNAPSHOT_LAYOUT = 2
+
+# Compaction: string columns whose distinct values are at most this share of
+# the rows become categorical (when that is actually smaller); Yes/No columns
+# become booleans
+CATEGORY_MAX_RATIO = 0.5
+FLAG_VALUES = {'yes': True, 'no': False, 'true': True, 'false': False, 'y': True, 'n': False}
+
+MONTHS_PER_UNIT = {'year': 12.0, 'yr': 12.0, 'month': 1.0, 'mo': 1.0,
+                   'week': 12 / 52, 'wk': 12 / 52, 'day': 12 / 365}
+
+
+def parquet_available():
+    return pq is not None
+
+
+def parquet_path_for(csv_path):
+    """The Parquet file that sits next to a merged CSV"""
+    return Path(csv_path).with_suffix('.parquet')
+
+
+def version_path_for(path):
+    """The version stamp that sits next to a merged CSV/Parquet file"""
+    path = Path(path)
+    return path.with_name(path.stem + VERSION_SUFFIX)
+
+
+def new_version():
+    """A fresh dataset version id"""
+    return f'{time.time_ns():x}'
+
+
+def write_version_stamp(path, rows, version=None):
+    """
+    Publish a finished merge: its version id (a new one by default), written
+    atomically and last. Indexes built during the merge are tagged with the
+    same id beforehand (see text_search.load_index).
+    """
+    stamp_path = version_path_for(path)
+    stamp = {
+        'version': version or new_version(),
+        'rows': rows,
+        'written': time.strftime('%Y-%m-%d %H:%M:%S'),
+    }
+    with open(f'{stamp_path}.tmp', 'w', encoding='utf-8') as f:
+        json.dump(stamp, f, indent=2)
+    os.replace(f'{stamp_path}.tmp', stamp_path)
+    return stamp['version']
+
+
+def dataset_version(path):
+    """
+    Token of the current merged dataset version, None when there is none.
+    The merge's version stamp when present; otherwise (files merged before
+    stamps existed, or written by hand) the source file's mtime and size.
+    """
+    stamp_path = version_path_for(path)
+    if stamp_path.exists():
+        with open(stamp_path, encoding='utf-8') as f:
+            return json.load(f)['version']
+    source = source_path_for(path)
+    if not source.exists():
+        return None
+    stat = source.stat()
+    return f'{stat.st_mtime_ns:x}-{stat.st_size:x}'
+
+
+is_deadline_column = deadlines.is_deadline_column
+
+
+def parse_duration_months(values):
+    """
+    Vectorized duration parser: free text -> months (float, NaN when no
+    number). Ranges give their midpoint ("2-3 years" -> 30), weeks and
+    days are converted, "X years Y months" is summed.
+    """
+    parts = values.astype('string').str.extract(DURATION_PATTERN)
+    numbers = parts[['low', 'high', 'extra']].astype('Float64').astype(float)
+    low, high = numbers['low'], numbers['high'].fillna(numbers['low'])
+    unit = parts['unit'].str.lower().map(MONTHS_PER_UNIT).astype(float).fillna(1.0)
+    extra = numbers['extra'].where(unit == 12.0, 0.0).fillna(0.0)
+    months = (low + high) / 2 * unit + extra
+    return months.where(months > 0).astype(float)
+
+
+def duration_sources(columns):
+    return [col for col in DURATION_SOURCE_COLUMNS if col in columns]
+
+
+def add_duration_column(df):
+    """`duration_numeric` (months) from the first duration column that parses, row by row"""
+    sources = duration_sources(df.columns)
+    if not sources:
+        return df
+    months = parse_duration_months(df[sources[0]])
+    for col in sources[1:]:
+        months = months.fillna(parse_duration_months(df[col]))
+    df[DURATION_COLUMN] = months
+    return df
+
+
+def add_typed_columns(df, formats=None):
+    """
+    Type a raw (string) frame in place: numeric funding, categorical
+    country/region, a `<col>_parsed` datetime (first date of the value, see
+    deadlines.py) next to every deadline column, `duration_numeric`
+    months parsed from the duration text and the canonical
+    `eligible_nationalities` spec (see eligibility.py). `formats` keeps the
+    detected deadline formats between blocks of one dataset.
+    """
+    formats = {} if formats is None else formats
+    for col in list(df.columns):
+        if is_deadline_column(col):
+            df[f'{col}{PARSED_SUFFIX}'] = deadlines.parse_deadlines(df[col], col, formats=formats)
+
+    add_duration_column(df)
+    eligibility.add_eligibility_column(df)
+
+    for col in FUNDING_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce')
+
+    for col in CATEGORICAL_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype('category')
+
+    return df
+
+
+def typed_schema(columns):
+    """Arrow schema of the typed dataset for the given raw column list"""
+    fields = []
+    for col in columns:
+        if col in FUNDING_COLUMNS:
+            fields.append(pa.field(col, pa.float64()))
+        elif col in CATEGORICAL_COLUMNS:
+            fields.append(pa.field(col, pa.dictionary(pa.int32(), pa.string())))
+        else:
+            fields.append(pa.field(col, pa.string()))
+    for col in columns:
+        if is_deadline_column(col):
+            fields.append(pa.field(f'{col}{PARSED_SUFFIX}', pa.timestamp('ns')))
+    if duration_sources(columns):
+        fields.append(pa.field(DURATION_COLUMN, pa.float64()))
+    if eligibility.eligibility_sources(columns):
+        fields.append(pa.field(eligibility.ELIGIBILITY_COLUMN, pa.string()))
+    return pa.schema(fields)
+
+
+class ParquetDatasetWriter:
+    """
+    Streaming writer: every block appended becomes one row group, so the
+    merge can produce the Parquet file without holding the dataset in memory
+    """
+
+    def __init__(self, path, columns):
+        self.path = str(path)
+        self.columns = list(columns)
+        self.schema = typed_schema(self.columns)
+        self.writer = pq.ParquetWriter(self.path, self.schema, compression='zstd')
+        self.formats = {}
+
+    def write(self, block):
+        typed = add_typed_columns(block.reindex(columns=self.columns).copy(), self.formats)
+        table = pa.Table.from_pandas(typed, schema=self.schema, preserve_index=False)
+        self.writer.write_table(table)
+
+    def close(self):
+        self.writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def resolve_columns(available, columns):
+    """
+    Turn a projection (list of names or a predicate, like pandas' usecols)
+    into the existing columns to read; parsed deadline companions of
+    selected columns, `duration_numeric` with any duration column and
+    `eligible_nationalities` with any eligibility column come along
+    automatically
+    """
+    if columns is None:
+        return list(available)
+    if callable(columns):
+        wanted = {col for col in available if columns(col)}
+    else:
+        wanted = set(columns)
+    wanted |= {f'{col}{PARSED_SUFFIX}' for col in wanted}
+    if duration_sources(wanted):
+        wanted.add(DURATION_COLUMN)
+    if eligibility.eligibility_sources(wanted):
+        wanted.add(eligibility.ELIGIBILITY_COLUMN)
+    return [col for col in available if col in wanted]
+
+
+def read_parquet_dataset(path, columns=None, memory_map=False):
+    """Read the typed Parquet dataset, loading only the projected columns"""
+    available = pq.read_schema(str(path)).names
+    table = pq.read_table(str(path), columns=resolve_columns(available, columns),
+                          memory_map=memory_map)
+    return table.to_pandas()
+
+
+def read_csv_dataset(path, columns=None):
+    """Read the merged CSV (projected through usecols) and type it like the Parquet file"""
+    available = pd.read_csv(path, encoding='utf-8', quoting=csv.QUOTE_ALL, nrows=0).columns
+    usecols = resolve_columns(available, columns)
+    df = pd.read_csv(path, encoding='utf-8', quoting=csv.QUOTE_ALL, usecols=usecols)
+    return add_typed_columns(df[usecols])
+
+
+def iter_dataset_chunks(path, columns=None, chunksize=50000):
+    """
+    Stream the raw (untyped, string) merged dataset in chunks, from the CSV
+    or from the Parquet file, for passes that must not load it whole
+    """
+    path = Path(path)
+    if path.suffix == '.parquet':
+        parquet_file = pq.ParquetFile(str(path))
+        usecols = [col for col in resolve_columns(parquet_file.schema_arrow.names, columns)
+                   if not col.endswith(PARSED_SUFFIX)
+                   and col not in (DURATION_COLUMN, eligibility.ELIGIBILITY_COLUMN)]
+        for batch in parquet_file.iter_batches(batch_size=chunksize, columns=usecols):
+            chunk = batch.to_pandas()
+            for col in chunk.columns:
+                if col in FUNDING_COLUMNS or col in CATEGORICAL_COLUMNS:
+                    chunk[col] = chunk[col].astype(str).where(chunk[col].notna())
+            yield chunk
+        return
+
+    available = pd.read_csv(path, encoding='utf-8', quoting=csv.QUOTE_ALL, nrows=0).columns
+    usecols = resolve_columns(available, columns)
+    yield from pd.read_csv(path, encoding='utf-8', quoting=csv.QUOTE_ALL, dtype=str,
+                           usecols=usecols, chunksize=chunksize)
+
+
+def flag_dtype():
+    """Bit-packed Arrow booleans when pyarrow is there, pandas' nullable booleans otherwise"""
+    return pd.ArrowDtype(pa.bool_()) if pa is not None else 'boolean'
+
+
+def compact_column(values, category_ratio=CATEGORY_MAX_RATIO):
+    """The smallest faithful representation of one column (may return it unchanged)"""
+    if isinstance(values.dtype, pd.CategoricalDtype) or pd.api.types.is_datetime64_any_dtype(values):
+        return values
+
+    if pd.api.types.is_integer_dtype(values):
+        downcast = 'unsigned' if len(values) and values.min() >= 0 else 'integer'
+        return pd.to_numeric(values, downcast=downcast)
+
+    if pd.api.types.is_float_dtype(values):
+        narrow = values.astype(np.float32)
+        same = (narrow.astype(np.float64) == values) | (values.isna() & narrow.isna())
+        return narrow if same.all() else values
+
+    if pd.api.types.is_bool_dtype(values):
+        return values
+
+    # One factorization serves the cardinality check and both conversions
+    codes, uniques = pd.factorize(values, sort=True)
+    if len(uniques) == 0:
+        return values
+    present = codes >= 0
+
+    lowered = [str(value).strip().lower() for value in uniques]
+    if set(lowered) <= FLAG_VALUES.keys():
+        flags = np.array([FLAG_VALUES[value] for value in lowered])[codes]
+        flags = pd.array(flags, dtype=flag_dtype())
+        flags[~present] = pd.NA
+        return pd.Series(flags, index=values.index, name=values.name)
+
+    if len(uniques) <= category_ratio * present.sum():
+        categorical = pd.Series(pd.Categorical.from_codes(codes, categories=uniques),
+                                index=values.index, name=values.name)
+        if categorical.memory_usage(deep=True) < values.memory_usage(deep=True):
+            return categorical
+    return values
+
+
+def compact_frame(df, category_ratio=CATEGORY_MAX_RATIO):
+    """
+    Schema-driven compaction: low-cardinality strings -> category, Yes/No
+    flags -> booleans, numerics downcast where lossless. Returns a new frame.
+    """
+    return pd.DataFrame({col: compact_column(df[col], category_ratio) for col in df.columns},
+                        index=df.index)
+
+
+def memory_report(before, after):
+    """Per-column dtype and deep memory before/after compaction, largest savings first, with a total"""
+    report = pd.DataFrame({
+        'dtype_before': before.dtypes.astype(str),
+        'dtype_after': after.dtypes.astype(str),
+        'bytes_before': before.memory_usage(deep=True, index=False),
+        'bytes_after': after.memory_usage(deep=True, index=False),
+    })
+    report['saved'] = report['bytes_before'] - report['bytes_after']
+    report = report.sort_values('saved', ascending=False)
+    total = report[['bytes_before', 'bytes_after', 'saved']].sum()
+    report.loc['TOTAL'] = ['', '', total['bytes_before'], total['bytes_after'], total['saved']]
+    report['ratio'] = (report['bytes_before'] / report['bytes_after'].where(report['bytes_after'] > 0)).round(2)
+    return report
+
+
+def load_dataset(path, columns=None, memory_map=False, compact=False):
+    """
+    Load the merged dataset from `path` (CSV or Parquet). When a CSV path is
+    given and its Parquet sibling exists, the Parquet file is read instead.
+    `compact=True` applies compact_frame to the result.
+    """
+    path = Path(path)
+    parquet_file = path if path.suffix == '.parquet' else parquet_path_for(path)
+    if parquet_available() and parquet_file.exists():
+        df = read_parquet_dataset(parquet_file, columns, memory_map)
+    else:
+        df = read_csv_dataset(path, columns)
+    return compact_frame(df) if compact else df
+
+
+def source_path_for(path):
+    """The file load_dataset actually reads for `path`"""
+    path = Path(path)
+    parquet_file = path if path.suffix == '.parquet' else parquet_path_for(path)
+    return parquet_file if parquet_available() and parquet_file.exists() else path
+
+
+def snapshot_path_for(path, columns=None, compact=False):
+    """
+    Arrow IPC snapshot of one projection of the dataset, next to the source
+    file; the name carries a hash of the resolved columns so different
+    projections (or a changed dashboard column list) never share a file
+    """
+    source = source_path_for(path)
+    if source.suffix == '.parquet':
+        available = pq.read_schema(str(source)).names
+    else:
+        available = pd.read_csv(source, encoding='utf-8', quoting=csv.QUOTE_ALL, nrows=0).columns
+    spec = repr((resolve_columns(available, columns), compact, SNAPSHOT_LAYOUT))
+    digest = hashlib.sha1(spec.encode()).hexdigest()[:10]
+    return source.with_name(f'{Path(path).stem}.{digest}.arrow')
+
+
+def snapshot_table(df):
+    """
+    Arrow table of a frame for the shared snapshot. Missing floats and dates
+    are stored as NaN/NaT values rather than nulls: without a validity
+    bitmap those columns convert to pandas without a copy
+    """
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    for i, field in enumerate(table.schema):
+        dtype = df[field.name].dtype
+        if table.column(i).null_count == 0 or not isinstance(dtype, np.dtype):
+            continue
+        if dtype.kind == 'f':
+            values = pa.array(df[field.name].to_numpy(), from_pandas=False)
+        elif dtype.kind == 'M':
+            values = pa.array(df[field.name].to_numpy().view(np.int64)).view(field.type)
+        else:
+            continue
+        table = table.set_column(i, field, values)
+    # One record batch: columns split over batches are concatenated (copied) on read
+    return table.combine_chunks()
+
+
+def load_shared(path, columns=None, compact=False):
+    """
+    Load the dataset through a memory-mapped Arrow snapshot, written once
+    (and again whenever the source file is newer). Every process mapping the
+    snapshot shares one page-cache copy of its buffers: text columns stay
+    Arrow-backed views into the map and float/date columns are read-only
+    numpy views of it; only category codes are materialized per process.
+    """
+    if not parquet_available():
+        return load_dataset(path, columns, compact=compact)
+
+    source = source_path_for(path)
+    snapshot = snapshot_path_for(path, columns, compact)
+    if not snapshot.exists() or snapshot.stat().st_mtime < source.stat().st_mtime:
+        df = load_dataset(path, columns, compact=compact)
+        table = snapshot_table(df)
+        # Written aside and renamed, so readers never map a partial file
+        tmp_path = snapshot.with_name(f'{snapshot.name}.{os.getpid()}.tmp')
+        with pa.OSFile(str(tmp_path), 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(tmp_path, snapshot)
+
+    table = pa.ipc.open_file(pa.memory_map(str(snapshot))).read_all()
+    # One block per column, so numeric columns are not consolidated into a
+    # copied 2-D block; the table keeps owning the mapped buffers
+    return table.to_pandas(split_blocks=True, self_destruct=False)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Memory report for the compacted merged dataset")
+    parser.add_argument('path', help="Merged dataset (CSV or Parquet)")
+    args = parser.parse_args(argv)
+
+    before = load_dataset(args.path)
+    after = compact_frame(before)
+    report = memory_report(before, after)
+    with pd.option_context('display.max_rows', None, 'display.width', 200):
+        print(report.to_string())
+    total = report.loc['TOTAL']
+    print(f"\n✓ {total['bytes_before'] / 1e6:.2f} MB -> {total['bytes_after'] / 1e6:.2f} MB "
+          f"({total['ratio']}x smaller)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
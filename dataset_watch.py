@@ -0,0 +1,98 @@
+"""
+Hot reload of the merged dataset
+A background thread polls the dataset's version token (see
+dataset_store.dataset_version). When a merge publishes a new version, the new
+data is loaded in that thread while the old version keeps serving, then
+swapped in with a single reference assignment: readers always get one
+complete version, never a cold or half-built one.
+"""
+
+import threading
+import time
+import traceback
+from collections import namedtuple
+
+import dataset_store
+
+POLL_INTERVAL = 5.0
+
+# One loaded version: `value` is whatever `load(path)` returned, `error` the
+# exception when loading failed (value is then None)
+LoadedVersion = namedtuple('LoadedVersion', ['version', 'value', 'error', 'loaded_at'])
+
+
+class DatasetWatcher:
+    """
+    Keeps the latest loaded version of the dataset at `path`. `load(path)`
+    builds everything served from one version; `on_swap(old, new)` runs
+    after a new version replaced the old one (to drop dependent caches).
+    `expired(value)` tells when a loaded value must be rebuilt although the
+    file did not change (data derived from today's date).
+    """
+
+    def __init__(self, path, load, interval=POLL_INTERVAL, on_swap=None, expired=None):
+        self.path = path
+        self.load = load
+        self.interval = interval
+        self.on_swap = on_swap
+        self.expired = expired
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.thread = None
+        self.loaded = None
+        self.reloads = 0
+        self.failed_version = None
+
+    def start(self):
+        """Load the current version in the caller's thread, then watch in the background"""
+        self.check()
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._watch, name='dataset-watcher', daemon=True)
+            self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+
+    def current(self):
+        """The version to serve; callers pin it for the duration of one request"""
+        with self.lock:
+            return self.loaded
+
+    def _watch(self):
+        while not self.stopped.wait(self.interval):
+            try:
+                self.check()
+            except Exception:
+                traceback.print_exc()
+
+    def check(self):
+        """Reload if the version on disk differs from the loaded one (or it expired); True when swapped"""
+        version = dataset_store.dataset_version(self.path)
+        loaded = self.current()
+        changed = loaded is None or version not in (loaded.version, self.failed_version)
+        expired = (not changed and loaded.error is None and version == loaded.version
+                   and self.expired is not None and self.expired(loaded.value))
+        if not (changed or expired):
+            return False
+
+        started = time.perf_counter()
+        try:
+            new = LoadedVersion(version, self.load(self.path), None, time.time())
+        except Exception as e:
+            # A broken new version never replaces a working one; nothing is
+            # retried until the next version is published
+            if loaded is not None and loaded.error is None:
+                print(f"✗ Dataset version {version} failed to load, keeping {loaded.version}: {e}")
+                self.failed_version = version
+                return False
+            new = LoadedVersion(version, None, e, time.time())
+
+        with self.lock:
+            old, self.loaded = self.loaded, new
+        if old is not None:
+            self.reloads += 1
+            print(f"✓ Dataset version {version} loaded in {time.perf_counter() - started:.2f}s")
+            if self.on_swap:
+                self.on_swap(old, new)
+        return True
@@ -0,0 +1,286 @@
+"""
+Deadline normalization for the research opportunities dataset
+Deadline columns hold ISO dates next to "September 15 2026",
+"Mid-October 2026", "December 15 2025 (most programs) OR January 2 2026",
+"March 31 annually", "Rolling"... Every distinct value is parsed once:
+
+  - an explicit date format, detected from a sample of each column and
+    kept per column for one load or merge (`formats`, so later blocks of
+    a merge skip detection), parses the regular values in one vectorized
+    call
+  - the rest goes through one regex pass that extracts every date it
+    holds (ranges and qualifiers resolve to a day: "Mid-October" -> 15th)
+  - rolling/continuous and annual/yearly wording is flagged
+
+DeadlineIndex keeps every (date, row) pair sorted, so "a deadline in the
+next N days" is two binary searches against the current date, and gives
+each row its next deadline. Annual deadlines recur: their next yearly
+occurrences are indexed too, so the index stays right as days pass.
+"""
+
+import re
+
+import numpy as np
+import pandas as pd
+
+PARSED_SUFFIX = '_parsed'
+
+# Derived at load time from today's date (a loaded version is refreshed daily)
+DEADLINE_NEXT_COLUMN = 'deadline_next'
+DEADLINE_ROLLING_COLUMN = 'deadline_rolling'
+DERIVED_COLUMNS = [DEADLINE_NEXT_COLUMN, DEADLINE_ROLLING_COLUMN]
+
+# Tried in order on a sample of each column; the one parsing most values wins
+DATE_FORMATS = ['%Y-%m-%d', '%d/%m/%Y', '%m/%d/%Y', '%B %d %Y', '%B %d, %Y', '%d %B %Y',
+                '%b %d %Y', '%b %d, %Y', '%B %Y']
+FORMAT_SAMPLE_SIZE = 500
+
+MONTHS = (r'jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?'
+          r'|sep(?:t(?:ember)?)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?')
+MONTH_NUMBERS = {name: number for number, name in enumerate(
+    ['jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec'], 1)}
+
+# Every date in a value: ISO (2026-12-05, 2026-12), numeric (05/12/2026),
+# day-month (5 December 2026) and month-day with an optional qualifier,
+# day range and year ("Mid-October 2026", "December 1-15 2025", "Jan 6")
+DATE_PATTERN = re.compile(
+    r'(?P<iso_year>\d{4})-(?P<iso_month>\d{1,2})(?:-(?P<iso_day>\d{1,2}))?'
+    r'|(?P<num_a>\d{1,2})[/.](?P<num_b>\d{1,2})[/.](?P<num_year>\d{4})'
+    rf'|(?P<dm_day>\d{{1,2}})(?:st|nd|rd|th)?\s+(?P<dm_month>{MONTHS})\b\.?,?\s+(?P<dm_year>\d{{4}})'
+    r'|(?:\b(?P<qualifier>early|mid|late|end)(?:\s+of)?[\s-]*)?'
+    rf'\b(?P<month>{MONTHS})\b\.?'
+    r'(?:\s+(?P<day>\d{1,2})(?:st|nd|rd|th)?\b(?:\s*[-–]\s*\d{1,2}\b)?)?'
+    r',?(?:\s+(?P<year>\d{4}))?',
+    re.IGNORECASE,
+)
+
+ROLLING_PATTERN = re.compile(r'\brolling\b|\bongoing\b|\bcontinuous|year[- ]round|any ?time|open until',
+                             re.IGNORECASE)
+ANNUAL_PATTERN = re.compile(r'\bannual(?:ly)?\b|\byearly\b|\b(?:every|each) year\b', re.IGNORECASE)
+
+# Day of the month a qualifier without a day stands for (31 = month end)
+QUALIFIER_DAYS = {'early': 1, 'mid': 15, 'late': 31, 'end': 31}
+
+# Yearly occurrences of an annual deadline indexed after its last stated date
+ANNUAL_YEARS_AHEAD = 3
+
+
+def is_deadline_column(col):
+    """Raw deadline text columns (not their parsed companions or the derived columns)"""
+    return ('deadline' in col.lower() and not col.endswith(PARSED_SUFFIX)
+            and col not in DERIVED_COLUMNS)
+
+
+def today():
+    return pd.Timestamp.now().normalize()
+
+
+def detect_format(values):
+    """The explicit format of DATE_FORMATS parsing most of `values` (strings), or None"""
+    sample = values[:FORMAT_SAMPLE_SIZE]
+    best, best_count = None, 0
+    for fmt in DATE_FORMATS:
+        count = int(pd.to_datetime(sample, format=fmt, errors='coerce').notna().sum())
+        if count > best_count:
+            best, best_count = fmt, count
+    return best
+
+
+def column_format(col, values, formats=None):
+    """Detected format of a column, kept in `formats` (column name -> format) when given"""
+    if col is None or formats is None:
+        return detect_format(values)
+    if col not in formats:
+        formats[col] = detect_format(values)
+    return formats[col]
+
+
+def build_dates(year, month, day):
+    """datetime64[ns] from float year/month/day arrays; days past the month end are clipped"""
+    valid = ~(np.isnan(year) | np.isnan(month)) & (month >= 1) & (month <= 12)
+    starts = pd.to_datetime(pd.DataFrame({
+        'year': np.where(valid, year, 1970), 'month': np.where(valid, month, 1), 'day': 1,
+    }).astype(np.int64))
+    days = np.clip(np.nan_to_num(day, nan=1.0), 1, starts.dt.days_in_month.to_numpy())
+    dates = starts + pd.to_timedelta(days - 1, unit='D')
+    return dates.where(valid).to_numpy(dtype='datetime64[ns]')
+
+
+def extract_matches(values, dayfirst, reference):
+    """(value position, date) pairs of every date found in `values` by DATE_PATTERN"""
+    matches = pd.Series(values, dtype='string').str.extractall(DATE_PATTERN)
+    if matches.empty:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype='datetime64[ns]')
+    positions = matches.index.get_level_values(0).to_numpy()
+    number = lambda name: matches[name].astype('Float64').to_numpy(dtype=float, na_value=np.nan)
+    month_name = lambda name: (matches[name].str[:3].str.lower().map(MONTH_NUMBERS)
+                               .astype('Float64').to_numpy(dtype=float, na_value=np.nan))
+
+    # Numeric dates: the column's format decides day/month order, unless a
+    # part over 12 can only be the day
+    num_a, num_b = number('num_a'), number('num_b')
+    a_is_day = np.where(num_a > 12, True, np.where(num_b > 12, False, dayfirst))
+    num_day, num_month = np.where(a_is_day, num_a, num_b), np.where(a_is_day, num_b, num_a)
+
+    year = np.fmax.reduce([number('iso_year'), number('num_year'), number('dm_year'), number('year')])
+    month = np.fmax.reduce([number('iso_month'), num_month, month_name('dm_month'), month_name('month')])
+    day = np.fmax.reduce([number('iso_day'), num_day, number('dm_day'), number('day')])
+    qualifier = (matches['qualifier'].str.lower().map(QUALIFIER_DAYS)
+                 .astype('Float64').to_numpy(dtype=float, na_value=np.nan))
+    has_day = ~np.isnan(day)
+    day = np.where(has_day, day, qualifier)
+
+    # "Feb-Mar 2026": a missing year comes from the next date of the same value
+    years = pd.Series(year, index=positions)
+    filled = years.groupby(level=0).bfill().groupby(level=0).ffill().to_numpy()
+    # No year anywhere ("March 31 annually"): the next occurrence, if a day is given
+    yearless = np.isnan(filled)
+    keep = ~yearless | has_day
+    filled = np.where(yearless, reference.year, filled)
+    dates = build_dates(filled, month, day)
+    roll = yearless & (dates < reference.to_datetime64())
+    if roll.any():
+        dates[roll] = build_dates(filled[roll] + 1, month[roll], day[roll])
+    keep &= ~np.isnat(dates)
+    return positions[keep], dates[keep]
+
+
+def parse_values(values, col=None, reference=None, formats=None):
+    """
+    Dates in an array of distinct strings: (value positions, dates) pairs in
+    value order, plus rolling and annual flags per value
+    """
+    reference = today() if reference is None else pd.Timestamp(reference)
+    values = pd.Series(values, dtype='string').reset_index(drop=True)
+    fmt = column_format(col, values.dropna(), formats)
+    fast = (pd.to_datetime(values, format=fmt, errors='coerce') if fmt
+            else pd.Series(pd.NaT, index=values.index, dtype='datetime64[ns]'))
+    parsed = fast.notna().to_numpy()
+
+    rest = np.flatnonzero(~parsed & values.notna().to_numpy())
+    rest_positions, rest_dates = extract_matches(values.iloc[rest].to_numpy(), fmt == '%d/%m/%Y', reference)
+
+    positions = np.concatenate([np.flatnonzero(parsed), rest[rest_positions]])
+    dates = np.concatenate([fast[parsed].to_numpy(dtype='datetime64[ns]'), rest_dates])
+    order = np.argsort(positions, kind='stable')
+    rolling = values.str.contains(ROLLING_PATTERN).fillna(False).to_numpy(dtype=bool)
+    annual = values.str.contains(ANNUAL_PATTERN).fillna(False).to_numpy(dtype=bool)
+    return positions[order], dates[order], rolling, annual
+
+
+def extract_dates(values, col=None, reference=None, formats=None):
+    """
+    Every date of a deadline column, as (row positions, dates) pairs in row
+    order, plus rolling and annual flags per row. Distinct values are parsed
+    once and expanded to the rows through their codes.
+    """
+    codes, uniques = pd.factorize(values)
+    unique_positions, unique_dates, rolling, annual = parse_values(
+        np.asarray(uniques, dtype=object), col, reference, formats)
+
+    # Missing values (code -1) pick the trailing zero / False
+    per_value = np.append(np.bincount(unique_positions, minlength=len(uniques)), 0)
+    starts = np.cumsum(per_value) - per_value
+    per_row = per_value[codes]
+    rows = np.repeat(np.arange(len(codes)), per_row)
+    within = np.arange(len(rows)) - np.repeat(np.cumsum(per_row) - per_row, per_row)
+    dates = unique_dates[np.repeat(starts[codes], per_row) + within]
+    return rows, dates, np.append(rolling, False)[codes], np.append(annual, False)[codes]
+
+
+def parse_deadlines(values, col=None, reference=None, formats=None):
+    """First date of every value (NaT when none): the `<col>_parsed` column"""
+    rows, dates, _, _ = extract_dates(values, col, reference, formats)
+    first = np.full(len(values), np.datetime64('NaT'), dtype='datetime64[ns]')
+    rows, positions = np.unique(rows, return_index=True)
+    first[rows] = dates[positions]
+    return pd.Series(first, index=values.index)
+
+
+class DeadlineIndex:
+    """
+    Every deadline date of every row, sorted by date, with per-row rolling
+    flags; `reference` is the day the index was built (yearless dates are
+    read from it), queries default to the current day
+    """
+
+    def __init__(self, df, columns=None, reference=None):
+        self.n = len(df)
+        self.reference = today() if reference is None else pd.Timestamp(reference).normalize()
+        if columns is None:
+            columns = [col for col in df.columns if is_deadline_column(col)]
+        rows, dates = [], []
+        self.rolling = np.zeros(self.n, dtype=bool)
+        annual = np.zeros(self.n, dtype=bool)
+        formats = {}
+        for col in columns:
+            col_rows, col_dates, col_rolling, col_annual = extract_dates(df[col], col, self.reference, formats)
+            rows.append(col_rows)
+            dates.append(col_dates)
+            self.rolling |= col_rolling
+            annual |= col_annual
+        rows = np.concatenate(rows) if rows else np.empty(0, dtype=np.int64)
+        keys = np.concatenate(dates).astype(np.int64) if dates else np.empty(0, dtype=np.int64)
+
+        # Annual deadlines recur: the last date of a row comes back every
+        # year, indexed up to ANNUAL_YEARS_AHEAD years past the build day
+        latest = np.full(self.n, np.iinfo(np.int64).min)
+        np.maximum.at(latest, rows, keys)
+        cycle = np.flatnonzero(annual & (latest > np.iinfo(np.int64).min))
+        if len(cycle):
+            last = pd.DatetimeIndex(latest[cycle])
+            month, day = last.month.to_numpy(dtype=float), last.day.to_numpy(dtype=float)
+            first_year = np.maximum(last.year.to_numpy(dtype=float) + 1, self.reference.year)
+            for ahead in range(ANNUAL_YEARS_AHEAD + 1):
+                year = first_year + ahead
+                later = year <= self.reference.year + ANNUAL_YEARS_AHEAD
+                rows = np.concatenate([rows, cycle[later]])
+                keys = np.concatenate([keys, build_dates(year[later], month[later], day[later]).astype(np.int64)])
+
+        order = np.argsort(keys, kind='stable')
+        self.keys, self.rows = keys[order], rows[order]
+
+    def between(self, low, high):
+        """Sorted row positions with a deadline in [low, high)"""
+        start = np.searchsorted(self.keys, pd.Timestamp(low).as_unit('ns').value, side='left')
+        end = np.searchsorted(self.keys, pd.Timestamp(high).as_unit('ns').value, side='left')
+        return np.unique(self.rows[start:end])
+
+    def upcoming(self, days, start=None):
+        """Rows with a deadline from `start` (default: today) through `days` days later"""
+        start = today() if start is None else pd.Timestamp(start).normalize()
+        return self.between(start, start + pd.Timedelta(days=days + 1))
+
+    def dated(self):
+        """Sorted row positions with at least one deadline"""
+        return np.unique(self.rows)
+
+    def after(self, start):
+        """Sorted row positions with a deadline at or after `start`"""
+        begin = np.searchsorted(self.keys, pd.Timestamp(start).as_unit('ns').value, side='left')
+        return np.unique(self.rows[begin:])
+
+    def next_deadlines(self, reference=None):
+        """
+        Each row's first deadline on or after `reference` (default: now, so
+        a deadline today has passed, as in the deadline filters), else its
+        last one; NaT without any date
+        """
+        reference = pd.Timestamp.now() if reference is None else pd.Timestamp(reference)
+        result = np.full(self.n, np.datetime64('NaT'), dtype='datetime64[ns]')
+        # Keys are sorted: the first pair of a row is its earliest date,
+        # the last pair its latest
+        rows, positions = np.unique(self.rows[::-1], return_index=True)
+        result[rows] = self.keys[::-1][positions].astype('datetime64[ns]')
+        start = np.searchsorted(self.keys, reference.as_unit('ns').value, side='left')
+        rows, positions = np.unique(self.rows[start:], return_index=True)
+        result[rows] = self.keys[start:][positions].astype('datetime64[ns]')
+        return result
+
+
+def normalize_deadlines(df, reference=None):
+    """Add `deadline_next` and `deadline_rolling` to `df` (in place); returns the DeadlineIndex"""
+    index = DeadlineIndex(df, reference=reference)
+    df[DEADLINE_NEXT_COLUMN] = pd.Series(index.next_deadlines(reference), index=df.index)
+    df[DEADLINE_ROLLING_COLUMN] = pd.Series(index.rolling, index=df.index)
+    return index
@@ -0,0 +1,386 @@
+"""
+Duplicate detection for the merged research opportunities dataset
+Exact duplicates through a hash index, near-duplicates through MinHash/LSH
+
+The same programme often appears in several regional batches under
+different ids (and with "Multiple" vs "Multiple countries" style drift).
+Records are streamed once to build, per row:
+  - hash keys for exact matches (opportunity_id and the normalized
+    name/institution/website triple)
+  - a MinHash signature over the distinctive words of name + institution
+    and the normalized website
+Near-duplicate candidates come from LSH banding (rows sharing all values of
+one band), found by sorting band keys rather than comparing every pair, so
+the stage stays sub-quadratic. Candidates are confirmed on the exact
+Jaccard similarity of their (hashed) feature sets and grouped with union-find into clusters; each cluster
+gets a canonical record built from its most complete member.
+"""
+
+import argparse
+import csv
+import hashlib
+import os
+import re
+import unicodedata
+import zlib
+from urllib.parse import urlsplit
+
+import numpy as np
+import pandas as pd
+
+import dataset_store
+
+KEY_FIELDS = ['opportunity_name', 'institution_name', 'official_website']
+
+CLUSTERS_FILENAME = 'research_opportunities_clusters.csv'
+DEDUPLICATED_FILENAME = 'research_opportunities_deduplicated.csv'
+
+# MinHash / LSH parameters: 64 permutations in 16 bands of 4 rows puts the
+# LSH threshold around (1/16)^(1/4) ~ 0.5 estimated Jaccard similarity
+NUM_PERM = 64
+BANDS = 16
+SIMILARITY_THRESHOLD = 0.7
+
+# Words that every other programme shares; they say nothing about identity
+GENERIC_WORDS = {
+    'a', 'an', 'and', 'at', 'by', 'de', 'for', 'in', 'of', 'on', 'the', 'to',
+    'award', 'fellowship', 'fund', 'funding', 'grant', 'graduate', 'international',
+    'program', 'programme', 'research', 'scholarship', 'school', 'study', 'university',
+}
+
+# Buckets with more members are only compared against their first member
+MAX_BUCKET_PAIRWISE = 50
+
+MINHASH_PRIME = np.uint64(4294967291)  # largest prime below 2**32
+
+CHUNK_SIZE = 50000
+
+
+def normalize_text(value):
+    """Lowercase, strip accents and punctuation, collapse whitespace"""
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return ''
+    value = unicodedata.normalize('NFKD', str(value)).encode('ascii', 'ignore').decode()
+    return ' '.join(re.sub(r'[^a-z0-9]+', ' ', value.lower()).split())
+
+
+def normalize_url(value):
+    """Host without www plus path without trailing slash, e.g. 'daad.de/en'"""
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return ''
+    parts = urlsplit(str(value).strip().lower())
+    host = parts.netloc or parts.path.split('/')[0]
+    path = parts.path if parts.netloc else parts.path[len(host):]
+    return f"{host.removeprefix('www.')}{path.rstrip('/')}"
+
+
+def stem(word):
+    """Crude plural folding: 'fellowships' -> 'fellowship'"""
+    return word[:-1] if len(word) > 3 and word.endswith('s') and not word.endswith('ss') else word
+
+
+def record_features(name, institution, website):
+    """Distinctive words of name + institution, plus the website as one token"""
+    words = f'{normalize_text(name)} {normalize_text(institution)}'.split()
+    features = {stem(word) for word in words if len(word) > 1}
+    features -= GENERIC_WORDS
+    url = normalize_url(website)
+    if url:
+        features.add(f'url:{url}')
+    return features
+
+
+def exact_key(name, institution, website):
+    """64-bit hash of the normalized name/institution/website triple"""
+    text = '\x1f'.join((normalize_text(name), normalize_text(institution), normalize_url(website)))
+    return int.from_bytes(hashlib.blake2b(text.encode(), digest_size=8).digest(), 'little')
+
+
+# Key of a row without name, institution and website: never an exact match
+EMPTY_KEY = exact_key(None, None, None)
+
+
+def feature_hashes(features):
+    """Sorted crc32 hashes of a feature set; kept per row to confirm candidates exactly"""
+    return np.unique(np.array([zlib.crc32(feature.encode()) for feature in features], dtype=np.uint32))
+
+
+class MinHasher:
+    """Vectorized MinHash with universal hashing (a*x + b) mod p over crc32 feature hashes"""
+
+    def __init__(self, num_perm=NUM_PERM, seed=20260213):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self.a = rng.integers(1, 2**31, size=num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, 2**31, size=num_perm, dtype=np.uint64)
+
+    def signatures(self, hashes, lengths):
+        """
+        (n, num_perm) uint32 signatures from the concatenated feature hashes
+        of n rows and their lengths; rows without features get all-max signatures
+        """
+        sigs = np.full((len(lengths), self.num_perm), np.iinfo(np.uint32).max, dtype=np.uint32)
+        present = np.flatnonzero(lengths)
+        if len(present) == 0:
+            return sigs
+        hashes = hashes.astype(np.uint64)
+        offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))[present]
+        permuted = (self.a[:, None] * hashes[None, :] + self.b[:, None]) % MINHASH_PRIME
+        sigs[present] = np.minimum.reduceat(permuted, offsets, axis=1).T.astype(np.uint32)
+        return sigs
+
+
+class UnionFind:
+    def __init__(self, n):
+        self.parent = np.arange(n)
+
+    def find(self, i):
+        parent = self.parent
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    def union(self, i, j):
+        ri, rj = self.find(i), self.find(j)
+        if ri != rj:
+            self.parent[max(ri, rj)] = min(ri, rj)
+        return ri != rj
+
+    def roots(self):
+        return np.array([self.find(i) for i in range(len(self.parent))])
+
+
+def equal_groups(keys):
+    """Groups (arrays of row positions) of equal values, found by sorting"""
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+    starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+    ends = np.r_[starts[1:], len(keys)]
+    return [order[s:e] for s, e in zip(starts, ends) if e - s > 1]
+
+
+def band_keys(sigs, bands=BANDS):
+    """One uint64 key per row and band, combining the band's signature values"""
+    rows = sigs.shape[1] // bands
+    multipliers = np.uint64(1000003) ** np.arange(rows, dtype=np.uint64)
+    for band in range(bands):
+        values = sigs[:, band * rows:(band + 1) * rows].astype(np.uint64)
+        yield (values * multipliers).sum(axis=1, dtype=np.uint64) + np.uint64(band)
+
+
+class DedupIndex:
+    """
+    Per-row hash keys, feature hashes, signatures and completeness, built
+    from streamed chunks
+    """
+
+    def __init__(self, hasher=None):
+        self.hasher = hasher or MinHasher()
+        self.ids, self.keys, self.sigs, self.completeness = [], [], [], []
+        self.hashes, self.lengths = [], []
+        self.rows = 0
+
+    def add(self, chunk):
+        values = {field: chunk[field].tolist() if field in chunk.columns else [None] * len(chunk)
+                  for field in KEY_FIELDS}
+        triples = list(zip(*(values[field] for field in KEY_FIELDS)))
+        self.ids.append(chunk['opportunity_id'].to_numpy(dtype=object))
+        self.keys.append(np.array([exact_key(*t) for t in triples], dtype=np.uint64))
+        per_row = [feature_hashes(record_features(*t)) for t in triples]
+        lengths = np.array([len(h) for h in per_row], dtype=np.int64)
+        hashes = np.concatenate(per_row) if per_row else np.array([], dtype=np.uint32)
+        self.hashes.append(hashes)
+        self.lengths.append(lengths)
+        self.sigs.append(self.hasher.signatures(hashes, lengths))
+        self.completeness.append(chunk.notna().sum(axis=1).to_numpy())
+        self.rows += len(chunk)
+
+    def finish(self):
+        self.ids = np.concatenate(self.ids) if self.ids else np.array([], dtype=object)
+        self.keys = np.concatenate(self.keys) if self.keys else np.array([], dtype=np.uint64)
+        self.sigs = (np.concatenate(self.sigs) if self.sigs
+                     else np.empty((0, self.hasher.num_perm), dtype=np.uint32))
+        self.completeness = np.concatenate(self.completeness) if self.completeness else np.array([])
+        self.hashes = np.concatenate(self.hashes) if self.hashes else np.array([], dtype=np.uint32)
+        self.lengths = np.concatenate(self.lengths) if self.lengths else np.array([], dtype=np.int64)
+        self.offsets = np.concatenate(([0], np.cumsum(self.lengths)))
+        return self
+
+    def features(self, i):
+        return self.hashes[self.offsets[i]:self.offsets[i + 1]]
+
+    def similarity(self, i, j):
+        """Exact Jaccard similarity of two rows' feature sets"""
+        a, b = self.features(i), self.features(j)
+        if len(a) == 0 or len(b) == 0:
+            return 0.0
+        shared = len(np.intersect1d(a, b, assume_unique=True))
+        return shared / (len(a) + len(b) - shared)
+
+
+def find_clusters(index, threshold=SIMILARITY_THRESHOLD):
+    """
+    Cluster rows of a finished DedupIndex. Returns a DataFrame with one row
+    per member of every multi-row cluster: position, opportunity_id,
+    cluster_id (the canonical opportunity_id), canonical_position, match and similarity.
+    """
+    n = index.rows
+    uf = UnionFind(n)
+    sigs = index.sigs
+
+    # Exact duplicates: hash index on opportunity_id and on the normalized key
+    ids = pd.Series(index.ids)
+    id_codes = pd.factorize(ids.fillna(''), sort=False)[0].astype(np.int64)
+    id_codes[ids.isna().to_numpy()] = -np.arange(1, ids.isna().sum() + 1)  # missing ids never match
+    unique = np.arange(n, dtype=np.uint64) | np.uint64(1 << 63)
+    key_codes = np.where(index.keys == EMPTY_KEY, unique, index.keys)  # nor do empty key triples
+    for codes in (id_codes, key_codes):
+        for group in equal_groups(codes):
+            for j in group[1:]:
+                uf.union(group[0], j)
+
+    # Near duplicates: LSH candidates confirmed on exact feature-set similarity
+    has_features = index.lengths > 0
+    for keys in band_keys(sigs):
+        keys = np.where(has_features, keys, unique)
+        for group in equal_groups(keys):
+            if len(group) <= MAX_BUCKET_PAIRWISE:
+                pairs = ((a, b) for k, a in enumerate(group) for b in group[k + 1:])
+            else:
+                pairs = ((group[0], b) for b in group[1:])
+            for a, b in pairs:
+                if uf.find(a) != uf.find(b) and index.similarity(a, b) >= threshold:
+                    uf.union(a, b)
+
+    roots = uf.roots()
+    members = np.flatnonzero(np.bincount(roots, minlength=n)[roots] > 1)
+    if len(members) == 0:
+        return pd.DataFrame(columns=['position', 'opportunity_id', 'cluster_id',
+                                     'canonical_position', 'match', 'similarity'])
+
+    clusters = pd.DataFrame({
+        'position': members,
+        'root': roots[members],
+        'opportunity_id': index.ids[members],
+        'completeness': index.completeness[members],
+    })
+    # Canonical member: most complete record, earliest in the (id-sorted) output on ties
+    canonical = (clusters.sort_values(['root', 'completeness', 'position'], ascending=[True, False, True])
+                 .drop_duplicates('root').set_index('root')['position'])
+    clusters['canonical_position'] = clusters['root'].map(canonical)
+    clusters['cluster_id'] = index.ids[clusters['canonical_position'].to_numpy()]
+
+    def match_type(row):
+        pos, can = row.position, row.canonical_position
+        if pos == can:
+            return 'canonical'
+        if index.ids[pos] == index.ids[can]:
+            return 'exact_id'
+        if key_codes[pos] == key_codes[can]:
+            return 'exact_key'
+        return 'near'
+
+    clusters['match'] = [match_type(row) for row in clusters.itertuples()]
+    clusters['similarity'] = [round(index.similarity(p, c), 3)
+                              for p, c in zip(clusters['position'], clusters['canonical_position'])]
+    return (clusters.drop(columns=['root', 'completeness'])
+            .sort_values(['cluster_id', 'position'])
+            .reset_index(drop=True)
+            [['position', 'opportunity_id', 'cluster_id', 'canonical_position', 'match', 'similarity']])
+
+
+def canonical_records(members):
+    """
+    Merge the rows of one cluster into a canonical record: the canonical
+    member's values (the first row), with gaps filled from the other members
+    by completeness, earlier members first on ties
+    """
+    others = members.iloc[1:]
+    others = others.iloc[np.argsort(-others.notna().sum(axis=1).to_numpy(), kind='stable')]
+    record = pd.concat([members.iloc[:1], others]).bfill().iloc[0]
+    return record
+
+
+def write_deduplicated(source, output_file, clusters, chunksize=CHUNK_SIZE):
+    """
+    Stream the merged dataset into a deduplicated copy: cluster members are
+    replaced by their canonical record at the canonical member's position
+    """
+    member_positions = set(clusters['position'])
+    canonical_of = dict(zip(clusters['position'], clusters['canonical_position']))
+    ids_of = clusters.groupby('canonical_position')['opportunity_id'].apply(
+        lambda ids: ' | '.join(sorted(set(ids))))
+
+    # Pass 1: collect full rows of cluster members only (memory ~ number of duplicates)
+    rows, position = {}, 0
+    for chunk in dataset_store.iter_dataset_chunks(source, chunksize=chunksize):
+        positions = np.arange(position, position + len(chunk))
+        take = np.isin(positions, list(member_positions))
+        for pos, (_, row) in zip(positions[take], chunk[take].iterrows()):
+            rows[pos] = row
+        position += len(chunk)
+
+    merged = {}
+    for canonical, group in clusters.groupby('canonical_position'):
+        members = pd.DataFrame([rows[pos] for pos in [canonical] + [p for p in group['position'] if p != canonical]])
+        merged[canonical] = canonical_records(members)
+
+    # Pass 2: write, dropping non-canonical members
+    tmp_file = f'{output_file}.tmp'
+    with open(tmp_file, 'w', encoding='utf-8', newline='') as f:
+        first, position = True, 0
+        for chunk in dataset_store.iter_dataset_chunks(source, chunksize=chunksize):
+            positions = np.arange(position, position + len(chunk))
+            chunk = chunk.set_axis(positions)
+            chunk['merged_opportunity_ids'] = pd.Series(pd.NA, index=positions, dtype=object)
+            keep = [pos for pos in positions if canonical_of.get(pos, pos) == pos]
+            chunk = chunk.loc[keep]
+            for pos in chunk.index.intersection(list(merged)):
+                chunk.loc[pos, merged[pos].index] = merged[pos].to_numpy()
+                chunk.loc[pos, 'merged_opportunity_ids'] = ids_of[pos]
+            chunk.to_csv(f, index=False, header=first, quoting=csv.QUOTE_ALL)
+            first = False
+            position = positions[-1] + 1 if len(positions) else position
+    os.replace(tmp_file, output_file)
+
+
+def run_dedup(source, out_dir, chunksize=CHUNK_SIZE, threshold=SIMILARITY_THRESHOLD):
+    """Dedup stage: cluster the merged dataset at `source`, write clusters + deduplicated CSVs"""
+    index = DedupIndex()
+    for chunk in dataset_store.iter_dataset_chunks(source, chunksize=chunksize):
+        index.add(chunk)
+    clusters = find_clusters(index.finish(), threshold)
+
+    os.makedirs(out_dir, exist_ok=True)
+    clusters_file = os.path.join(out_dir, CLUSTERS_FILENAME)
+    clusters.to_csv(clusters_file, index=False, encoding='utf-8', quoting=csv.QUOTE_ALL)
+    deduplicated_file = os.path.join(out_dir, DEDUPLICATED_FILENAME)
+    write_deduplicated(source, deduplicated_file, clusters, chunksize)
+
+    n_clusters = clusters['cluster_id'].nunique()
+    removed = len(clusters) - n_clusters
+    print(f"\n✓ Dedup: {n_clusters} duplicate cluster(s), {removed} row(s) folded into canonical records")
+    for match, count in clusters['match'].value_counts().items():
+        if match != 'canonical':
+            print(f"  {match}: {count}")
+    print(f"✓ Clusters saved: {clusters_file}")
+    print(f"✓ Deduplicated file saved: {deduplicated_file}")
+    return clusters
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Find duplicate research opportunities")
+    parser.add_argument('input', help="Merged dataset (CSV or Parquet)")
+    parser.add_argument('--out-dir', default=None, help="Output directory (default: next to the input)")
+    parser.add_argument('--threshold', type=float, default=SIMILARITY_THRESHOLD,
+                        help="Jaccard similarity for near-duplicates")
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    args = parser.parse_args(argv)
+    run_dedup(args.input, args.out_dir or os.path.dirname(os.path.abspath(args.input)),
+              args.chunk_size, args.threshold)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
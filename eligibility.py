@@ -0,0 +1,325 @@
+"""
+Nationality eligibility for the research opportunities dataset
+`nationality_eligibility` (or `citizenship_requirements`) is free text:
+"Open to all (non-EU/EEA)", "Regional: Commonwealth low and middle income
+countries", "Canadian citizens OR permanent residents OR developing country
+nationals", "African nationals only: Benin Burkina Faso ...".
+
+At ingestion every distinct text is parsed once into a canonical spec of
+countries and groups, stored as `eligible_nationalities`:
+
+    All - China                      open to all, Chinese nationals excluded
+    Commonwealth & Developing        Commonwealth countries that are developing
+    Canada + Developing              either of the alternatives
+    All - EEA, EU
+
+(missing when the text names no nationality). EligibilityIndex resolves each
+distinct spec to a country set once and keeps one packed bitset per country,
+so "eligible with my nationality" is a dictionary lookup.
+"""
+
+import re
+
+import numpy as np
+import pandas as pd
+
+# Free-text columns, in order of preference, and the canonical column
+# derived from them at ingestion
+ELIGIBILITY_SOURCE_COLUMNS = ['nationality_eligibility', 'citizenship_requirements']
+ELIGIBILITY_COLUMN = 'eligible_nationalities'
+
+REGIONS = {
+    'Sub-Saharan Africa': [
+        'Angola', 'Benin', 'Botswana', 'Burkina Faso', 'Burundi', 'Cabo Verde', 'Cameroon',
+        'Central African Republic', 'Chad', 'Comoros', 'Democratic Republic of the Congo',
+        'Republic of the Congo', "Côte d'Ivoire", 'Djibouti', 'Equatorial Guinea', 'Eritrea', 'Eswatini',
+        'Ethiopia', 'Gabon', 'Gambia', 'Ghana', 'Guinea', 'Guinea-Bissau', 'Kenya', 'Lesotho', 'Liberia',
+        'Madagascar', 'Malawi', 'Mali', 'Mauritania', 'Mauritius', 'Mozambique', 'Namibia', 'Niger',
+        'Nigeria', 'Rwanda', 'São Tomé and Príncipe', 'Senegal', 'Seychelles', 'Sierra Leone', 'Somalia',
+        'South Africa', 'South Sudan', 'Sudan', 'Tanzania', 'Togo', 'Uganda', 'Zambia', 'Zimbabwe',
+    ],
+    'North Africa': ['Algeria', 'Egypt', 'Libya', 'Morocco', 'Tunisia'],
+    'Middle East': [
+        'Bahrain', 'Iran', 'Iraq', 'Israel', 'Jordan', 'Kuwait', 'Lebanon', 'Oman', 'Palestine', 'Qatar',
+        'Saudi Arabia', 'Syria', 'Turkey', 'United Arab Emirates', 'Yemen',
+    ],
+    'East Asia': ['China', 'Hong Kong', 'Japan', 'Macau', 'Mongolia', 'North Korea', 'South Korea', 'Taiwan'],
+    'Southeast Asia': [
+        'Brunei', 'Cambodia', 'Indonesia', 'Laos', 'Malaysia', 'Myanmar', 'Philippines', 'Singapore',
+        'Thailand', 'Timor-Leste', 'Vietnam',
+    ],
+    'South Asia': ['Afghanistan', 'Bangladesh', 'Bhutan', 'India', 'Maldives', 'Nepal', 'Pakistan', 'Sri Lanka'],
+    'Central Asia': ['Kazakhstan', 'Kyrgyzstan', 'Tajikistan', 'Turkmenistan', 'Uzbekistan'],
+    'Western Europe': [
+        'Andorra', 'Austria', 'Belgium', 'Cyprus', 'Denmark', 'Finland', 'France', 'Germany', 'Greece',
+        'Iceland', 'Ireland', 'Italy', 'Liechtenstein', 'Luxembourg', 'Malta', 'Monaco', 'Netherlands',
+        'Norway', 'Portugal', 'San Marino', 'Spain', 'Sweden', 'Switzerland', 'United Kingdom',
+    ],
+    'Eastern Europe': [
+        'Albania', 'Armenia', 'Azerbaijan', 'Belarus', 'Bosnia and Herzegovina', 'Bulgaria', 'Croatia',
+        'Czechia', 'Estonia', 'Georgia', 'Hungary', 'Kosovo', 'Latvia', 'Lithuania', 'Moldova', 'Montenegro',
+        'North Macedonia', 'Poland', 'Romania', 'Russia', 'Serbia', 'Slovakia', 'Slovenia', 'Ukraine',
+    ],
+    'North America': ['Canada', 'United States'],
+    'Latin America': [
+        'Antigua and Barbuda', 'Argentina', 'Bahamas', 'Barbados', 'Belize', 'Bolivia', 'Brazil', 'Chile',
+        'Colombia', 'Costa Rica', 'Cuba', 'Dominica', 'Dominican Republic', 'Ecuador', 'El Salvador',
+        'Grenada', 'Guatemala', 'Guyana', 'Haiti', 'Honduras', 'Jamaica', 'Mexico', 'Nicaragua', 'Panama',
+        'Paraguay', 'Peru', 'Saint Kitts and Nevis', 'Saint Lucia', 'Saint Vincent and the Grenadines',
+        'Suriname', 'Trinidad and Tobago', 'Uruguay', 'Venezuela',
+    ],
+    'Oceania': [
+        'Australia', 'Fiji', 'Kiribati', 'Marshall Islands', 'Micronesia', 'Nauru', 'New Zealand', 'Palau',
+        'Papua New Guinea', 'Samoa', 'Solomon Islands', 'Tonga', 'Tuvalu', 'Vanuatu',
+    ],
+}
+
+COUNTRIES = sorted({country for members in REGIONS.values() for country in members})
+
+EU = ['Austria', 'Belgium', 'Bulgaria', 'Croatia', 'Cyprus', 'Czechia', 'Denmark', 'Estonia', 'Finland',
+      'France', 'Germany', 'Greece', 'Hungary', 'Ireland', 'Italy', 'Latvia', 'Lithuania', 'Luxembourg',
+      'Malta', 'Netherlands', 'Poland', 'Portugal', 'Romania', 'Slovakia', 'Slovenia', 'Spain', 'Sweden']
+EFTA = ['Iceland', 'Liechtenstein', 'Norway', 'Switzerland']
+
+COMMONWEALTH = [
+    'Antigua and Barbuda', 'Australia', 'Bahamas', 'Bangladesh', 'Barbados', 'Belize', 'Botswana', 'Brunei',
+    'Cameroon', 'Canada', 'Cyprus', 'Dominica', 'Eswatini', 'Fiji', 'Gabon', 'Gambia', 'Ghana', 'Grenada',
+    'Guyana', 'India', 'Jamaica', 'Kenya', 'Kiribati', 'Lesotho', 'Malawi', 'Malaysia', 'Maldives', 'Malta',
+    'Mauritius', 'Mozambique', 'Namibia', 'Nauru', 'New Zealand', 'Nigeria', 'Pakistan', 'Papua New Guinea',
+    'Rwanda', 'Saint Kitts and Nevis', 'Saint Lucia', 'Saint Vincent and the Grenadines', 'Samoa',
+    'Seychelles', 'Sierra Leone', 'Singapore', 'Solomon Islands', 'South Africa', 'Sri Lanka', 'Tanzania',
+    'Togo', 'Tonga', 'Trinidad and Tobago', 'Tuvalu', 'Uganda', 'United Kingdom', 'Vanuatu', 'Zambia',
+]
+
+# High-income economies (World Bank) plus Russia: everything else counts as
+# developing, close to the OECD DAC list scholarships refer to
+DEVELOPED = EU + EFTA + [
+    'Andorra', 'Antigua and Barbuda', 'Australia', 'Bahamas', 'Bahrain', 'Barbados', 'Brunei', 'Canada',
+    'Chile', 'Guyana', 'Hong Kong', 'Israel', 'Japan', 'Kuwait', 'Macau', 'Monaco', 'New Zealand', 'Oman',
+    'Panama', 'Qatar', 'Russia', 'Saint Kitts and Nevis', 'San Marino', 'Saudi Arabia', 'Seychelles',
+    'Singapore', 'South Korea', 'Taiwan', 'Trinidad and Tobago', 'United Arab Emirates', 'United Kingdom',
+    'United States', 'Uruguay',
+]
+
+# Groups a text can name; income groups intersect with the places named next to them
+GROUPS = {
+    'EU': EU,
+    'EEA': EU + ['Iceland', 'Liechtenstein', 'Norway'],
+    'EFTA': EFTA,
+    'Commonwealth': COMMONWEALTH,
+    'Africa': REGIONS['Sub-Saharan Africa'] + REGIONS['North Africa'],
+    'Sub-Saharan Africa': REGIONS['Sub-Saharan Africa'],
+    'North Africa': REGIONS['North Africa'],
+    'Asia': REGIONS['East Asia'] + REGIONS['Southeast Asia'] + REGIONS['South Asia'] + REGIONS['Central Asia']
+            + REGIONS['Middle East'],
+    'Middle East': REGIONS['Middle East'],
+    'Europe': REGIONS['Western Europe'] + REGIONS['Eastern Europe'],
+    'Eastern Europe': REGIONS['Eastern Europe'],
+    'North America': REGIONS['North America'],
+    'Latin America': REGIONS['Latin America'],
+    'Oceania': REGIONS['Oceania'],
+    'Visegrad Group': ['Czechia', 'Hungary', 'Poland', 'Slovakia'],
+    'Western Balkans': ['Albania', 'Bosnia and Herzegovina', 'Kosovo', 'Montenegro', 'North Macedonia', 'Serbia'],
+    'Eastern Partnership': ['Armenia', 'Azerbaijan', 'Belarus', 'Georgia', 'Moldova', 'Ukraine'],
+}
+INCOME_GROUPS = {
+    'Developing': [country for country in COUNTRIES if country not in set(DEVELOPED)],
+    'Developed': sorted(set(DEVELOPED)),
+}
+ALL = 'All'
+
+# Lowercase phrases -> canonical term (country, group or "All"); country
+# names match themselves
+ALIASES = {
+    'open to all': ALL, 'all nationalities': ALL, 'any nationality': ALL, 'no restrictions': ALL,
+    'international': ALL, 'internationally': ALL, 'global': ALL, 'globally': ALL, 'worldwide': ALL,
+    'all countries': ALL,
+    'eu': 'EU', 'european union': 'EU', 'eea': 'EEA', 'efta': 'EFTA', 'commonwealth': 'Commonwealth',
+    'africa': 'Africa', 'african': 'Africa', 'african union': 'Africa',
+    'sub-saharan africa': 'Sub-Saharan Africa', 'sub-saharan african': 'Sub-Saharan Africa',
+    'north africa': 'North Africa', 'north african': 'North Africa',
+    'asia': 'Asia', 'asian': 'Asia', 'middle east': 'Middle East', 'middle eastern': 'Middle East',
+    'mena': 'Middle East',
+    'europe': 'Europe', 'european': 'Europe', 'eastern europe': 'Eastern Europe', 'eastern european': 'Eastern Europe',
+    'north america': 'North America', 'north american': 'North America',
+    'latin america': 'Latin America', 'latin american': 'Latin America', 'south america': 'Latin America',
+    'caribbean': 'Latin America', 'oceania': 'Oceania', 'pacific': 'Oceania',
+    'v4': 'Visegrad Group', 'visegrad': 'Visegrad Group', 'western balkans': 'Western Balkans',
+    'eastern partnership': 'Eastern Partnership',
+    'developing': 'Developing', 'low and middle income': 'Developing', 'low- and middle-income': 'Developing',
+    'low-income': 'Developing', 'lmic': 'Developing', 'lmics': 'Developing', 'emerging': 'Developing',
+    'global south': 'Developing', 'oda eligible': 'Developing',
+    'developed': 'Developed', 'industrialized': 'Developed', 'industrialised': 'Developed',
+    'high-income': 'Developed', 'high income': 'Developed',
+    'u.s.': 'United States', 'usa': 'United States', 'american': 'United States', 'uk': 'United Kingdom',
+    'u.k.': 'United Kingdom', 'british': 'United Kingdom', 'britain': 'United Kingdom',
+    'korea': 'South Korea', 'korean': 'South Korea', 'czech republic': 'Czechia', 'czech': 'Czechia',
+    'ivory coast': "Côte d'Ivoire", "cote d'ivoire": "Côte d'Ivoire", 'drc': 'Democratic Republic of the Congo',
+    'swaziland': 'Eswatini', 'türkiye': 'Turkey', 'hong kong sar': 'Hong Kong', 'burma': 'Myanmar',
+    'canadian': 'Canada', 'chinese': 'China', 'japanese': 'Japan', 'indian': 'India', 'singaporean': 'Singapore',
+    'german': 'Germany', 'french': 'France', 'italian': 'Italy', 'spanish': 'Spain', 'dutch': 'Netherlands',
+    'swiss': 'Switzerland', 'swedish': 'Sweden', 'danish': 'Denmark', 'norwegian': 'Norway',
+    'finnish': 'Finland', 'irish': 'Ireland', 'australian': 'Australia', 'new zealander': 'New Zealand',
+    'mexican': 'Mexico', 'brazilian': 'Brazil', 'saudi': 'Saudi Arabia', 'emirati': 'United Arab Emirates',
+    'nigerian': 'Nigeria', 'kenyan': 'Kenya', 'ghanaian': 'Ghana', 'ethiopian': 'Ethiopia',
+    'south african': 'South Africa', 'egyptian': 'Egypt', 'pakistani': 'Pakistan', 'bangladeshi': 'Bangladesh',
+    'indonesian': 'Indonesia', 'vietnamese': 'Vietnam', 'filipino': 'Philippines', 'thai': 'Thailand',
+    'malaysian': 'Malaysia', 'taiwanese': 'Taiwan', 'russian': 'Russia', 'ukrainian': 'Ukraine',
+    'turkish': 'Turkey', 'israeli': 'Israel', 'iranian': 'Iran',
+}
+ALIASES.update({country.lower(): country for country in COUNTRIES})
+
+# Matched in this case only ("US citizens", not the pronoun "us")
+CASE_SENSITIVE_ALIASES = {'US': 'United States'}
+
+# Longest phrases first, so "Sub-Saharan African" is not read as "African"
+TERM_PATTERN = re.compile(
+    r'(?<![\w.])(' + '|'.join(
+        sorted([re.escape(alias) for alias in ALIASES] + [f'(?-i:{re.escape(alias)})' for alias in CASE_SENSITIVE_ALIASES],
+               key=len, reverse=True)) + r')(?![\w])',
+    re.IGNORECASE,
+)
+# Terms after one of these, up to the end of the clause, are excluded
+EXCLUSION_PATTERN = re.compile(r'\bnon[- ]|\b(?:excluding|except|other than|not)\b', re.IGNORECASE)
+CLAUSE_END = re.compile(r'[();]')
+# Between a wider place and smaller ones: the smaller ones enumerate it
+ENUMERATION = re.compile(r'\bonly\b|:', re.IGNORECASE)
+ALTERNATIVE_SPLIT = re.compile(r'\bor\b|\+|;|\bplus\b', re.IGNORECASE)
+
+
+def alias_term(alias):
+    return ALIASES.get(alias.lower()) or CASE_SENSITIVE_ALIASES[alias]
+
+
+def narrow_places(part, spans):
+    """
+    Places of one alternative ({term: (start, end)} of their first mention):
+    "African nationals only: Benin Burkina Faso ..." keeps the countries
+    enumerated after the wider place, while "EU/EEA nationals" keeps both
+    """
+    return {place for place, (_, end) in spans.items()
+            if not any(other != place and start > end and term_countries(other) < term_countries(place)
+                       and ENUMERATION.search(part[end:start])
+                       for other, (start, _) in spans.items())}
+
+
+def parse_eligibility(text):
+    """Canonical spec of one eligibility text, or None when it names no nationality"""
+    if not isinstance(text, str) or not text.strip():
+        return None
+    alternatives, excluded = set(), set()
+    named = False
+    for part in ALTERNATIVE_SPLIT.split(text):
+        spans, incomes, universal = {}, set(), False
+        for match in TERM_PATTERN.finditer(part):
+            term = alias_term(match.group(1))
+            clause = CLAUSE_END.split(part[:match.start()])[-1]
+            if EXCLUSION_PATTERN.search(clause):
+                excluded.add(term)
+            elif term == ALL:
+                universal = True
+            elif term in INCOME_GROUPS:
+                incomes.add(term)
+            else:
+                spans.setdefault(term, match.span())
+        places = set(spans)
+        if universal:
+            alternatives.add(ALL)
+        elif places or incomes:
+            places = narrow_places(part, spans)
+            # "Japan ODA eligible country": a donor named next to an income
+            # group it is not part of restricts nothing
+            if places and incomes and not resolve(' & '.join([', '.join(places), ', '.join(incomes)])):
+                places = set()
+            alternative = ', '.join(sorted(places))
+            if incomes:
+                alternative = ' & '.join(filter(None, [alternative, ', '.join(sorted(incomes))]))
+            alternatives.add(alternative)
+        named = named or universal or bool(places or incomes)
+    if not named:
+        if not excluded:
+            return None
+        alternatives.add(ALL)  # "Non-Japanese nationals only"
+    if ALL in alternatives:
+        alternatives = {ALL}
+    excluded.discard(ALL)
+    spec = ' + '.join(sorted(alternatives))
+    return f"{spec} - {', '.join(sorted(excluded))}" if excluded else spec
+
+
+def term_countries(term):
+    if term == ALL:
+        return set(COUNTRIES)
+    if term in GROUPS:
+        return set(GROUPS[term])
+    if term in INCOME_GROUPS:
+        return set(INCOME_GROUPS[term])
+    return {term} if term in ALIASES.values() else set()
+
+
+def resolve(spec):
+    """Set of countries a canonical spec admits"""
+    include, _, exclude = spec.partition(' - ')
+    countries = set()
+    for alternative in include.split(' + '):
+        places, _, incomes = alternative.partition(' & ')
+        if not incomes and places in INCOME_GROUPS:
+            places, incomes = '', places
+        allowed = set(COUNTRIES) if not places else set().union(*map(term_countries, places.split(', ')))
+        if incomes:
+            allowed &= set().union(*map(term_countries, incomes.split(', ')))
+        countries |= allowed
+    if exclude:
+        countries -= set().union(*map(term_countries, exclude.split(', ')))
+    return countries
+
+
+def eligibility_sources(columns):
+    return [col for col in ELIGIBILITY_SOURCE_COLUMNS if col in columns]
+
+
+def parse_eligibility_column(values):
+    """Vectorized over distinct values: each text is parsed once"""
+    codes, uniques = pd.factorize(values)
+    specs = np.array([parse_eligibility(text) for text in uniques] + [None], dtype=object)
+    return pd.Series(specs[codes], index=values.index, dtype='string')
+
+
+def add_eligibility_column(df):
+    """`eligible_nationalities` from the first eligibility column that names a nationality, row by row"""
+    sources = eligibility_sources(df.columns)
+    if not sources:
+        return df
+    specs = parse_eligibility_column(df[sources[0]])
+    for col in sources[1:]:
+        specs = specs.fillna(parse_eligibility_column(df[col]))
+    df[ELIGIBILITY_COLUMN] = specs
+    return df
+
+
+class EligibilityIndex:
+    """One packed bitset of eligible rows per country, plus the rows with no parsed eligibility"""
+
+    def __init__(self, df):
+        self.n = len(df)
+        if ELIGIBILITY_COLUMN in df.columns:
+            codes, specs = pd.factorize(df[ELIGIBILITY_COLUMN])
+        else:
+            codes, specs = np.full(self.n, -1), []
+        # Spec x country matrix (last row: no spec, code -1); specs are few,
+        # so countries sharing the same column share one bitset
+        self.countries = list(COUNTRIES)
+        self.position = {country: k for k, country in enumerate(self.countries)}
+        self.matrix = np.zeros((len(specs) + 1, len(self.countries)), dtype=bool)
+        for k, spec in enumerate(specs):
+            self.matrix[k, [self.position[country] for country in resolve(spec)]] = True
+        self.codes = codes
+        patterns, pattern_of = np.unique(self.matrix.T, axis=0, return_inverse=True)
+        bitsets = [np.packbits(pattern[codes]) for pattern in patterns]
+        self.bitsets = {country: bitsets[pattern_of[k]] for k, country in enumerate(self.countries)}
+        self.unknown = np.packbits(codes < 0)
+
+    def eligible(self, country, include_unknown=False):
+        """Bitset of rows open to nationals of `country`"""
+        bitset = self.bitsets[country]
+        return bitset | self.unknown if include_unknown else bitset
@@ -0,0 +1,515 @@
+"""
+Research Opportunities Dataset Explorer
+Comprehensive analysis and visualization of funding opportunities
+
+Headless report engine behind Manual.ipynb:
+  - every analysis prints its statistics and returns the charts it wants as
+    ChartSpec jobs (the data to plot and how to draw it)
+  - charts are rendered with the Agg backend in a process pool (--workers)
+  - a chart is skipped when the hash of its data, style and output settings
+    matches the one recorded in the output directory's manifest and the
+    file is still there, so a refresh only redraws what changed
+
+    python explore_dataset.py [dataset] --output-dir outputs --format svg
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import time
+import warnings
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import dataset_store
+import deadlines
+
+warnings.filterwarnings('ignore')
+
+DATASET_PATH = r'D:\D1\WTF\Hakathon\Data Batches\research_opportunities_complete.csv'
+OUTPUT_DIR = r'D:\D1\WTF\Hakathon\outputs'
+REPORT_FILENAME = 'dataset_summary_report.txt'
+
+CHART_FORMATS = ['png', 'svg', 'pdf']
+DPI = 300
+
+# Records the input hash of every chart written to an output directory
+MANIFEST_FILENAME = '.report_manifest.json'
+
+# Bump when the drawing code changes, so every chart is redrawn once
+RENDER_VERSION = 1
+
+MONTH_LABELS = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun',
+                'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+
+# One chart: `data` is the Series to plot, `kind` a pandas plot kind, `style`
+# the figure size, colors, titles and tick labels
+ChartSpec = namedtuple('ChartSpec', ['name', 'kind', 'data', 'style'])
+
+
+def load_dataset(filepath, columns=None):
+    """Load the merged dataset with proper error handling
+
+    Reads the typed Parquet copy next to the CSV when merge_batches.py wrote one.
+    `columns` (names or a predicate) loads only the columns an analysis needs.
+    Low-cardinality text becomes categorical and Yes/No flags booleans.
+    """
+    try:
+        df = dataset_store.load_dataset(filepath, columns=columns, compact=True)
+        print(f"✅ Loaded dataset: {len(df)} opportunities "
+              f"({df.memory_usage(deep=True).sum() / 1e6:.1f} MB in memory)")
+        return df
+    except Exception as e:
+        print(f"❌ Error loading dataset: {e}")
+        return None
+
+
+def basic_statistics(df):
+    """Generate basic statistics about the dataset"""
+    print("\n" + "="*80)
+    print("📊 BASIC DATASET STATISTICS")
+    print("="*80)
+
+    print(f"\n📝 Total Opportunities: {len(df)}")
+    print(f"📋 Total Columns: {len(df.columns)}")
+    print(f"🔢 Numeric Columns: {len(df.select_dtypes(include=[np.number]).columns)}")
+    print(f"📄 Text Columns: {len(df.select_dtypes(include=['object']).columns)}")
+
+    # Missing data analysis
+    print("\n🔍 Missing Data Analysis:")
+    missing = df.isnull().sum()
+    missing_pct = (missing / len(df)) * 100
+    missing_df = pd.DataFrame({
+        'Missing_Count': missing,
+        'Percentage': missing_pct
+    })
+    missing_df = missing_df[missing_df['Missing_Count'] > 0].sort_values('Missing_Count', ascending=False)
+
+    if len(missing_df) > 0:
+        print(missing_df.head(10).to_string())
+    else:
+        print("   No missing data! 🎉")
+
+    # Memory usage
+    print(f"\n💾 Memory Usage: {df.memory_usage(deep=True).sum() / 1024**2:.2f} MB")
+
+    return missing_df
+
+
+def geographic_analysis(df):
+    """Analyze geographic distribution of opportunities"""
+    print("\n" + "="*80)
+    print("🌍 GEOGRAPHIC ANALYSIS")
+    print("="*80)
+    charts = []
+
+    # Country distribution
+    if 'country' in df.columns:
+        country_counts = df['country'].value_counts()
+        print(f"\n📍 Top Countries (Total: {len(country_counts)}):")
+        print(country_counts.head(15).to_string())
+
+        charts.append(ChartSpec('country_distribution', 'barh', country_counts.head(15), dict(
+            figsize=(14, 6), color='steelblue', title='Top 15 Countries by Number of Opportunities',
+            xlabel='Number of Opportunities', ylabel='Country')))
+
+    # Region analysis
+    if 'region' in df.columns:
+        region_counts = df['region'].value_counts()
+        print(f"\n🌎 Regional Distribution:")
+        print(region_counts.to_string())
+
+        charts.append(ChartSpec('region_distribution', 'pie', region_counts, dict(
+            figsize=(10, 6), palette='Set2', title='Regional Distribution of Opportunities')))
+
+    return charts
+
+
+def funding_analysis(df):
+    """Analyze funding amounts and types"""
+    print("\n" + "="*80)
+    print("💰 FUNDING ANALYSIS")
+    print("="*80)
+    charts = []
+
+    # Opportunity types
+    if 'opportunity_type' in df.columns:
+        type_counts = df['opportunity_type'].value_counts()
+        print(f"\n📋 Opportunity Types:")
+        print(type_counts.to_string())
+
+        charts.append(ChartSpec('opportunity_types', 'bar', type_counts, dict(
+            figsize=(12, 6), color='coral', title='Distribution by Opportunity Type',
+            xlabel='Opportunity Type', ylabel='Count', rotation=45)))
+
+    # Funding amount analysis
+    funding_cols = ['funding_amount_min', 'funding_amount_max', 'funding_amount_avg']
+    available_cols = [col for col in funding_cols if col in df.columns]
+
+    if available_cols:
+        print(f"\n💵 Funding Statistics:")
+        for col in available_cols:
+            non_null = df[col].dropna()
+            if len(non_null) > 0:
+                print(f"\n   {col}:")
+                print(f"      Min:    ${non_null.min():,.2f}")
+                print(f"      Max:    ${non_null.max():,.2f}")
+                print(f"      Mean:   ${non_null.mean():,.2f}")
+                print(f"      Median: ${non_null.median():,.2f}")
+
+    # Currency distribution
+    if 'currency' in df.columns:
+        currency_counts = df['currency'].value_counts()
+        print(f"\n💱 Currency Distribution:")
+        print(currency_counts.to_string())
+
+    return charts
+
+
+def deadline_analysis(df):
+    """Analyze application deadlines"""
+    print("\n" + "="*80)
+    print("📅 DEADLINE ANALYSIS")
+    print("="*80)
+    charts = []
+
+    deadline_cols = [col for col in df.columns if dataset_store.is_deadline_column(col)]
+
+    for col in deadline_cols:
+        # Parsed once at merge time in the Parquet copy; parse here otherwise
+        try:
+            parsed_col = f'{col}{dataset_store.PARSED_SUFFIX}'
+            parsed = df[parsed_col] if parsed_col in df.columns else deadlines.parse_deadlines(df[col], col)
+            valid_dates = parsed.dropna()
+
+            if len(valid_dates) > 0:
+                print(f"\n📆 {col}:")
+                print(f"   Earliest: {valid_dates.min()}")
+                print(f"   Latest:   {valid_dates.max()}")
+                print(f"   Valid dates: {len(valid_dates)}/{len(df)}")
+
+                # Count by year
+                year_counts = valid_dates.dt.year.value_counts().sort_index()
+                print(f"\n   By Year:")
+                print(year_counts.to_string())
+
+                # Deadline distribution by month
+                if len(valid_dates) > 5:
+                    month_counts = valid_dates.dt.month.value_counts().reindex(range(1, 13), fill_value=0)
+                    charts.append(ChartSpec(f'deadline_months_{col}', 'bar', month_counts, dict(
+                        figsize=(12, 6), color='mediumseagreen', title=f'Deadline Distribution by Month - {col}',
+                        xlabel='Month', ylabel='Number of Opportunities', xticklabels=MONTH_LABELS)))
+        except Exception as e:
+            print(f"   ⚠️ Could not parse {col}: {e}")
+
+    if deadline_cols:
+        index = deadlines.DeadlineIndex(df, deadline_cols)
+        print(f"\n⏭️ Next deadlines (from {index.reference.date()}):")
+        for days in [30, 90, 365]:
+            print(f"   Within {days} days: {len(index.upcoming(days)):,}")
+        print(f"   Rolling / open: {int(index.rolling.sum()):,}")
+
+    return charts
+
+
+def eligibility_analysis(df):
+    """Analyze eligibility criteria"""
+    print("\n" + "="*80)
+    print("✅ ELIGIBILITY ANALYSIS")
+    print("="*80)
+    charts = []
+
+    # Career stage
+    if 'career_stage' in df.columns:
+        stage_counts = df['career_stage'].value_counts()
+        print(f"\n👨‍🎓 Career Stage Distribution:")
+        print(stage_counts.to_string())
+
+        charts.append(ChartSpec('career_stages', 'barh', stage_counts, dict(
+            figsize=(10, 6), color='mediumpurple', title='Opportunities by Career Stage',
+            xlabel='Number of Opportunities', ylabel='Career Stage')))
+
+    # Field of study
+    if 'field_of_study' in df.columns:
+        field_counts = df['field_of_study'].value_counts()
+        print(f"\n📚 Field of Study Distribution:")
+        print(field_counts.head(10).to_string())
+
+    # Nationality requirements
+    if 'nationality_requirement' in df.columns:
+        nat_counts = df['nationality_requirement'].value_counts()
+        print(f"\n🌐 Nationality Requirements (Top 10):")
+        print(nat_counts.head(10).to_string())
+
+    return charts
+
+
+def feature_analysis(df):
+    """Analyze program features"""
+    print("\n" + "="*80)
+    print("⭐ FEATURE ANALYSIS")
+    print("="*80)
+    charts = []
+
+    feature_cols = [col for col in df.columns if col.startswith('feature_')]
+
+    if feature_cols:
+        feature_summary = {}
+        for col in feature_cols:
+            if pd.api.types.is_bool_dtype(df[col]):
+                # Yes/No flags are loaded as booleans
+                feature_summary[col.replace('feature_', '')] = int(df[col].sum())
+            elif not pd.api.types.is_numeric_dtype(df[col]):
+                # Count Yes/No
+                counts = df[col].value_counts()
+                if 'Yes' in counts.index:
+                    feature_summary[col.replace('feature_', '')] = counts.get('Yes', 0)
+
+        if feature_summary:
+            feature_df = pd.DataFrame.from_dict(feature_summary, orient='index', columns=['Count'])
+            feature_df = feature_df.sort_values('Count', ascending=False)
+
+            print(f"\n✨ Most Common Features:")
+            print(feature_df.head(15).to_string())
+
+            charts.append(ChartSpec('program_features', 'barh', feature_df['Count'].head(15), dict(
+                figsize=(12, 8), color='gold', title='Top 15 Program Features',
+                xlabel='Number of Programs Offering', ylabel='Feature')))
+
+    return charts
+
+
+def competitiveness_analysis(df):
+    """Analyze acceptance rates and competitiveness"""
+    print("\n" + "="*80)
+    print("🎯 COMPETITIVENESS ANALYSIS")
+    print("="*80)
+    charts = []
+
+    if 'acceptance_rate_category' in df.columns:
+        comp_counts = df['acceptance_rate_category'].value_counts()
+        print(f"\n🏆 Acceptance Rate Categories:")
+        print(comp_counts.to_string())
+
+        charts.append(ChartSpec('competitiveness', 'pie', comp_counts, dict(
+            figsize=(10, 6), palette='RdYlGn_r', title='Competitiveness Distribution')))
+
+    if 'acceptance_rate_percent' in df.columns:
+        acc_rate = pd.to_numeric(df['acceptance_rate_percent'], errors='coerce').dropna()
+        if len(acc_rate) > 0:
+            print(f"\n📊 Acceptance Rate Statistics:")
+            print(f"   Min:    {acc_rate.min():.1f}%")
+            print(f"   Max:    {acc_rate.max():.1f}%")
+            print(f"   Mean:   {acc_rate.mean():.1f}%")
+            print(f"   Median: {acc_rate.median():.1f}%")
+
+    return charts
+
+
+def generate_summary_report(df, output_path):
+    """Generate a comprehensive text summary report"""
+    report_lines = []
+    report_lines.append("="*80)
+    report_lines.append("RESEARCH OPPORTUNITIES DATASET - COMPREHENSIVE SUMMARY REPORT")
+    report_lines.append("="*80)
+    report_lines.append("")
+
+    # Basic info
+    report_lines.append(f"Total Opportunities: {len(df)}")
+    report_lines.append(f"Total Columns: {len(df.columns)}")
+    report_lines.append("")
+
+    # Top countries
+    if 'country' in df.columns:
+        report_lines.append("TOP 10 COUNTRIES:")
+        for idx, (country, count) in enumerate(df['country'].value_counts().head(10).items(), 1):
+            report_lines.append(f"  {idx}. {country}: {count} opportunities")
+        report_lines.append("")
+
+    # Top institutions
+    if 'institution' in df.columns:
+        report_lines.append("TOP 10 INSTITUTIONS:")
+        for idx, (inst, count) in enumerate(df['institution'].value_counts().head(10).items(), 1):
+            report_lines.append(f"  {idx}. {inst}: {count} opportunities")
+        report_lines.append("")
+
+    # Opportunity types
+    if 'opportunity_type' in df.columns:
+        report_lines.append("OPPORTUNITY TYPES:")
+        for typ, count in df['opportunity_type'].value_counts().items():
+            report_lines.append(f"  • {typ}: {count}")
+        report_lines.append("")
+
+    # Save report
+    with open(output_path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(report_lines))
+
+    print(f"\n📄 Summary report saved to: {output_path}")
+
+
+ANALYSES = [geographic_analysis, funding_analysis, deadline_analysis, eligibility_analysis,
+            feature_analysis, competitiveness_analysis]
+
+
+def chart_hash(spec, fmt, dpi):
+    """Digest of everything a chart file depends on"""
+    digest = hashlib.sha256()
+    digest.update(repr((RENDER_VERSION, spec.name, spec.kind, sorted(spec.style.items()), fmt, dpi)).encode())
+    data = spec.data
+    digest.update(pd.util.hash_pandas_object(data.astype(float), index=False).to_numpy().tobytes())
+    digest.update('\x00'.join(map(str, data.index)).encode())
+    return digest.hexdigest()
+
+
+def use_agg_backend():
+    """Headless rendering: no display, no GUI toolkit (also the pool initializer)"""
+    import matplotlib
+    matplotlib.use('Agg')
+
+
+def render_chart(spec, path, dpi=DPI):
+    """Draw one chart into `path` (format from the extension); returns the seconds spent"""
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    started = time.perf_counter()
+    sns.set_style("whitegrid")
+    style = spec.style
+    plt.figure(figsize=style['figsize'])
+    if spec.kind == 'pie':
+        spec.data.plot(kind='pie', autopct='%1.1f%%', colors=sns.color_palette(style['palette']))
+        plt.ylabel('')
+    else:
+        spec.data.plot(kind=spec.kind, color=style['color'])
+        plt.xlabel(style['xlabel'], fontsize=12)
+        plt.ylabel(style['ylabel'], fontsize=12)
+    plt.title(style['title'], fontsize=16, fontweight='bold')
+    if 'xticklabels' in style:
+        plt.xticks(range(len(style['xticklabels'])), style['xticklabels'], rotation=0)
+    elif 'rotation' in style:
+        plt.xticks(rotation=style['rotation'], ha='right')
+    plt.tight_layout()
+
+    # Written aside and renamed, so an interrupted run never leaves a broken chart
+    tmp_path = f'{path}.tmp{Path(path).suffix}'
+    plt.savefig(tmp_path, dpi=dpi, bbox_inches='tight')
+    plt.close()
+    os.replace(tmp_path, path)
+    return time.perf_counter() - started
+
+
+def load_manifest(output_dir):
+    path = os.path.join(output_dir, MANIFEST_FILENAME)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_manifest(output_dir, manifest):
+    path = os.path.join(output_dir, MANIFEST_FILENAME)
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(path + '.tmp', path)
+
+
+def render_charts(charts, output_dir, fmt='png', dpi=DPI, workers=1, force=False):
+    """
+    Render the charts whose inputs changed, in a process pool when
+    workers > 1. Returns (rendered, skipped) file names.
+    """
+    manifest = load_manifest(output_dir)
+    jobs, skipped = [], []
+    for spec in charts:
+        filename = f'{spec.name}.{fmt}'
+        digest = chart_hash(spec, fmt, dpi)
+        path = os.path.join(output_dir, filename)
+        if not force and manifest.get(filename) == digest and os.path.exists(path):
+            skipped.append(filename)
+        else:
+            jobs.append((spec, path, filename, digest))
+
+    workers = min(workers, len(jobs))
+    specs, paths = [job[0] for job in jobs], [job[1] for job in jobs]
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers, initializer=use_agg_backend) as pool:
+            timings = list(pool.map(render_chart, specs, paths, [dpi] * len(jobs)))
+    else:
+        use_agg_backend()
+        timings = [render_chart(spec, path, dpi) for spec, path in zip(specs, paths)]
+
+    for (spec, path, filename, digest), seconds in zip(jobs, timings):
+        manifest[filename] = digest
+        print(f"   📊 Saved: {filename} ({seconds:.2f}s)")
+    for filename in skipped:
+        print(f"   ⏭️ Unchanged: {filename}")
+    save_manifest(output_dir, manifest)
+    return [job[2] for job in jobs], skipped
+
+
+def run_report(dataset_path=DATASET_PATH, output_dir=OUTPUT_DIR, fmt='png', dpi=DPI, workers=0, force=False):
+    """Every analysis, its charts and the summary report; True on success"""
+    if not Path(dataset_path).exists() and not dataset_store.parquet_path_for(dataset_path).exists():
+        print(f"❌ Dataset not found at: {dataset_path}")
+        print("   Please run merge_batches.py first!")
+        return False
+
+    # Load dataset
+    df = load_dataset(dataset_path)
+    if df is None:
+        return False
+
+    # Run all analyses; they only collect the charts
+    basic_statistics(df)
+    charts = []
+    for analysis in ANALYSES:
+        charts.extend(analysis(df))
+
+    print("\n" + "="*80)
+    print("🖼️ RENDERING CHARTS")
+    print("="*80)
+    os.makedirs(output_dir, exist_ok=True)
+    workers = workers if workers > 0 else (os.cpu_count() or 1)
+    started = time.perf_counter()
+    rendered, skipped = render_charts(charts, output_dir, fmt, dpi, workers, force)
+    print(f"\n   {len(rendered)} rendered, {len(skipped)} unchanged in {time.perf_counter() - started:.2f}s")
+
+    # Generate summary report
+    generate_summary_report(df, os.path.join(output_dir, REPORT_FILENAME))
+
+    print("\n" + "="*80)
+    print("✅ ANALYSIS COMPLETE!")
+    print("="*80)
+    print("\n📁 Generated Files:")
+    for spec in charts:
+        print(f"   • {spec.name}.{fmt}")
+    print(f"   • {REPORT_FILENAME}")
+    print(f"\n🎉 All visualizations saved to {output_dir}")
+    return True
+
+
+def main(argv=None):
+    """Main execution function"""
+    parser = argparse.ArgumentParser(description="Render the dataset analysis charts and summary report")
+    parser.add_argument('dataset', nargs='?', default=DATASET_PATH, help="Merged dataset (CSV or Parquet)")
+    parser.add_argument('--output-dir', default=OUTPUT_DIR, help="Directory for the charts and report")
+    parser.add_argument('--format', choices=CHART_FORMATS, default='png', help="Chart file format")
+    parser.add_argument('--dpi', type=int, default=DPI, help="Resolution of raster charts")
+    parser.add_argument('--workers', type=int, default=0,
+                        help="Render charts with this many processes (0 = one per CPU)")
+    parser.add_argument('--force', action='store_true', help="Redraw every chart, even unchanged ones")
+    args = parser.parse_args(argv)
+
+    print("\n🚀 Research Opportunities Dataset Explorer")
+    print("="*80)
+    ok = run_report(args.dataset, args.output_dir, args.format, args.dpi, args.workers, args.force)
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,128 @@
+"""
+Lazy, chunked export of the filtered opportunities
+Files are only written when a download is requested, streamed to disk chunk
+by chunk (CSV, gzip CSV or Parquet) and kept per filter state, so a repeated
+download is served from the existing file. Rows are read back from the
+merged file with every column, not from the dashboard's projected frame.
+"""
+
+import atexit
+import csv
+import gzip
+import io
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+import dataset_store
+import result_cache
+
+EXPORT_CHUNK_SIZE = 50000
+
+MAX_EXPORT_FILES = 16
+
+# format -> (label, file extension, MIME type)
+EXPORT_FORMATS = {
+    'csv': ('CSV', '.csv', 'text/csv'),
+    'csv.gz': ('CSV (gzip)', '.csv.gz', 'application/gzip'),
+    'parquet': ('Parquet', '.parquet', 'application/vnd.apache.parquet'),
+}
+
+
+def available_formats():
+    return [fmt for fmt in EXPORT_FORMATS if fmt != 'parquet' or dataset_store.parquet_available()]
+
+
+def iter_rows(dataset_path, positions=None, chunksize=EXPORT_CHUNK_SIZE):
+    """
+    The rows at `positions` (row numbers of the merged file; every row when
+    None) with all their columns, streamed in file order one chunk at a time.
+    The first chunk is always yielded, so an empty selection keeps its header
+    """
+    if positions is not None:
+        positions = np.sort(np.asarray(positions, dtype=np.int64))
+    start = 0
+    for chunk in dataset_store.iter_dataset_chunks(dataset_store.source_path_for(dataset_path),
+                                                   chunksize=chunksize):
+        end = start + len(chunk)
+        if positions is None:
+            yield chunk
+        else:
+            first, last = np.searchsorted(positions, [start, end])
+            if last > first or start == 0:
+                yield chunk.iloc[positions[first:last] - start]
+        start = end
+
+
+def write_csv(chunks, binary):
+    with io.TextIOWrapper(binary, encoding='utf-8', newline='') as text:
+        for number, chunk in enumerate(chunks):
+            chunk.to_csv(text, index=False, header=number == 0, quoting=csv.QUOTE_MINIMAL)
+
+
+def write_parquet(chunks, path):
+    pa, pq = dataset_store.pa, dataset_store.pq
+    writer = None
+    try:
+        for chunk in chunks:
+            if writer is None:
+                schema = pa.Schema.from_pandas(chunk.iloc[:0], preserve_index=False)
+                writer = pq.ParquetWriter(path, schema, compression='zstd')
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def write_export(chunks, fmt, path):
+    """Write DataFrame `chunks` to `path` in `fmt`, one at a time (via a temp file, then renamed)"""
+    fd, tmp_path = tempfile.mkstemp(suffix='.tmp', dir=os.path.dirname(path) or '.')
+    os.close(fd)
+    if fmt == 'parquet':
+        write_parquet(chunks, tmp_path)
+    elif fmt == 'csv.gz':
+        with gzip.open(tmp_path, 'wb') as binary:
+            write_csv(chunks, binary)
+    else:
+        with open(tmp_path, 'wb') as binary:
+            write_csv(chunks, binary)
+    os.replace(tmp_path, path)
+    return path
+
+
+class ExportCache:
+    """Export files on disk, one per (filter state, format), evicted LRU"""
+
+    def __init__(self, directory=None, max_files=MAX_EXPORT_FILES):
+        if directory is None:
+            directory = tempfile.mkdtemp(prefix='opportunity_exports_')
+            atexit.register(shutil.rmtree, directory, ignore_errors=True)
+        self.directory = directory
+        self.files = result_cache.LRUCache(max_files, on_evict=self._remove)
+
+    @staticmethod
+    def _remove(key, path):
+        if os.path.exists(path):
+            os.remove(path)
+
+    def path(self, dataset_path, positions, filter_key, fmt, version=None):
+        """
+        Path of the export of the rows at `positions` for this filter state,
+        written on first request; `version` is the dataset version the
+        positions refer to
+        """
+        def build():
+            if version is not None and dataset_store.dataset_version(dataset_path) != version:
+                raise RuntimeError("The dataset changed since it was loaded, please reload the page")
+            name = f'export_{abs(hash((filter_key, fmt))):x}{EXPORT_FORMATS[fmt][1]}'
+            return write_export(iter_rows(dataset_path, positions), fmt, os.path.join(self.directory, name))
+        return self.files.get_or_compute((filter_key, fmt), build)
+
+    def clear(self):
+        self.files.clear()
+
+    def read(self, dataset_path, positions, filter_key, fmt, version=None):
+        with open(self.path(dataset_path, positions, filter_key, fmt, version), 'rb') as f:
+            return f.read()
@@ -0,0 +1,121 @@
+"""
+Inverted filter index for the research opportunities dashboard
+Built once per loaded dataset so sidebar filters never re-scan or copy the frame
+
+  - categorical columns: one packed NumPy bitset per distinct value
+  - numeric and date columns: row positions sorted by value, so a range
+    is two binary searches, plus a bitset of missing values
+
+Filters combine as bitwise ANDs of packed bitsets (n/8 bytes each) and
+the result is turned into row positions once, for a single `df.take`.
+"""
+
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+
+
+def pack(mask):
+    return np.packbits(mask)
+
+
+class FilterIndex:
+    """Bitsets and sorted positions for the filterable columns of one DataFrame"""
+
+    def __init__(self, df, categorical=(), numeric=()):
+        self.n = len(df)
+        self.full = pack(np.ones(self.n, dtype=bool))
+        self.empty = pack(np.zeros(self.n, dtype=bool))
+        self.categories = {}
+        self.bitsets = {}
+        self.sorted = {}
+
+        for col in categorical:
+            if col not in df.columns:
+                continue
+            codes, uniques = pd.factorize(df[col], sort=True)
+            self.categories[col] = list(uniques)
+            # Positions grouped by code: one pass to build every value's bitset
+            order = np.argsort(codes, kind='stable')
+            bounds = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+            bitsets = []
+            for k in range(len(uniques)):
+                mask = np.zeros(self.n, dtype=bool)
+                mask[order[bounds[k]:bounds[k + 1]]] = True
+                bitsets.append(pack(mask))
+            self.bitsets[col] = bitsets
+
+        for col in numeric:
+            if col not in df.columns:
+                continue
+            values = df[col]
+            missing = values.isna().to_numpy()
+            if pd.api.types.is_datetime64_any_dtype(values):
+                keys = values.to_numpy(dtype='datetime64[ns]').astype(np.int64)
+            else:
+                keys = values.to_numpy(dtype=float, na_value=np.nan)
+            present = np.flatnonzero(~missing)
+            order = present[np.argsort(keys[present], kind='stable')]
+            self.sorted[col] = (keys[order], order, pack(missing))
+
+    def has(self, col):
+        return col in self.bitsets or col in self.sorted
+
+    def values(self, col):
+        """Distinct non-missing values of a categorical column, sorted"""
+        return self.categories.get(col, [])
+
+    def equals(self, col, value):
+        """Bitset of rows whose categorical column equals `value`"""
+        try:
+            return self.bitsets[col][self.categories[col].index(value)]
+        except ValueError:
+            return self.empty
+
+    def between(self, col, low, high, include_missing=False, inclusive_high=True):
+        """Bitset of rows with low <= value <= high (or < high); missing rows optionally kept"""
+        keys, order, missing = self.sorted[col]
+        low, high = self._key(low), self._key(high)
+        start = np.searchsorted(keys, low, side='left') if low is not None else 0
+        side = 'right' if inclusive_high else 'left'
+        end = np.searchsorted(keys, high, side=side) if high is not None else len(keys)
+        mask = np.zeros(self.n, dtype=bool)
+        mask[order[start:end]] = True
+        bitset = pack(mask)
+        return bitset | missing if include_missing else bitset
+
+    def missing(self, col):
+        return self.sorted[col][2]
+
+    def bounds(self, col, bitset=None):
+        """(min, max) of the non-missing values among the rows in `bitset`, or None"""
+        keys, order, _ = self.sorted[col]
+        if bitset is not None:
+            keys = keys[self.mask(bitset)[order]]
+        if len(keys) == 0:
+            return None
+        return keys[0], keys[-1]
+
+    def bitset(self, rows):
+        """Bitset of the given row positions"""
+        mask = np.zeros(self.n, dtype=bool)
+        mask[rows] = True
+        return pack(mask)
+
+    def mask(self, bitset):
+        return np.unpackbits(bitset, count=self.n).astype(bool)
+
+    def rows(self, bitset):
+        """Row positions selected by a bitset"""
+        return np.flatnonzero(self.mask(bitset))
+
+    def count(self, bitset):
+        return int(np.unpackbits(bitset, count=self.n).sum())
+
+    @staticmethod
+    def _key(value):
+        """Dates are indexed as int64 nanoseconds"""
+        if isinstance(value, (pd.Timestamp, np.datetime64, datetime, date)):
+            return pd.Timestamp(value).as_unit('ns').value
+        return value
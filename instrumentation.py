@@ -0,0 +1,268 @@
+"""
+Timing and memory instrumentation for the dashboard
+Spans around each stage of a script run (load, filters, search, every chart,
+the table...) record wall time and memory: the change in process RSS and,
+when allocation tracing is on, the peak of Python allocations inside the
+span (tracemalloc; costs time, so off by default). Filters report the rows
+going in and out, caches register their hit/miss counters.
+
+Everything is kept in one process-wide Recorder:
+  - the spans of each finished run (per thread, since every session's
+    script runs in its own thread), for the dashboard's Performance tab
+  - totals per span, filter and cache, exported as Prometheus text, to a
+    file and/or a local HTTP endpoint, and as one JSON line per run
+"""
+
+import json
+import os
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+RECENT_RUNS = 50
+
+METRIC_PREFIX = 'dashboard'
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4'
+
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def rss_bytes():
+    """Current resident set size (Linux /proc), None elsewhere"""
+    try:
+        with open('/proc/self/statm', 'rb') as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+
+class Recorder:
+    """Process-wide store of spans, filter row counts and cache statistics"""
+
+    def __init__(self, trace_allocations=False, recent_runs=RECENT_RUNS, log_path=None):
+        self.trace_allocations = trace_allocations
+        self.log_path = log_path
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.runs = deque(maxlen=recent_runs)
+        self.span_totals = {}      # (kind, name) -> count, seconds, max seconds, rss, alloc peak
+        self.filter_totals = {}    # filter -> count, rows in, rows out (last)
+        self.caches = {}           # name -> callable returning LRUCache-style stats
+        self.run_count = 0
+        if trace_allocations and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    # -- runs and spans
+
+    @contextmanager
+    def run(self, label='run'):
+        """One script run; yields its record (the spans are complete on exit)"""
+        record = {'label': label, 'started': time.time(), 'spans': [], 'filters': []}
+        self.local.run = record
+        self.local.stack = []
+        started = self.local.run_started = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record['seconds'] = time.perf_counter() - started
+            self.local.run = None
+            with self.lock:
+                self.runs.append(record)
+                self.run_count += 1
+            if self.log_path:
+                self.write_log(record)
+
+    @contextmanager
+    def span(self, name, kind='stage'):
+        """Time one piece of work; nested spans are recorded with their depth"""
+        stack = getattr(self.local, 'stack', None)
+        if stack is None:
+            stack = self.local.stack = []
+        tracing = self.trace_allocations and tracemalloc.is_tracing()
+        frame = {'child_peak': 0}
+        if tracing:
+            current, peak = tracemalloc.get_traced_memory()
+            if stack:
+                # The parent's peak so far would be lost by the reset below
+                stack[-1]['child_peak'] = max(stack[-1]['child_peak'], peak)
+            tracemalloc.reset_peak()
+            frame['alloc_start'] = current
+        stack.append(frame)
+        rss_start = rss_bytes()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - started
+            rss_end = rss_bytes()
+            stack.pop()
+            # Spans finish inner first; the offset into the run restores start order
+            offset = started - getattr(self.local, 'run_started', started)
+            span = {'kind': kind, 'name': name, 'depth': len(stack), 'offset': offset, 'seconds': seconds,
+                    'rss_delta': None if rss_start is None or rss_end is None else rss_end - rss_start,
+                    'alloc_peak': None}
+            if tracing:
+                _, peak = tracemalloc.get_traced_memory()
+                peak = max(peak, frame['child_peak'])
+                span['alloc_peak'] = max(0, peak - frame['alloc_start'])
+                if stack:
+                    stack[-1]['child_peak'] = max(stack[-1]['child_peak'], peak)
+            self._record_span(span)
+
+    def _record_span(self, span):
+        run = getattr(self.local, 'run', None)
+        if run is not None:
+            run['spans'].append(span)
+        with self.lock:
+            totals = self.span_totals.setdefault(
+                (span['kind'], span['name']),
+                {'count': 0, 'seconds': 0.0, 'max_seconds': 0.0, 'rss_delta': 0, 'alloc_peak': 0})
+            totals['count'] += 1
+            totals['seconds'] += span['seconds']
+            totals['max_seconds'] = max(totals['max_seconds'], span['seconds'])
+            totals['rss_delta'] += span['rss_delta'] or 0
+            totals['alloc_peak'] = max(totals['alloc_peak'], span['alloc_peak'] or 0)
+
+    def filter_rows(self, name, rows_in, rows_out):
+        """Rows entering and leaving one filter of the current run"""
+        run = getattr(self.local, 'run', None)
+        if run is not None:
+            run['filters'].append({'name': name, 'rows_in': rows_in, 'rows_out': rows_out})
+        with self.lock:
+            totals = self.filter_totals.setdefault(name, {'count': 0, 'rows_in': 0, 'rows_out': 0})
+            totals['count'] += 1
+            totals['rows_in'] = rows_in
+            totals['rows_out'] = rows_out
+
+    def register_cache(self, name, stats):
+        """`stats()` returns a dict with hits, misses, evictions, entries"""
+        with self.lock:
+            self.caches[name] = stats
+
+    # -- reports
+
+    def recent_runs(self):
+        with self.lock:
+            return list(self.runs)
+
+    def span_summary(self):
+        """Rows of per-span totals: kind, name, count, total/mean/max seconds, memory"""
+        with self.lock:
+            items = [(key, dict(value)) for key, value in self.span_totals.items()]
+        rows = []
+        for (kind, name), totals in sorted(items, key=lambda item: -item[1]['seconds']):
+            rows.append({
+                'kind': kind, 'name': name, 'count': totals['count'],
+                'total_s': totals['seconds'], 'mean_ms': 1000 * totals['seconds'] / totals['count'],
+                'max_ms': 1000 * totals['max_seconds'],
+                'rss_delta_mb': totals['rss_delta'] / 1e6,
+                'alloc_peak_mb': totals['alloc_peak'] / 1e6 if self.trace_allocations else None,
+            })
+        return rows
+
+    def cache_stats(self):
+        with self.lock:
+            caches = dict(self.caches)
+        return {name: stats() for name, stats in caches.items()}
+
+    def prometheus_text(self):
+        """All totals in the Prometheus text exposition format"""
+        p = METRIC_PREFIX
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f'# HELP {p}_{name} {help_text}')
+            lines.append(f'# TYPE {p}_{name} {kind}')
+            for labels, value in samples:
+                lines.append(f'{p}_{name}{_labels(labels)} {value}')
+
+        with self.lock:
+            spans = [(key, dict(value)) for key, value in sorted(self.span_totals.items())]
+            filters = [(key, dict(value)) for key, value in sorted(self.filter_totals.items())]
+            run_count = self.run_count
+        caches = sorted(self.cache_stats().items())
+
+        metric('runs_total', 'counter', 'Script runs', [((), run_count)])
+        span_labels = [((('kind', kind), ('name', name)), totals) for (kind, name), totals in spans]
+        metric('span_seconds_total', 'counter', 'Wall time spent in each span',
+               [(labels, f"{totals['seconds']:.6f}") for labels, totals in span_labels])
+        metric('span_count_total', 'counter', 'Times each span ran',
+               [(labels, totals['count']) for labels, totals in span_labels])
+        metric('span_seconds_max', 'gauge', 'Slowest run of each span',
+               [(labels, f"{totals['max_seconds']:.6f}") for labels, totals in span_labels])
+        if self.trace_allocations:
+            metric('span_alloc_peak_bytes', 'gauge', 'Largest Python allocation peak inside each span',
+                   [(labels, totals['alloc_peak']) for labels, totals in span_labels])
+        metric('filter_rows_in', 'gauge', 'Rows entering each filter (last run)',
+               [((('filter', name),), totals['rows_in']) for name, totals in filters])
+        metric('filter_rows_out', 'gauge', 'Rows left by each filter (last run)',
+               [((('filter', name),), totals['rows_out']) for name, totals in filters])
+        for field, kind in [('hits', 'counter'), ('misses', 'counter'), ('evictions', 'counter'),
+                            ('entries', 'gauge'), ('hit_rate', 'gauge')]:
+            suffix = '_total' if kind == 'counter' else ''
+            metric(f'cache_{field}{suffix}', kind, f'Cache {field.replace("_", " ")}',
+                   [((('cache', name),), stats.get(field, 0)) for name, stats in caches])
+        rss = rss_bytes()
+        if rss is not None:
+            metric('process_rss_bytes', 'gauge', 'Resident set size of the dashboard process', [((), rss)])
+        return '\n'.join(lines) + '\n'
+
+    # -- exports
+
+    def write_log(self, record):
+        """Append one run as a JSON line"""
+        line = json.dumps({
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(record['started'])),
+            'label': record['label'],
+            'seconds': round(record['seconds'], 6),
+            'spans': [{key: value for key, value in span.items() if value is not None}
+                      for span in record['spans']],
+            'filters': record['filters'],
+        })
+        with self.lock:
+            with open(self.log_path, 'a', encoding='utf-8') as f:
+                f.write(line + '\n')
+
+    def write_prometheus(self, path):
+        """Write the metrics file atomically (textfile collector style)"""
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(self.prometheus_text())
+        os.replace(tmp_path, path)
+
+    def serve(self, port, host='127.0.0.1'):
+        """Serve GET /metrics on a local port from a daemon thread; returns the server"""
+        recorder = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = recorder.prometheus_text().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', PROMETHEUS_CONTENT_TYPE)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+        threading.Thread(target=server.serve_forever, name='metrics-endpoint', daemon=True).start()
+        return server
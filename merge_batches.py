@@ -1,10 +1,59 @@
 """
 Script to merge all 5 batch CSV files into one complete dataset
 Handles CSV parsing errors by reading with proper quoting
+
+The merge is a streaming pipeline so peak memory stays flat whatever the
+size of the batches:
+  1. each batch is read in bounded chunks, every chunk is sorted by
+     opportunity_id and spilled to a temporary run file
+  2. the sorted runs are k-way merged (external merge sort) block by block
+     straight into the output file
+  3. validation (duplicates, missing critical fields) and the summary
+     statistics are accumulated incrementally while the output is written
+
+Besides the QUOTE_ALL CSV, a typed Parquet copy (research_opportunities_complete.parquet,
+see dataset_store.py) is written from the same blocks (--format).
+
+Batches can be ingested in parallel (--workers N). Each batch is split into
+record-aligned byte ranges that are parsed with the fast pyarrow/C engine;
+only the ranges that fail drop to the tolerant python parser.
+
+With --incremental the sorted runs of every batch are kept in a cache next
+to the output, together with a manifest of per-batch content hashes and the
+row/byte ranges each batch occupies in the merged files. Only batches whose
+hash changed are re-ingested; their segments are spliced into the existing
+output while unchanged segments are copied over byte for byte.
+
+Every output file is replaced atomically; once all of them (and the search
+index) are in place a version stamp (research_opportunities_complete.version)
+is written, which the dashboard watches to hot-reload the new dataset.
 """
 
-import pandas as pd
+import argparse
+import csv
+import hashlib
+import io
+import json
 import os
+import re
+import shutil
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+import dataset_store
+import dedup
+import similar
+import text_search
+
+try:
+    import pyarrow  # noqa: F401
+    FAST_ENGINE = 'pyarrow'
+except ImportError:
+    FAST_ENGINE = 'c'
 
 # Define the batch file names
 batch_files = [
@@ -18,131 +67,855 @@ batch_files = [
 # Directory containing the batch files
 data_dir = '/mnt/user-data/outputs/'
 
-# List to store dataframes
-dfs = []
+OUTPUT_FILENAME = 'research_opportunities_complete.csv'
+
+# Rows held in memory at once, both while spilling batches and while merging runs
+CHUNK_SIZE = 50000
+
+# Target size of the byte ranges a batch is split into for the fast parser
+RANGE_BYTES = 32 * 1024 * 1024
+
+# Cache of per-batch sorted runs and the manifest used by --incremental
+CACHE_DIRNAME = '.merge_cache'
+MANIFEST_FILENAME = 'manifest.json'
+MANIFEST_VERSION = 1
+
+# Maximum number of run files merged in a single pass
+MERGE_FAN_IN = 64
+
+SORT_KEY = 'opportunity_id'
+
+# Read settings: the first one is tried, the second is the alternative parsing method
+CSV_READ_OPTIONS = {
+    'default': dict(
+        quotechar='"',
+        escapechar='\\',
+        on_bad_lines='warn',  # Warn about bad lines instead of failing
+    ),
+    'alternative': dict(
+        sep=',',
+        quotechar='"',
+        doublequote=True,
+        escapechar=None,
+    ),
+}
+
+# A backslash and the character it escapes (see CSV_READ_OPTIONS)
+ESCAPED_CHARACTER = re.compile(rb'\\.', re.DOTALL)
+
+critical_fields = [
+    'opportunity_id', 'opportunity_name', 'institution_name',
+    'program_type', 'country', 'nationality_eligibility',
+    'application_deadline', 'official_website', 'last_verified_date'
+]
+
+# (column, heading, top-n) reported in the dataset summary
+summary_fields = [
+    ('program_type', 'By Program Type', None),
+    ('region', 'By Region', None),
+    ('academic_level', 'By Academic Level', None),
+    ('field_of_study', 'Top 10 Fields of Study', 10),
+    ('award_currency', 'By Currency', None),
+]
+
+
+def split_byte_ranges(filepath, range_bytes=RANGE_BYTES):
+    """
+    Split a CSV file into (start, end) byte ranges that end on record boundaries.
+
+    A newline only ends a record when it is outside a quoted field, so the
+    scan tracks quote parity per line, reading escapes the way the parser
+    does (CSV_READ_OPTIONS): a backslash escapes the next character, so the
+    quote after an escaped backslash is a real one; doubled quotes ("")
+    leave the parity unchanged.
+    The first range is the header record.
+    """
+    ranges = []
+    with open(filepath, 'rb') as f:
+        start = pos = 0
+        in_quotes = False
+        header_done = False
+        for line in f:
+            pos += len(line)
+            quotes = line.count(b'"')
+            if quotes and b'\\' in line:
+                quotes = ESCAPED_CHARACTER.sub(b'', line).count(b'"')
+            if quotes % 2:
+                in_quotes = not in_quotes
+            if in_quotes:
+                continue
+            if not header_done or pos - start >= range_bytes:
+                ranges.append((start, pos))
+                start = pos
+                header_done = True
+        if pos > start:
+            ranges.append((start, pos))
+    return ranges
+
+
+def read_byte_range(filepath, start, end):
+    with open(filepath, 'rb') as f:
+        f.seek(start)
+        return f.read(end - start)
+
+
+def parse_range(header, data, engine):
+    """
+    Parse one byte range, re-prefixed with the header record so it parses
+    exactly like that part of the whole file would.
+    Strict for the fast engines, tolerant for python.
+    """
+    options = dict(CSV_READ_OPTIONS['default'])
+    if engine != 'python':
+        options['on_bad_lines'] = 'error'
+        return pd.read_csv(io.BytesIO(header + data), encoding='utf-8', dtype=str,
+                           engine=engine, **options)
+
+    # pandas turns surplus fields of the *first* data row into an implicit
+    # index instead of skipping it as a bad line; a well-formed sentinel row
+    # (the header itself) keeps bad first rows of a range handled like any other
+    df = pd.read_csv(io.BytesIO(header + header + data), encoding='utf-8', dtype=str,
+                     engine=engine, **options)
+    return df.iloc[1:].reset_index(drop=True)
+
+
+def read_batch_chunks(filepath, chunksize=CHUNK_SIZE, method='default', stats=None):
+    """
+    Yield a batch CSV as string-typed DataFrame chunks.
+
+    The default method parses record-aligned byte ranges with the fast
+    engine and re-parses only the failing ranges with the python engine.
+    The alternative method streams the whole file through the python
+    doublequote parser in chunks of chunksize rows.
+    """
+    if method != 'default':
+        yield from pd.read_csv(
+            filepath,
+            encoding='utf-8',
+            dtype=str,  # Keep the source text as-is; typing happens downstream
+            chunksize=chunksize,
+            engine='python',
+            **CSV_READ_OPTIONS[method]
+        )
+        return
+
+    ranges = split_byte_ranges(filepath, RANGE_BYTES)
+    header = read_byte_range(filepath, *ranges[0])
+    for start, end in ranges[1:]:
+        data = read_byte_range(filepath, start, end)
+        try:
+            chunk = parse_range(header, data, FAST_ENGINE)
+        except (pd.errors.ParserError, ValueError):
+            chunk = parse_range(header, data, 'python')
+            if stats is not None:
+                stats['python_ranges'] += 1
+        if stats is not None:
+            stats['ranges'] += 1
+        yield chunk
+
+
+def read_batch_columns(filepath, method='default'):
+    """Read only the header of a batch file"""
+    return list(pd.read_csv(
+        filepath, encoding='utf-8', nrows=0, engine='python', **CSV_READ_OPTIONS[method]
+    ).columns)
+
+
+def write_run(df, path):
+    """Write a sorted run file"""
+    df.to_csv(path, index=False, encoding='utf-8', quoting=csv.QUOTE_ALL)
+
+
+def read_run(path, chunksize):
+    """Stream a run file back in blocks"""
+    return pd.read_csv(path, encoding='utf-8', dtype=str, chunksize=chunksize)
+
+
+def spill_batch(filepath, spill_dir, chunksize=CHUNK_SIZE, method='default', stats=None):
+    """
+    Read one batch in chunks and spill every chunk as a sorted run file.
+
+    Rows without an opportunity_id cannot take part in the sort; they are
+    collected in separate runs that are appended after the sorted output.
+    Returns (sorted_runs, unkeyed_runs, row_count).
+    """
+    stem = os.path.splitext(os.path.basename(filepath))[0]
+    sorted_runs, unkeyed_runs = [], []
+    rows = 0
+    for n, chunk in enumerate(read_batch_chunks(filepath, chunksize, method, stats)):
+        rows += len(chunk)
+        keyed = chunk[SORT_KEY].notna() if SORT_KEY in chunk.columns else pd.Series(False, index=chunk.index)
+        if keyed.any():
+            path = os.path.join(spill_dir, f'{stem}_{method}_{n:06d}.csv')
+            run = chunk[keyed].sort_values(SORT_KEY, kind='mergesort')
+            write_run(run, path)
+            sorted_runs.append(path)
+            if stats is not None:
+                first, last = run[SORT_KEY].iloc[0], run[SORT_KEY].iloc[-1]
+                stats['id_min'] = first if stats.get('id_min') is None else min(stats['id_min'], first)
+                stats['id_max'] = last if stats.get('id_max') is None else max(stats['id_max'], last)
+        if not keyed.all():
+            path = os.path.join(spill_dir, f'{stem}_{method}_{n:06d}_unkeyed.csv')
+            write_run(chunk[~keyed], path)
+            unkeyed_runs.append(path)
+    return sorted_runs, unkeyed_runs, rows
+
+
+def iter_merged_blocks(runs, chunksize=CHUNK_SIZE):
+    """
+    K-way merge of sorted run files, yielding sorted blocks.
+
+    Each run contributes a buffer of chunksize / len(runs) rows. On every
+    step the smallest of the buffers' last keys is a safe bound: every row
+    at or below it, from all buffers, can be emitted in order. At least one
+    buffer is drained per step, so memory stays around chunksize rows.
+    """
+    block_rows = max(1000, chunksize // max(len(runs), 1))
+    readers = [iter(read_run(run, block_rows)) for run in runs]
+    buffers = [next(reader, None) for reader in readers]
+
+    while True:
+        active = [i for i, buf in enumerate(buffers) if buf is not None]
+        if not active:
+            break
+        bound = min(buffers[i][SORT_KEY].iloc[-1] for i in active)
+
+        parts = []
+        for i in active:
+            buf = buffers[i]
+            cut = buf[SORT_KEY].searchsorted(bound, side='right')
+            parts.append(buf.iloc[:cut])
+            if cut < len(buf):
+                buffers[i] = buf.iloc[cut:]
+            else:
+                buffers[i] = next(readers[i], None)
+
+        block = pd.concat(parts, ignore_index=True)
+        yield block.sort_values(SORT_KEY, kind='mergesort')
+
+
+def reduce_runs(runs, columns, spill_dir, chunksize=CHUNK_SIZE, fan_in=MERGE_FAN_IN):
+    """
+    Merge runs in passes until at most fan_in remain, to bound open files.
+    Intermediate runs are written with the full column list, since runs from
+    different batches may have different headers. Only runs living in
+    spill_dir are deleted once merged; cached runs are left alone.
+    """
+    level = 0
+    while len(runs) > fan_in:
+        merged = []
+        for g in range(0, len(runs), fan_in):
+            path = os.path.join(spill_dir, f'pass{level}_{g // fan_in:06d}.csv')
+            with open(path, 'w', encoding='utf-8', newline='') as f:
+                first = True
+                for block in iter_merged_blocks(runs[g:g + fan_in], chunksize):
+                    block.reindex(columns=columns).to_csv(f, index=False, header=first, quoting=csv.QUOTE_ALL)
+                    first = False
+            merged.append(path)
+        for run in runs:
+            if os.path.dirname(run) == spill_dir:
+                os.remove(run)
+        runs = merged
+        level += 1
+    return runs
+
+
+class MergeStats:
+    """Validation and summary statistics accumulated block by block"""
+
+    def __init__(self):
+        self.rows = 0
+        self.min_id = None
+        self.max_id = None
+        self.last_id = None
+        self.duplicates = 0
+        self.duplicate_ids = set()
+        self.missing = Counter()
+        self.columns_seen = set()
+        self.value_counts = {col: Counter() for col, _, _ in summary_fields}
+
+    def update(self, block):
+        self.rows += len(block)
+        self.columns_seen.update(block.columns)
+
+        # Output is sorted, so duplicates are adjacent (possibly across blocks)
+        keys = block[SORT_KEY].dropna() if SORT_KEY in block.columns else pd.Series(dtype=str)
+        if len(keys) > 0:
+            dup = keys.duplicated()
+            if self.last_id is not None and keys.iloc[0] == self.last_id:
+                dup.iloc[0] = True
+            self.duplicates += int(dup.sum())
+            self.duplicate_ids.update(keys[dup])
+            self.min_id = keys.iloc[0] if self.min_id is None else min(self.min_id, keys.iloc[0])
+            self.max_id = keys.iloc[-1] if self.max_id is None else max(self.max_id, keys.iloc[-1])
+            self.last_id = keys.iloc[-1]
+
+        for field in critical_fields:
+            if field in block.columns:
+                self.missing[field] += int(block[field].isna().sum())
+
+        for col, counts in self.value_counts.items():
+            if col in block.columns:
+                counts.update(block[col].dropna())
+
+    def merge(self, other):
+        """Fold in the stats of another output segment (segments must not interleave ids)"""
+        self.rows += other.rows
+        self.duplicates += other.duplicates
+        self.duplicate_ids |= other.duplicate_ids
+        self.missing.update(other.missing)
+        self.columns_seen |= other.columns_seen
+        for col, counts in other.value_counts.items():
+            self.value_counts.setdefault(col, Counter()).update(counts)
+        for value in (other.min_id, other.max_id):
+            if value is not None:
+                self.min_id = value if self.min_id is None else min(self.min_id, value)
+                self.max_id = value if self.max_id is None else max(self.max_id, value)
+        return self
+
+    def to_dict(self):
+        return dict(
+            rows=self.rows, min_id=self.min_id, max_id=self.max_id,
+            duplicates=self.duplicates, duplicate_ids=sorted(self.duplicate_ids),
+            missing=dict(self.missing), columns_seen=sorted(self.columns_seen),
+            value_counts={col: dict(counts) for col, counts in self.value_counts.items()},
+        )
+
+    @classmethod
+    def from_dict(cls, data):
+        stats = cls()
+        stats.rows = data['rows']
+        stats.min_id = data['min_id']
+        stats.max_id = data['max_id']
+        stats.last_id = data['max_id']
+        stats.duplicates = data['duplicates']
+        stats.duplicate_ids = set(data['duplicate_ids'])
+        stats.missing = Counter(data['missing'])
+        stats.columns_seen = set(data['columns_seen'])
+        for col, counts in data['value_counts'].items():
+            stats.value_counts[col] = Counter(counts)
+        return stats
+
+    def print_validation(self, n_columns):
+        print(f"\n✓ Merged dataset: {self.rows} total rows")
+        print(f"✓ Columns: {n_columns}")
+        print(f"✓ Opportunity IDs range: {self.min_id} to {self.max_id}")
+
+        if self.duplicates > 0:
+            print(f"\n✗ Warning: {self.duplicates} duplicate opportunity_id(s) found!")
+            print("Duplicate IDs:")
+            print(sorted(self.duplicate_ids))
+        else:
+            print("\n✓ No duplicate opportunity_id found")
+
+        print("\nChecking critical fields...")
+        for field in critical_fields:
+            if field in self.columns_seen:
+                missing = self.missing[field]
+                if missing > 0:
+                    print(f"  ✗ {field}: {missing} missing values")
+                else:
+                    print(f"  ✓ {field}: complete")
+            else:
+                print(f"  ✗ {field}: column not found!")
+
+    def print_summary(self):
+        print("\n" + "="*60)
+        print("DATASET SUMMARY")
+        print("="*60)
+        print(f"Total opportunities: {self.rows}")
+
+        for col, heading, top in summary_fields:
+            if col in self.columns_seen:
+                counts = pd.Series(dict(self.value_counts[col].most_common(top)), dtype='int64')
+                counts.index.name = col
+                print(f"\n{heading}:")
+                print(counts.to_string())
+
 
-# Read each batch file with proper CSV handling
-print("Reading batch files...")
-for i, filename in enumerate(batch_files, 1):
-    filepath = os.path.join(data_dir, filename)
-    if os.path.exists(filepath):
+def union_columns(column_lists):
+    """Union of batch columns in first-seen order (as pd.concat would produce)"""
+    columns = []
+    seen = set()
+    for cols in column_lists:
+        for col in cols:
+            if col not in seen:
+                seen.add(col)
+                columns.append(col)
+    return columns
+
+
+def ingest_batch(filepath, spill_dir, chunksize=CHUNK_SIZE):
+    """
+    Spill one batch to sorted runs, falling back to the alternative parser.
+
+    Runs in a worker process when ingesting in parallel, so progress
+    messages are returned for the parent to print in batch order.
+    """
+    filename = os.path.basename(filepath)
+    result = dict(filename=filename, messages=[], columns=None,
+                  sorted_runs=[], unkeyed_runs=[], rows=0, seconds=0.0,
+                  ranges=0, python_ranges=0, method=None, id_min=None, id_max=None)
+    if not os.path.exists(filepath):
+        result['messages'].append(f"✗ Warning: {filename} not found at {filepath}")
+        return result
+
+    stem = os.path.splitext(filename)[0]
+    for method in ('default', 'alternative'):
+        stats = Counter()
+        started = time.perf_counter()
         try:
-            # Read with proper quoting and error handling
-            df = pd.read_csv(
-                filepath,
-                encoding='utf-8',
-                quotechar='"',
-                escapechar='\\',
-                on_bad_lines='warn',  # Warn about bad lines instead of failing
-                engine='python'  # Use python engine for better error handling
-            )
-            print(f"✓ Batch {i}: {filename} - {len(df)} rows loaded")
-            dfs.append(df)
+            runs, unkeyed, rows = spill_batch(filepath, spill_dir, chunksize, method, stats)
+            columns = read_batch_columns(filepath, method)
         except Exception as e:
-            print(f"✗ Error reading {filename}: {str(e)}")
-            print(f"  Trying alternative parsing method...")
-            try:
-                # Try with different settings
-                df = pd.read_csv(
-                    filepath,
-                    encoding='utf-8',
-                    sep=',',
-                    quotechar='"',
-                    doublequote=True,
-                    escapechar=None,
-                    engine='python'
-                )
-                print(f"✓ Batch {i}: {filename} - {len(df)} rows loaded (alternative method)")
-                dfs.append(df)
-            except Exception as e2:
-                print(f"✗ Failed to read {filename}: {str(e2)}")
-    else:
-        print(f"✗ Warning: {filename} not found at {filepath}")
-
-# Concatenate all dataframes
-if dfs:
-    print("\n" + "="*60)
-    print("Merging all batches...")
-    print("="*60)
-    
-    # Check if all dataframes have the same columns
-    all_columns = [set(df.columns) for df in dfs]
-    if len(set(map(frozenset, all_columns))) > 1:
-        print("Warning: Not all batches have the same columns!")
-        for i, cols in enumerate(all_columns, 1):
-            print(f"  Batch {i}: {len(cols)} columns")
-    
-    complete_df = pd.concat(dfs, ignore_index=True)
-    
-    # Sort by opportunity_id
-    complete_df = complete_df.sort_values('opportunity_id').reset_index(drop=True)
-    
-    print(f"\n✓ Merged dataset: {len(complete_df)} total rows")
-    print(f"✓ Columns: {len(complete_df.columns)}")
-    print(f"✓ Opportunity IDs range: {complete_df['opportunity_id'].min()} to {complete_df['opportunity_id'].max()}")
-    
-    # Check for duplicates
-    duplicates = complete_df['opportunity_id'].duplicated().sum()
-    if duplicates > 0:
-        print(f"\n✗ Warning: {duplicates} duplicate opportunity_id(s) found!")
-        print("Duplicate IDs:")
-        print(complete_df[complete_df['opportunity_id'].duplicated(keep=False)]['opportunity_id'].unique())
-    else:
-        print("\n✓ No duplicate opportunity_id found")
-    
-    # Check for missing critical fields
-    critical_fields = [
-        'opportunity_id', 'opportunity_name', 'institution_name', 
-        'program_type', 'country', 'nationality_eligibility',
-        'application_deadline', 'official_website', 'last_verified_date'
-    ]
-    
-    print("\nChecking critical fields...")
-    for field in critical_fields:
-        if field in complete_df.columns:
-            missing = complete_df[field].isna().sum()
-            if missing > 0:
-                print(f"  ✗ {field}: {missing} missing values")
+            # Discard whatever this attempt already spilled
+            for path in os.listdir(spill_dir):
+                if path.startswith(f'{stem}_{method}_'):
+                    os.remove(os.path.join(spill_dir, path))
+            if method == 'default':
+                result['messages'].append(f"✗ Error reading {filename}: {str(e)}")
+                result['messages'].append("  Trying alternative parsing method...")
             else:
-                print(f"  ✓ {field}: complete")
+                result['messages'].append(f"✗ Failed to read {filename}: {str(e)}")
+            continue
+        result.update(columns=columns, sorted_runs=runs, unkeyed_runs=unkeyed, rows=rows,
+                      seconds=time.perf_counter() - started, method=method,
+                      ranges=stats['ranges'], python_ranges=stats['python_ranges'],
+                      id_min=stats.get('id_min'), id_max=stats.get('id_max'))
+        break
+    return result
+
+
+def format_batch_result(i, result):
+    """One progress line per loaded batch, with throughput"""
+    suffix = " (alternative method)" if result['method'] == 'alternative' else ""
+    seconds = result['seconds']
+    rate = result['rows'] / seconds if seconds > 0 else float('inf')
+    line = (f"✓ Batch {i}: {result['filename']} - {result['rows']} rows loaded{suffix}"
+            f" [{seconds:.2f}s, {rate:,.0f} rows/s")
+    if result['ranges']:
+        line += f", {result['python_ranges']}/{result['ranges']} ranges via python parser"
+    return line + "]"
+
+
+def ingest_batches(filepaths, spill_dirs, chunksize=CHUNK_SIZE, workers=1, numbers=None):
+    """
+    Spill every batch to sorted runs, in a process pool when workers > 1.
+
+    spill_dirs is one directory for all batches or one per batch; numbers
+    are the batch numbers shown in progress lines. Returns the ingest
+    results (see ingest_batch) of the batches that loaded.
+    """
+    if isinstance(spill_dirs, str):
+        spill_dirs = [spill_dirs] * len(filepaths)
+    numbers = numbers or range(1, len(filepaths) + 1)
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(ingest_batch, filepaths, spill_dirs, [chunksize] * len(filepaths)))
+    else:
+        results = [ingest_batch(filepath, spill_dir, chunksize)
+                   for filepath, spill_dir in zip(filepaths, spill_dirs)]
+
+    loaded = []
+    for number, result in zip(numbers, results):
+        for message in result['messages']:
+            print(message)
+        if result['columns'] is None:
+            continue
+        print(format_batch_result(number, result))
+        result['number'] = number
+        loaded.append(result)
+    return loaded
+
+
+class MergedOutput:
+    """
+    Destination of the merged blocks: the QUOTE_ALL CSV and/or the typed
+    Parquet copy. Both are written to temporary files and moved into place
+    on commit, so readers never see a half-written dataset. Rows, CSV byte
+    offsets and Parquet row groups are tracked so that segments of this
+    output can be spliced into the next one (see --incremental).
+    """
+
+    def __init__(self, csv_file, parquet_file, columns):
+        self.csv_file = str(csv_file) if csv_file else None
+        self.parquet_file = str(parquet_file) if parquet_file else None
+        self.columns = list(columns)
+        self.rows = 0
+        self.row_groups = 0
+        self.csv = None
+        self.parquet_writer = None
+        if self.csv_file:
+            self.csv = open(self.csv_file + '.tmp', 'wb')
+            self.csv.write(self._to_csv(pd.DataFrame(columns=self.columns), header=True))
+        if self.parquet_file:
+            self.parquet_writer = dataset_store.ParquetDatasetWriter(self.parquet_file + '.tmp', self.columns)
+
+    @staticmethod
+    def _to_csv(df, header=False):
+        return df.to_csv(index=False, header=header, quoting=csv.QUOTE_ALL).encode('utf-8')
+
+    def position(self):
+        return dict(rows=self.rows, bytes=self.csv.tell() if self.csv else 0, row_groups=self.row_groups)
+
+    def write(self, block):
+        block = block.reindex(columns=self.columns)
+        if self.csv:
+            self.csv.write(self._to_csv(block))
+        if self.parquet_writer:
+            self.parquet_writer.write(block)
+        self.rows += len(block)
+        self.row_groups += 1
+        return block
+
+    def copy_segment(self, previous, segment):
+        """Copy a segment of the previous output files without re-parsing it"""
+        if self.csv:
+            start, end = segment['bytes']
+            with open(previous['csv_file'], 'rb') as src:
+                src.seek(start)
+                remaining = end - start
+                while remaining > 0:
+                    data = src.read(min(remaining, 1 << 20))
+                    self.csv.write(data)
+                    remaining -= len(data)
+        if self.parquet_writer:
+            source = dataset_store.pq.ParquetFile(previous['parquet_file'])
+            for group in range(*segment['row_groups']):
+                self.parquet_writer.writer.write_table(source.read_row_group(group))
+        start, end = segment['rows']
+        self.rows += end - start
+        self.row_groups += segment['row_groups'][1] - segment['row_groups'][0]
+
+    def _close(self):
+        if self.csv:
+            self.csv.close()
+        if self.parquet_writer:
+            self.parquet_writer.close()
+
+    def commit(self):
+        self._close()
+        if self.csv_file:
+            os.replace(self.csv_file + '.tmp', self.csv_file)
+        if self.parquet_file:
+            os.replace(self.parquet_file + '.tmp', self.parquet_file)
+
+    def abort(self):
+        self._close()
+        for path in (self.csv_file, self.parquet_file):
+            if path and os.path.exists(path + '.tmp'):
+                os.remove(path + '.tmp')
+
+    def describe(self):
+        """Output files as recorded in the manifest, to detect outside changes"""
+        info = dict(csv_file=self.csv_file, parquet_file=self.parquet_file)
+        for key in ('csv_file', 'parquet_file'):
+            path = info[key]
+            info[key.replace('_file', '_size')] = os.path.getsize(path) if path else None
+        return info
+
+
+def write_merged(sorted_runs, unkeyed_runs, output, spill_dir, chunksize=CHUNK_SIZE):
+    """Merge runs into the output, validating as blocks are written"""
+    stats = MergeStats()
+    sorted_runs = reduce_runs(sorted_runs, output.columns, spill_dir, chunksize)
+
+    def blocks():
+        yield from iter_merged_blocks(sorted_runs, chunksize)
+        for run in unkeyed_runs:
+            yield from read_run(run, chunksize)
+
+    for block in blocks():
+        stats.update(output.write(block))
+    return stats
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for data in iter(lambda: f.read(1 << 20), b''):
+            digest.update(data)
+    return digest.hexdigest()
+
+
+def load_manifest(cache_dir):
+    path = os.path.join(cache_dir, MANIFEST_FILENAME)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        manifest = json.load(f)
+    return manifest if manifest.get('version') == MANIFEST_VERSION else {}
+
+
+def save_manifest(cache_dir, manifest):
+    path = os.path.join(cache_dir, MANIFEST_FILENAME)
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(path + '.tmp', path)
+
+
+def plan_segments(entries):
+    """
+    Order batches into output segments: keyed rows of each batch sorted by
+    their lowest opportunity_id, then the unkeyed rows in batch order.
+    Only possible when no two batches' id ranges overlap; returns None otherwise.
+    """
+    keyed = sorted((e for e in entries if e['id_min'] is not None), key=lambda e: e['id_min'])
+    for prev, nxt in zip(keyed, keyed[1:]):
+        if prev['id_max'] >= nxt['id_min']:
+            return None
+    plan = [(e['filename'], 'keyed') for e in keyed]
+    plan += [(e['filename'], 'unkeyed') for e in entries if e['unkeyed_runs']]
+    return plan
+
+
+def previous_output_usable(manifest, output, columns):
+    """The previous output can be spliced if nothing about its layout changed"""
+    previous = manifest.get('output')
+    if not previous or manifest.get('segments') is None or manifest.get('columns') != columns:
+        return False
+    for key in ('csv_file', 'parquet_file'):
+        path = previous[key]
+        if path != getattr(output, key):
+            return False
+        if path and (not os.path.exists(path) or
+                     os.path.getsize(path) != previous[key.replace('_file', '_size')]):
+            return False
+    return True
+
+
+def merge_incremental(filepaths, output_file, parquet_file, cache_dir, spill_dir,
+                      chunksize=CHUNK_SIZE, workers=1):
+    """
+    Re-ingest only the batches whose content hash changed and splice them
+    into the existing output. Returns (stats, columns), or None when no
+    batch could be loaded.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    manifest = load_manifest(cache_dir)
+    cached = manifest.get('batches', {})
+
+    def abspaths(paths):
+        return [os.path.join(cache_dir, path) for path in paths]
+
+    entries, changed = [], []
+    for number, filepath in enumerate(filepaths, 1):
+        filename = os.path.basename(filepath)
+        if not os.path.exists(filepath):
+            print(f"✗ Warning: {filename} not found at {filepath}")
+            continue
+        digest = file_sha256(filepath)
+        entry = cached.get(filename)
+        if (entry and entry['sha256'] == digest and
+                all(os.path.exists(run) for run in abspaths(entry['sorted_runs'] + entry['unkeyed_runs']))):
+            print(f"✓ Batch {number}: {filename} - unchanged, {entry['rows']} rows reused")
+            entries.append(dict(entry, changed=False))
+        else:
+            changed.append((number, filepath, digest))
+
+    if changed:
+        run_dirs = []
+        for _, filepath, digest in changed:
+            stem = os.path.splitext(os.path.basename(filepath))[0]
+            run_dir = os.path.join(cache_dir, f'{stem}-{digest[:16]}')
+            shutil.rmtree(run_dir, ignore_errors=True)
+            os.makedirs(run_dir)
+            run_dirs.append(run_dir)
+        results = ingest_batches([fp for _, fp, _ in changed], run_dirs, chunksize,
+                                 min(workers, len(changed)), [n for n, _, _ in changed])
+        digests = {os.path.basename(fp): digest for _, fp, digest in changed}
+        for result in results:
+            entries.append(dict(
+                filename=result['filename'], number=result['number'],
+                sha256=digests[result['filename']], rows=result['rows'],
+                columns=result['columns'], method=result['method'],
+                id_min=result['id_min'], id_max=result['id_max'],
+                sorted_runs=[os.path.relpath(run, cache_dir) for run in result['sorted_runs']],
+                unkeyed_runs=[os.path.relpath(run, cache_dir) for run in result['unkeyed_runs']],
+                changed=True,
+            ))
+
+    if not entries:
+        return None
+    entries.sort(key=lambda e: e['number'])
+    by_name = {e['filename']: e for e in entries}
+    columns = union_columns(e['columns'] for e in entries)
+    print(f"  {len(changed)} changed batch(es) re-ingested, {len(entries) - len(changed)} reused")
+
+    output = MergedOutput(output_file, parquet_file, columns)
+    plan = plan_segments(entries)
+    old_segments = {(seg['batch'], seg['kind']): seg for seg in manifest.get('segments') or []}
+    splice = plan is not None and previous_output_usable(manifest, output, columns)
+    segments = None
+    try:
+        if plan is None:
+            # Batches interleave ids: fall back to one global merge of the cached runs
+            print("  Batch id ranges overlap - merging all cached runs")
+            stats = write_merged(
+                [run for e in entries for run in abspaths(e['sorted_runs'])],
+                [run for e in entries for run in abspaths(e['unkeyed_runs'])],
+                output, spill_dir, chunksize)
         else:
-            print(f"  ✗ {field}: column not found!")
-    
-    # Save merged file
-    output_file = os.path.join(data_dir, 'research_opportunities_complete.csv')
-    complete_df.to_csv(output_file, index=False, encoding='utf-8', quoting=1)  # quoting=1 means QUOTE_ALL
-    print(f"\n✓ Merged file saved: {output_file}")
-    
-    # Display summary statistics
-    print("\n" + "="*60)
-    print("DATASET SUMMARY")
-    print("="*60)
-    print(f"Total opportunities: {len(complete_df)}")
-    
-    if 'program_type' in complete_df.columns:
-        print(f"\nBy Program Type:")
-        print(complete_df['program_type'].value_counts().to_string())
-    
-    if 'region' in complete_df.columns:
-        print(f"\nBy Region:")
-        print(complete_df['region'].value_counts().to_string())
-    
-    if 'academic_level' in complete_df.columns:
-        print(f"\nBy Academic Level:")
-        print(complete_df['academic_level'].value_counts().to_string())
-    
-    if 'field_of_study' in complete_df.columns:
-        print(f"\nTop 10 Fields of Study:")
-        print(complete_df['field_of_study'].value_counts().head(10).to_string())
-    
-    # Currency statistics
-    if 'award_currency' in complete_df.columns:
-        print(f"\nBy Currency:")
-        print(complete_df['award_currency'].value_counts().to_string())
-    
-    print("\n" + "="*60)
-    print("MERGE COMPLETE!")
-    print("="*60)
-    
-else:
-    print("\n✗ Error: No batch files found to merge!")
+            stats = MergeStats()
+            segments = []
+            previous = manifest.get('output')
+            copied = 0
+            for filename, kind in plan:
+                entry = by_name[filename]
+                old = old_segments.get((filename, kind))
+                start = output.position()
+                if splice and not entry['changed'] and old is not None:
+                    output.copy_segment(previous, old)
+                    segment_stats = MergeStats.from_dict(old['stats'])
+                    copied += 1
+                else:
+                    segment_stats = MergeStats()
+                    if kind == 'keyed':
+                        runs = reduce_runs(abspaths(entry['sorted_runs']), columns, spill_dir, chunksize)
+                        blocks = iter_merged_blocks(runs, chunksize)
+                    else:
+                        blocks = (block for run in abspaths(entry['unkeyed_runs'])
+                                  for block in read_run(run, chunksize))
+                    for block in blocks:
+                        segment_stats.update(output.write(block))
+                end = output.position()
+                segments.append(dict(
+                    batch=filename, kind=kind,
+                    rows=[start['rows'], end['rows']],
+                    bytes=[start['bytes'], end['bytes']],
+                    row_groups=[start['row_groups'], end['row_groups']],
+                    stats=segment_stats.to_dict(),
+                ))
+                stats.merge(segment_stats)
+            print(f"  {copied}/{len(plan)} output segment(s) spliced from the previous merge")
+        output.commit()
+    except BaseException:
+        output.abort()
+        raise
+
+    # Record the new state and drop runs no batch refers to any more
+    batches = {}
+    for e in entries:
+        batches[e['filename']] = {key: value for key, value in e.items() if key != 'changed'}
+    save_manifest(cache_dir, dict(
+        version=MANIFEST_VERSION, columns=columns, batches=batches,
+        output=output.describe(), segments=segments,
+    ))
+    live = {os.path.dirname(run) for e in entries for run in e['sorted_runs'] + e['unkeyed_runs']}
+    for name in os.listdir(cache_dir):
+        if os.path.isdir(os.path.join(cache_dir, name)) and name not in live:
+            shutil.rmtree(os.path.join(cache_dir, name), ignore_errors=True)
+
+    return stats, columns
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Merge research opportunity batch CSVs")
+    parser.add_argument('--data-dir', default=data_dir, help="Directory containing the batch files")
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help="Rows held in memory at once")
+    parser.add_argument('--spill-dir', default=None, help="Directory for temporary sorted runs")
+    parser.add_argument('--format', choices=['csv', 'parquet', 'both'], default='both',
+                        help="Merged output format(s); Parquet needs pyarrow")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Ingest batches in parallel with this many processes (0 = one per CPU)")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Only re-ingest batches whose content changed since the last merge")
+    parser.add_argument('--cache-dir', default=None,
+                        help=f"Run cache and manifest for --incremental (default: <data-dir>/{CACHE_DIRNAME})")
+    parser.add_argument('--dedup', action='store_true',
+                        help="Cluster duplicate opportunities and write a deduplicated copy")
+    args = parser.parse_args(argv)
+
+    filepaths = [os.path.join(args.data_dir, filename) for filename in batch_files]
+    workers = min(args.workers if args.workers > 0 else (os.cpu_count() or 1), len(filepaths))
+    spill_dir = tempfile.mkdtemp(prefix='merge_runs_', dir=args.spill_dir)
+
+    # Output file(s)
+    output_file = os.path.join(args.data_dir, OUTPUT_FILENAME)
+    parquet_file = None
+    if args.format in ('parquet', 'both'):
+        if dataset_store.parquet_available():
+            parquet_file = dataset_store.parquet_path_for(output_file)
+        else:
+            print("✗ Warning: pyarrow not installed, skipping Parquet output")
+    csv_file = output_file if args.format in ('csv', 'both') or parquet_file is None else None
+
+    try:
+        # Read each batch file with proper CSV handling
+        print("Reading batch files...")
+        started = time.perf_counter()
+
+        if args.incremental:
+            cache_dir = args.cache_dir or os.path.join(args.data_dir, CACHE_DIRNAME)
+            merged = merge_incremental(filepaths, csv_file, parquet_file, cache_dir, spill_dir,
+                                       args.chunk_size, workers)
+            if merged is None:
+                print("\n✗ Error: No batch files found to merge!")
+                return 1
+            stats, columns = merged
+            print(f"  Incremental merge finished in {time.perf_counter() - started:.2f}s")
+        else:
+            results = ingest_batches(filepaths, spill_dir, args.chunk_size, workers)
+            print(f"  Ingest finished in {time.perf_counter() - started:.2f}s ({workers} worker(s))")
+
+            if not results:
+                print("\n✗ Error: No batch files found to merge!")
+                return 1
+
+            print("\n" + "="*60)
+            print("Merging all batches...")
+            print("="*60)
+
+            # Check if all batches have the same columns
+            batch_columns = [result['columns'] for result in results]
+            if len(set(map(frozenset, batch_columns))) > 1:
+                print("Warning: Not all batches have the same columns!")
+                for result in results:
+                    print(f"  Batch {result['number']}: {len(result['columns'])} columns")
+            columns = union_columns(batch_columns)
+
+            # Merge sorted runs by opportunity_id into the output file(s)
+            output = MergedOutput(csv_file, parquet_file, columns)
+            try:
+                stats = write_merged(
+                    [run for result in results for run in result['sorted_runs']],
+                    [run for result in results for run in result['unkeyed_runs']],
+                    output, spill_dir, args.chunk_size)
+                output.commit()
+            except BaseException:
+                output.abort()
+                raise
+
+        stats.print_validation(len(columns))
+        for saved in (csv_file, parquet_file):
+            if saved:
+                print(f"\n✓ Merged file saved: {saved}")
+
+        # Display summary statistics
+        stats.print_summary()
+
+        # Full-text search and similarity indexes for the dashboard, next to the
+        # merged file, tagged with the version the stamp publishes at the end
+        version = dataset_store.new_version()
+        text_search.build_index(csv_file or parquet_file, args.chunk_size, version)
+        similar.build_index(csv_file or parquet_file, args.chunk_size, version)
+
+        if args.dedup:
+            print("\n" + "="*60)
+            print("Detecting duplicates...")
+            print("="*60)
+            dedup.run_dedup(csv_file or parquet_file, args.data_dir, args.chunk_size)
+
+        # Last step: a new version stamp tells a running dashboard to reload
+        dataset_store.write_version_stamp(csv_file or parquet_file, stats.rows, version)
+
+        print("\n" + "="*60)
+        print("MERGE COMPLETE!")
+        print("="*60)
+        return 0
+    finally:
+        shutil.rmtree(spill_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
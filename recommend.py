@@ -0,0 +1,314 @@
+"""
+Profile matching and ranking for the research opportunities dataset
+Scores every opportunity against a researcher profile (nationality, career
+stage, field of study, desired funding and duration, deadline horizon).
+
+The catalogue is encoded once per dataset version: career stages, fields
+of study and eligibility as row codes into small score tables (profile
+choice x distinct value), funding, log duration and days to the next
+deadline as float32 arrays. Scoring a batch of profiles is then table
+gathers and in-place broadcasts over a (profiles x rows) block, processed
+in chunks of profiles to bound memory, with a partial sort for the top-k.
+
+    recommender = Recommender(df)
+    rows, scores = recommender.top_k(Profile(nationality='Kenya', career_stage='PhD'), k=10)
+    rows, scores = recommender.top_k_batch(profiles, k=10)    # (profiles, k) arrays
+"""
+
+import re
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+import deadlines
+import eligibility
+
+# Every field optional: None leaves the criterion out of the score
+Profile = namedtuple('Profile', ['nationality', 'career_stage', 'field_of_study', 'funding', 'duration',
+                                 'horizon_days'], defaults=[None] * 6)
+
+# Relative weight of each criterion in the score (nationality is a factor)
+WEIGHTS = {'career_stage': 3.0, 'field_of_study': 3.0, 'funding': 2.0, 'duration': 1.0, 'deadline': 2.0}
+
+# Score of a criterion the row has no data for
+UNKNOWN_SCORE = 0.5
+# Factor for rows whose eligibility names no nationality (ineligible rows score 0)
+UNKNOWN_ELIGIBILITY = 0.75
+ROLLING_SCORE = 1.0
+NO_DEADLINE_SCORE = 0.3
+
+# Profiles are scored in chunks of at most this many (profile, row) cells
+CHUNK_CELLS = 1 << 21
+
+# Candidate columns, in order of preference (the dashboard frame has some)
+CAREER_STAGE_COLUMNS = ['career_stage', 'target_career_stage', 'academic_level']
+FIELD_COLUMN = 'field_of_study'
+FUNDING_COLUMNS = ['funding_amount_avg', 'funding_amount_typical', 'funding_amount_max', 'funding_amount_min']
+DURATION_COLUMN = 'duration_numeric'
+
+# Career stages a profile can pick, and the wording that marks each one
+CAREER_STAGES = ['Undergraduate', "Master's", 'PhD', 'Postdoc', 'Early-career', 'Mid-career', 'Senior']
+STAGE_PATTERNS = [
+    (r'undergrad|bachelor', ['Undergraduate']),
+    (r"master|\bmsc\b|\bmba\b|\bmphil\b|\bllm\b", ["Master's"]),
+    (r'\bphd\b|(?<!post)doctora|\bengd\b|\bscd\b|\bdphil\b', ['PhD']),
+    (r'(?<!under)graduate', ["Master's", 'PhD']),
+    (r'post-?doc', ['Postdoc']),
+    (r'early[- ]career|junior', ['Early-career']),
+    (r'mid[- ]career|established|experienced', ['Mid-career']),
+    (r'senior|professor|faculty', ['Senior']),
+    (r'all (?:career )?(?:levels|stages)|any (?:level|stage)', CAREER_STAGES),
+]
+STAGE_PATTERNS = [(re.compile(pattern, re.IGNORECASE), sum(1 << CAREER_STAGES.index(stage) for stage in stages))
+                  for pattern, stages in STAGE_PATTERNS]
+
+# Field values open to every field (ranked below a named match), how
+# multi-field values are separated, and umbrella fields giving partial
+# credit to the fields under them
+ALL_FIELDS = re.compile(r'^all\b|\bany (?:field|discipline)|\ball (?:fields|disciplines|research areas)\b',
+                        re.IGNORECASE)
+FIELD_SEPARATORS = re.compile(r'\s*(?:\||,|;|/|\bOR\b)\s*')
+FIELD_GROUPS = {
+    'stem': ['engineering', 'computer science', 'natural sciences', 'mathematics', 'physics', 'chemistry',
+             'biology', 'technology', 'data science', 'life sciences', 'earth sciences', 'agricultural sciences'],
+    'social sciences': ['economics', 'political science', 'sociology', 'psychology', 'public policy',
+                        'international development', 'law'],
+    'health sciences': ['public health', 'medicine', 'biomedicine', 'nursing'],
+}
+ALL_FIELDS_SCORE = 0.8
+GROUP_SCORE = 0.7
+
+
+def stage_bits(values):
+    """Career stage bit mask of every distinct text (0: no stage named)"""
+    return np.array([sum(bits for pattern, bits in STAGE_PATTERNS if pattern.search(value)) & ((1 << len(CAREER_STAGES)) - 1)
+                     for value in values], dtype=np.int32)
+
+
+def field_tokens(value):
+    """Lowercase fields named by one field_of_study value"""
+    tokens = []
+    for token in FIELD_SEPARATORS.split(value):
+        token = re.sub(r'^specific:\s*|\(.*?\)', '', token.strip(), flags=re.IGNORECASE).strip().lower()
+        if token:
+            tokens.append(token)
+    return tokens
+
+
+class Recommender:
+    """Encoded catalogue of one dataset version; scores profiles against every row at once"""
+
+    def __init__(self, df, eligibility_index=None, reference=None):
+        self.df = df
+        self.n = len(df)
+        self.reference = deadlines.today() if reference is None else pd.Timestamp(reference).normalize()
+
+        # Nationality: (country x spec) score factors, gathered by the rows'
+        # spec codes; the last column is for rows naming no nationality
+        self.eligibility = eligibility_index or eligibility.EligibilityIndex(df)
+        self.eligibility_codes = self.eligibility.codes
+        self.eligibility_table = np.where(self.eligibility.matrix.T, np.float32(1), np.float32(0))
+        self.eligibility_table[:, -1] = UNKNOWN_ELIGIBILITY
+        self.has_eligibility = bool((self.eligibility_codes >= 0).any())
+
+        # Career stage: OR of the bits found in every candidate column, then
+        # a (stage x distinct bit mask) score table
+        stages = np.zeros(self.n, dtype=np.int32)
+        for col in CAREER_STAGE_COLUMNS:
+            if col in df.columns:
+                codes, uniques = pd.factorize(df[col])
+                stages |= np.append(stage_bits(uniques.astype(str)), 0)[codes]
+        masks, self.stage_codes = np.unique(stages, return_inverse=True)
+        self.stage_table = np.array([np.where(masks == 0, UNKNOWN_SCORE, (masks >> bit) & 1)
+                                     for bit in range(len(CAREER_STAGES))], dtype=np.float32)
+
+        # Field of study: (field x distinct value) scores; the last column is
+        # for missing values, the last row for fields outside the vocabulary
+        self.fields = []
+        if FIELD_COLUMN in df.columns:
+            self.field_codes, uniques = pd.factorize(df[FIELD_COLUMN])
+            tokens = [field_tokens(value) for value in uniques.astype(str)]
+            self.fields = sorted({token for value_tokens in tokens for token in value_tokens
+                                  if not ALL_FIELDS.search(token)})
+            position = {field: k for k, field in enumerate(self.fields)}
+            self.field_table = np.zeros((len(self.fields) + 1, len(uniques) + 1), dtype=np.float32)
+            for k, value_tokens in enumerate(tokens):
+                if any(ALL_FIELDS.search(token) for token in value_tokens):
+                    self.field_table[:, k] = ALL_FIELDS_SCORE
+                    continue
+                for token in value_tokens:
+                    for member in FIELD_GROUPS.get(token, []):
+                        if member in position:
+                            self.field_table[position[member], k] = GROUP_SCORE
+                for token in value_tokens:
+                    self.field_table[position[token], k] = 1.0
+            self.field_table[:, -1] = UNKNOWN_SCORE
+        else:
+            self.field_codes = np.full(self.n, -1)
+            self.field_table = np.full((1, 1), UNKNOWN_SCORE, dtype=np.float32)
+        self.field_position = {field: k for k, field in enumerate(self.fields)}
+
+        # Funding and log2 duration, NaN when missing
+        funding_col = next((col for col in FUNDING_COLUMNS
+                            if col in df.columns and pd.api.types.is_numeric_dtype(df[col])), None)
+        self.funding = (df[funding_col].to_numpy(dtype=np.float32, na_value=np.nan) if funding_col
+                        else np.full(self.n, np.nan, dtype=np.float32))
+        duration = (df[DURATION_COLUMN].to_numpy(dtype=np.float32, na_value=np.nan)
+                    if DURATION_COLUMN in df.columns else np.full(self.n, np.nan, dtype=np.float32))
+        self.log_duration = np.log2(np.maximum(duration, np.float32(1e-3)))
+
+        # Days from the reference day to the next deadline, with past
+        # deadlines pushed to infinity (score 0) and rolling rows to 0 (score 1)
+        if deadlines.DEADLINE_NEXT_COLUMN in df.columns:
+            next_deadline = df[deadlines.DEADLINE_NEXT_COLUMN].to_numpy(dtype='datetime64[ns]')
+            days = ((next_deadline - self.reference.to_datetime64()) / np.timedelta64(1, 'D')).astype(np.float32)
+        else:
+            days = np.full(self.n, np.nan, dtype=np.float32)
+        days[days < 0] = np.inf
+        if deadlines.DEADLINE_ROLLING_COLUMN in df.columns:
+            days[df[deadlines.DEADLINE_ROLLING_COLUMN].to_numpy(dtype=bool)] = 0
+        self.days_left = days
+
+    # -- profile encoding
+
+    def _encode(self, profiles):
+        """Per-criterion parameter arrays (one entry per profile) and weights (0: criterion not set)"""
+        columns = {name: np.ones((len(profiles), 1), dtype=np.float32)
+                   for name in ['funding', 'duration', 'horizon_days']}
+        country = np.full(len(profiles), -1)
+        stage = np.zeros(len(profiles), dtype=np.intp)
+        field = np.full(len(profiles), len(self.fields))
+        weights = {name: np.zeros((len(profiles), 1), dtype=np.float32) for name in WEIGHTS}
+        for p, profile in enumerate(profiles):
+            if profile.nationality is not None and self.has_eligibility:
+                country[p] = self.eligibility.position.get(profile.nationality, -1)
+            if profile.career_stage in CAREER_STAGES:
+                stage[p] = CAREER_STAGES.index(profile.career_stage)
+                weights['career_stage'][p] = WEIGHTS['career_stage']
+            if profile.field_of_study:
+                field[p] = self.field_position.get(profile.field_of_study.lower(), len(self.fields))
+                weights['field_of_study'][p] = WEIGHTS['field_of_study']
+            for name, weight in [('funding', 'funding'), ('duration', 'duration'), ('horizon_days', 'deadline')]:
+                value = getattr(profile, name)
+                if value and value > 0:
+                    columns[name][p] = value
+                    weights[weight][p] = WEIGHTS[weight]
+        columns['duration'] = np.log2(columns['duration'])
+        return country, stage, field, columns, weights
+
+    # -- scoring
+
+    def _catalogue(self, rows):
+        """Row-side arrays of the criteria, restricted to the given row positions"""
+        catalogue = {'stage': self.stage_codes, 'field': self.field_codes, 'funding': self.funding,
+                     'duration': self.log_duration, 'days': self.days_left, 'eligibility': self.eligibility_codes}
+        if rows is not None:
+            catalogue = {name: values[rows] for name, values in catalogue.items()}
+        catalogue['no_funding'] = np.isnan(catalogue['funding'])
+        catalogue['no_duration'] = np.isnan(catalogue['duration'])
+        catalogue['no_deadline'] = np.isnan(catalogue['days'])
+        return catalogue
+
+    def _score_block(self, country, stage, field, columns, weights, catalogue):
+        """(profiles, rows) scores in [0, 1] for one chunk of encoded profiles"""
+        # Categorical criteria are gathers from the small score tables
+        total = np.take(self.stage_table[stage], catalogue['stage'], axis=1)
+        total *= weights['career_stage']
+        part = np.take(self.field_table[field], catalogue['field'], axis=1)
+        part *= weights['field_of_study']
+        total += part
+
+        # Funding: the share of the desired amount offered, capped at 1
+        np.divide(catalogue['funding'], columns['funding'], out=part)
+        np.minimum(part, 1, out=part)
+        np.copyto(part, UNKNOWN_SCORE, where=catalogue['no_funding'])
+        part *= weights['funding']
+        total += part
+
+        # Duration: 1 for the desired length, 1/2 at double or half of it
+        np.subtract(catalogue['duration'], columns['duration'], out=part)
+        np.abs(part, out=part)
+        part += 1
+        np.reciprocal(part, out=part)
+        np.copyto(part, UNKNOWN_SCORE, where=catalogue['no_duration'])
+        part *= weights['duration']
+        total += part
+
+        # Deadline within the horizon: 1, fading to 0 at twice the horizon
+        np.divide(catalogue['days'], columns['horizon_days'], out=part)
+        np.subtract(2, part, out=part)
+        np.clip(part, 0, 1, out=part)
+        np.copyto(part, NO_DEADLINE_SCORE, where=catalogue['no_deadline'])
+        part *= weights['deadline']
+        total += part
+
+        weight_sum = sum(weights.values())
+        total /= np.maximum(weight_sum, np.float32(1e-9))
+        total[weight_sum[:, 0] == 0] = 1
+
+        # Nationality multiplies: eligible 1, unclear 0.75, ineligible 0
+        chosen = np.flatnonzero(country >= 0)
+        if len(chosen):
+            total[chosen] *= np.take(self.eligibility_table[country[chosen]], catalogue['eligibility'], axis=1)
+        return total
+
+    def _chunks(self, profiles, rows):
+        country, stage, field, columns, weights = self._encode(profiles)
+        catalogue = self._catalogue(rows)
+        width = self.n if rows is None else len(rows)
+        step = max(1, CHUNK_CELLS // max(width, 1))
+        for start in range(0, len(profiles), step):
+            window = slice(start, start + step)
+            yield start, self._score_block(country[window], stage[window], field[window],
+                                           {name: values[window] for name, values in columns.items()},
+                                           {name: values[window] for name, values in weights.items()}, catalogue)
+
+    def score(self, profile, rows=None):
+        """Scores of one profile for every row (or the given row positions)"""
+        return self.score_batch([profile], rows)[0]
+
+    def score_batch(self, profiles, rows=None):
+        """(profiles, rows) score matrix"""
+        rows = None if rows is None else np.asarray(rows)
+        scores = np.empty((len(profiles), self.n if rows is None else len(rows)), dtype=np.float32)
+        for start, block in self._chunks(profiles, rows):
+            scores[start:start + len(block)] = block
+        return scores
+
+    def top_k_batch(self, profiles, k=10, rows=None):
+        """
+        Row positions and scores of the k best rows of every profile, best
+        first: two (profiles, k) arrays. Rows scoring 0 (not eligible) are
+        left out, padded with -1 / NaN.
+        """
+        rows = np.arange(self.n) if rows is None else np.asarray(rows)
+        k = min(k, len(rows))
+        top_rows = np.full((len(profiles), k), -1, dtype=np.int64)
+        top_scores = np.full((len(profiles), k), np.nan, dtype=np.float32)
+        if k == 0:
+            return top_rows, top_scores
+        for start, block in self._chunks(profiles, rows):
+            np.negative(block, out=block)
+            best = np.argpartition(block, k - 1, axis=1)[:, :k]
+            best_scores = -np.take_along_axis(block, best, axis=1)
+            order = np.argsort(-best_scores, axis=1, kind='stable')
+            best = np.take_along_axis(best, order, axis=1)
+            best_scores = np.take_along_axis(best_scores, order, axis=1)
+            keep = best_scores > 0
+            top_rows[start:start + len(block)] = np.where(keep, rows[best], -1)
+            top_scores[start:start + len(block)] = np.where(keep, best_scores, np.nan)
+        return top_rows, top_scores
+
+    def top_k(self, profile, k=10, rows=None):
+        """Row positions and scores of the k best rows for one profile, best first"""
+        top_rows, top_scores = self.top_k_batch([profile], k, rows)
+        keep = top_rows[0] >= 0
+        return top_rows[0][keep], top_scores[0][keep]
+
+    def recommend(self, profile, k=10, rows=None):
+        """The k best rows of the frame for one profile, with a `match_score` column"""
+        top_rows, top_scores = self.top_k(profile, k, rows)
+        result = self.df.take(top_rows)
+        return result.assign(match_score=top_scores)
+
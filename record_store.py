@@ -0,0 +1,144 @@
+"""
+Keyed record store for the Details view
+Constant-time lookup of an opportunity by `opportunity_id`, a name -> ids map
+(names are not unique), and a type-ahead index over programme names:
+  - prefix search on the sorted normalized names (binary search)
+  - substring search through a trigram index: every trigram of every name is
+    encoded as an integer and stored with its row in one sorted array, so a
+    query intersects a few posting slices instead of scanning all names
+"""
+
+import numpy as np
+import pandas as pd
+
+# Columns holding the programme name, in order of preference
+NAME_COLUMNS = ['program_name', 'opportunity_name']
+
+MAX_RESULTS = 20
+
+# Trigram alphabet: space, a-z, 0-9, and a separator between names
+ALPHABET = ' abcdefghijklmnopqrstuvwxyz0123456789'
+SEPARATOR = len(ALPHABET)
+BASE = len(ALPHABET) + 1
+
+
+def name_column(df):
+    for col in NAME_COLUMNS:
+        if col in df.columns:
+            return col
+    return None
+
+
+def normalize_names(values):
+    """Lowercase ASCII letters and digits, single spaces: 'École  Normale' -> 'ecole normale'"""
+    return (values.astype('string').fillna('')
+            .str.normalize('NFKD').str.encode('ascii', 'ignore').str.decode('ascii')
+            .str.lower().str.replace(r'[^a-z0-9]+', ' ', regex=True).str.strip())
+
+
+def _symbols(text):
+    lut = np.full(256, SEPARATOR, dtype=np.int64)
+    for code, char in enumerate(ALPHABET):
+        lut[ord(char)] = code
+    return lut[np.frombuffer(text.encode('ascii'), dtype=np.uint8)]
+
+
+def trigram_codes(symbols):
+    return symbols[:-2] * BASE * BASE + symbols[1:-1] * BASE + symbols[2:]
+
+
+class RecordStore:
+    def __init__(self, df):
+        self.df = df
+        self.n = len(df)
+        ids = df['opportunity_id'] if 'opportunity_id' in df.columns else pd.Series(range(self.n))
+        # First occurrence wins, like the merged output's id-sorted order
+        first = ~ids.duplicated(keep='first').to_numpy() & ids.notna().to_numpy()
+        self.position_of = dict(zip(ids.to_numpy(dtype=object)[first], np.flatnonzero(first).tolist()))
+        self.ids = ids.to_numpy(dtype=object)
+
+        self.name_col = name_column(df)
+        names = df[self.name_col] if self.name_col else pd.Series([''] * self.n)
+        self.names = names.to_numpy(dtype=object)
+        self.normalized = normalize_names(names).to_numpy(dtype=object)
+
+        # name -> row positions (several programmes can share a name)
+        self.positions_by_name = names.reset_index(drop=True).groupby(names.to_numpy(), sort=False).indices
+
+        # Prefix index
+        self.name_order = np.argsort(self.normalized.astype(str), kind='stable')
+        self.sorted_names = self.normalized.astype(str)[self.name_order]
+
+        # Trigram index: (trigram code, row) pairs sorted by code
+        if self.n:
+            symbols = _symbols('\n'.join(self.normalized.tolist()))
+            rows = np.cumsum(symbols == SEPARATOR)[:-2]
+            codes = trigram_codes(symbols)
+            valid = (symbols[:-2] != SEPARATOR) & (symbols[1:-1] != SEPARATOR) & (symbols[2:] != SEPARATOR)
+            pairs = np.sort(codes[valid] * self.n + rows[valid])
+            pairs = pairs[np.r_[True, pairs[1:] != pairs[:-1]]]
+            self.trigrams, self.trigram_rows = pairs // self.n, pairs % self.n
+        else:
+            self.trigrams = self.trigram_rows = np.array([], dtype=np.int64)
+
+    def __len__(self):
+        return self.n
+
+    def record(self, opportunity_id):
+        """The row of one opportunity (a Series), or None"""
+        position = self.position_of.get(opportunity_id)
+        return None if position is None else self.df.iloc[position]
+
+    def ids_for_name(self, name):
+        return [self.ids[position] for position in self.positions_by_name.get(name, [])]
+
+    def label(self, opportunity_id):
+        position = self.position_of[opportunity_id]
+        name = self.names[position]
+        return f"{name if pd.notna(name) else 'N/A'} ({opportunity_id})"
+
+    def prefix_rows(self, prefix):
+        start = np.searchsorted(self.sorted_names, prefix, side='left')
+        end = np.searchsorted(self.sorted_names, prefix + '\x7f', side='left')
+        return self.name_order[start:end]
+
+    def substring_rows(self, query):
+        codes = np.unique(trigram_codes(_symbols(query)))
+        postings = []
+        for code in codes:
+            start, end = np.searchsorted(self.trigrams, [code, code + 1])
+            postings.append(self.trigram_rows[start:end])
+        postings.sort(key=len)
+        rows = postings[0]
+        for posting in postings[1:]:
+            rows = np.intersect1d(rows, posting, assume_unique=True)
+            if len(rows) == 0:
+                break
+        if len(query) == 3:
+            return rows
+        # Longer queries: trigrams only narrow the candidates; confirm the substring
+        found = pd.Series(self.normalized[rows], dtype=object).str.contains(query, regex=False)
+        return rows[found.to_numpy(dtype=bool)]
+
+    def search(self, query, allowed=None, limit=MAX_RESULTS):
+        """
+        Opportunity ids whose name matches `query`: name prefix matches first,
+        then word prefixes, then other substrings; `allowed` restricts the
+        result to a boolean mask of row positions (the filtered rows)
+        """
+        query = normalize_names(pd.Series([query])).iloc[0]
+
+        def restrict(rows):
+            return rows if allowed is None else rows[allowed[rows]]
+
+        if not query:
+            rows = restrict(np.arange(self.n))
+        else:
+            rows = restrict(self.prefix_rows(query))
+            if len(query) >= 3 and len(rows) < limit:
+                others = restrict(self.substring_rows(query))
+                others = others[~np.isin(others, rows)]
+                word = pd.Series(self.normalized[others], dtype=object).str.contains(
+                    f' {query}', regex=False).to_numpy(dtype=bool)
+                rows = np.concatenate([rows, others[word], others[~word]])
+        return [self.ids[row] for row in rows[:limit]]
@@ -0,0 +1,89 @@
+"""
+Shared result cache for the dashboard
+Filtered row sets, chart data and figures keyed on the canonical filter state,
+so popular filter combinations are served without recomputation across sessions
+"""
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+MAX_ENTRIES = 512
+
+
+def canonical_key(state):
+    """
+    Hashable, order-independent key for a filter state dict; filters left
+    at 'All' (or None) are dropped so equivalent states share one entry
+    """
+    items = []
+    for name, value in sorted(state.items()):
+        if value is None or value == 'All':
+            continue
+        if isinstance(value, (list, tuple)):
+            value = tuple(v.item() if isinstance(v, np.generic) else v for v in value)
+        elif isinstance(value, np.generic):
+            value = value.item()
+        items.append((name, value))
+    return tuple(items)
+
+
+class LRUCache:
+    """
+    Thread-safe LRU cache bounded by entry count, with hit/miss counters;
+    `on_evict(key, value)` is called for entries dropped from the cache
+    """
+
+    def __init__(self, max_entries=MAX_ENTRIES, on_evict=None):
+        self.max_entries = max_entries
+        self.on_evict = on_evict
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_or_compute(self, key, compute):
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key]
+            self.misses += 1
+
+        # Computed outside the lock: concurrent misses on one key may both
+        # compute, but never block other sessions' hits
+        value = compute()
+
+        evicted = []
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                evicted.append(self.entries.popitem(last=False))
+                self.evictions += 1
+        if self.on_evict:
+            for item in evicted:
+                self.on_evict(*item)
+        return value
+
+    def clear(self):
+        with self.lock:
+            evicted = list(self.entries.items())
+            self.entries.clear()
+        if self.on_evict:
+            for item in evicted:
+                self.on_evict(*item)
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,233 @@
+"""
+Similar-opportunities index for the merged research opportunities
+TF-IDF vectors over descriptions, eligibility, fields of study and
+institutions, built by merge_batches.py next to the merged dataset
+(`*.similar.npz`) and loaded lazily by the dashboard, only for the dataset
+version it was built from.
+
+Vectors are sparse and L2-normalized, stored twice: by row (CSR, the terms
+of each opportunity) and by term (postings, the opportunities using each
+term). The neighbours of one row are a sparse dot product: one vectorized
+accumulation per term of that row into a dense score array, so a query
+touches only the rows sharing a term with it. Terms in most rows are
+dropped and each row keeps only its highest-weighted terms, which bounds
+both the index size and the work per query.
+"""
+
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+
+import dataset_store
+import record_store
+import text_search
+
+# Text columns vectorized when present (names differ between batch layouts)
+SIMILAR_COLUMNS = [
+    'description', 'notes', 'special_features',
+    'eligibility_criteria', 'nationality_eligibility', 'citizenship_requirements',
+    'field_of_study', 'institution', 'institution_name',
+]
+
+INDEX_SUFFIX = '.similar.npz'
+
+# Terms kept per row (highest TF-IDF first) and largest share of rows a term may appear in
+MAX_TERMS = 48
+MAX_DF = 0.5
+
+MAX_NEIGHBOURS = 10
+
+# Distinct cell texts whose token counts are kept while building
+TOKEN_CACHE_SIZE = 100000
+
+
+def index_path_for(dataset_path):
+    """The similarity index that sits next to a merged CSV/Parquet file"""
+    path = Path(dataset_path)
+    return path.with_name(path.stem + INDEX_SUFFIX)
+
+
+def document_counts(chunk, cache):
+    """Token counts of every row of a chunk; each distinct cell is tokenized once (`cache`: text -> counts)"""
+    columns = [col for col in SIMILAR_COLUMNS if col in chunk.columns]
+    rows = [{} for _ in range(len(chunk))]
+    for col in columns:
+        for row_counts, text in zip(rows, chunk[col].tolist()):
+            if not isinstance(text, str) or not text:
+                continue
+            cell = cache.get(text)
+            if cell is None:
+                cell = {}
+                for token in text_search.tokenize(text):
+                    cell[token] = cell.get(token, 0) + 1
+                if len(cache) < TOKEN_CACHE_SIZE:
+                    cache[text] = cell
+            for token, count in cell.items():
+                row_counts[token] = row_counts.get(token, 0) + count
+    return rows
+
+
+class SimilarityIndex:
+    def __init__(self, terms, indptr, indices, weights, offsets, docs, doc_weights, version=None):
+        self.terms = terms
+        # Row-major: terms of row r are indices[indptr[r]:indptr[r+1]]
+        self.indptr = indptr
+        self.indices = indices
+        self.weights = weights
+        # Term-major: rows using term t are docs[offsets[t]:offsets[t+1]]
+        self.offsets = offsets
+        self.docs = docs
+        self.doc_weights = doc_weights
+        self.rows = len(indptr) - 1
+        # The dataset version the vectors were built from (see dataset_store.dataset_version)
+        self.version = version
+
+    @classmethod
+    def build(cls, chunks):
+        """Vectorize documents streamed as DataFrame chunks (rows numbered in order)"""
+        vocabulary = {}
+        term_ids, doc_ids, counts = [], [], []
+        rows = 0
+        cache = {}
+        for chunk in chunks:
+            for row_counts in document_counts(chunk, cache):
+                for token, count in row_counts.items():
+                    term_ids.append(vocabulary.setdefault(token, len(vocabulary)))
+                    doc_ids.append(rows)
+                    counts.append(count)
+                rows += 1
+        term_ids = np.array(term_ids, dtype=np.int64)
+        doc_ids = np.array(doc_ids, dtype=np.int64)
+        counts = np.array(counts, dtype=np.float32)
+
+        # Sublinear TF x smoothed IDF; terms in most rows say little about any of them
+        df = np.bincount(term_ids, minlength=len(vocabulary))
+        idf = (np.log((1 + rows) / (1 + df)) + 1).astype(np.float32)
+        keep = df[term_ids] <= max(MAX_DF * rows, 1)
+        term_ids, doc_ids = term_ids[keep], doc_ids[keep]
+        weights = (1 + np.log(counts[keep])) * idf[term_ids]
+
+        # Highest-weighted terms of each row, then unit length
+        order = np.lexsort((-weights, doc_ids))
+        term_ids, doc_ids, weights = term_ids[order], doc_ids[order], weights[order]
+        starts = np.searchsorted(doc_ids, np.arange(rows))
+        keep = np.arange(len(doc_ids)) - starts[doc_ids] < MAX_TERMS
+        term_ids, doc_ids, weights = term_ids[keep], doc_ids[keep], weights[keep]
+        norms = np.sqrt(np.bincount(doc_ids, weights=weights * weights, minlength=rows))
+        weights = (weights / np.maximum(norms[doc_ids], 1e-12)).astype(np.float32)
+
+        # Renumber the used terms alphabetically
+        used = np.unique(term_ids)
+        words = np.array(list(vocabulary), dtype=str)[used]
+        alphabetical = np.argsort(words, kind='stable')
+        rank = np.empty(len(vocabulary), dtype=np.int64)
+        rank[used[alphabetical]] = np.arange(len(used))
+        term_ids = rank[term_ids]
+
+        indptr = np.searchsorted(doc_ids, np.arange(rows + 1)).astype(np.int64)
+        by_term = np.argsort(term_ids, kind='stable')
+        offsets = np.searchsorted(term_ids[by_term], np.arange(len(used) + 1)).astype(np.int64)
+        return cls(words[alphabetical], indptr, term_ids.astype(np.int32), weights,
+                   offsets, doc_ids[by_term].astype(np.int32), weights[by_term])
+
+    def save(self, path):
+        tmp_path = Path(f'{path}.tmp.npz')
+        np.savez(tmp_path, terms=self.terms, indptr=self.indptr, indices=self.indices, weights=self.weights,
+                 offsets=self.offsets, docs=self.docs, doc_weights=self.doc_weights, version=self.version or '')
+        tmp_path.replace(path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            version = str(data['version']) if 'version' in data.files else ''
+            return cls(data['terms'], data['indptr'], data['indices'], data['weights'],
+                       data['offsets'], data['docs'], data['doc_weights'], version or None)
+
+    def scores(self, row):
+        """Dense cosine similarity of every row with `row`"""
+        scores = np.zeros(self.rows, dtype=np.float32)
+        start, end = self.indptr[row], self.indptr[row + 1]
+        for term, weight in zip(self.indices[start:end], self.weights[start:end]):
+            first, last = self.offsets[term], self.offsets[term + 1]
+            scores[self.docs[first:last]] += weight * self.doc_weights[first:last]
+        return scores
+
+    def neighbours(self, row, k=MAX_NEIGHBOURS, allowed=None):
+        """Row positions and similarities of the k rows most similar to `row`, best first; `allowed` is a boolean row mask"""
+        scores = self.scores(row)
+        scores[row] = 0
+        if allowed is not None:
+            scores[~allowed] = 0
+        matches = np.flatnonzero(scores > 0)
+        if len(matches) > k:
+            matches = matches[np.argpartition(-scores[matches], k - 1)[:k]]
+        matches = matches[np.argsort(-scores[matches], kind='stable')]
+        return matches, scores[matches]
+
+
+def build_index(dataset_path, chunksize=50000, version=None):
+    """
+    Build and save the similarity index for a merged dataset; returns its path.
+    It is tagged with `version`, by default the dataset's current one.
+    """
+    started = time.perf_counter()
+    chunks = dataset_store.iter_dataset_chunks(dataset_path, columns=SIMILAR_COLUMNS, chunksize=chunksize)
+    index = SimilarityIndex.build(chunks)
+    index.version = version or dataset_store.dataset_version(dataset_path)
+    path = index_path_for(dataset_path)
+    index.save(path)
+    print(f"✓ Similarity index saved: {path} ({len(index.terms):,} terms, {index.rows:,} documents, "
+          f"{time.perf_counter() - started:.2f}s)")
+    return path
+
+
+def load_index(dataset_path, version=None):
+    """
+    The saved index for a dataset version (the current one by default), or
+    None if missing or built from another version: an edit that keeps the
+    row count still makes the index stale
+    """
+    path = index_path_for(dataset_path)
+    if not path.exists():
+        return None
+    index = SimilarityIndex.load(path)
+    if index.version is None or index.version != (version or dataset_store.dataset_version(dataset_path)):
+        return None
+    return index
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the similarity index or list the neighbours of one opportunity")
+    parser.add_argument('dataset', help="Merged dataset (CSV or Parquet)")
+    parser.add_argument('opportunity_id', nargs='?', help="List neighbours instead of building")
+    parser.add_argument('--limit', type=int, default=MAX_NEIGHBOURS)
+    args = parser.parse_args(argv)
+
+    if not args.opportunity_id:
+        build_index(args.dataset)
+        return 0
+
+    index = load_index(args.dataset)
+    if index is None:
+        print("✗ No similarity index for this dataset version, build it first")
+        return 1
+    names = dataset_store.load_dataset(args.dataset, columns=['opportunity_id'] + record_store.NAME_COLUMNS)
+    matches = np.flatnonzero(names['opportunity_id'].astype(str).to_numpy() == args.opportunity_id)
+    if len(matches) == 0:
+        print(f"✗ Unknown opportunity_id: {args.opportunity_id}")
+        return 1
+    started = time.perf_counter()
+    rows, scores = index.neighbours(matches[0], args.limit)
+    elapsed = (time.perf_counter() - started) * 1000
+    name_col = record_store.name_column(names)
+    for row, score in zip(rows, scores):
+        name = names[name_col].iloc[row] if name_col else ''
+        print(f"  {score:.2f}  {names['opportunity_id'].iloc[row]}: {name}")
+    print(f"{len(rows)} neighbour(s) in {elapsed:.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
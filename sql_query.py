@@ -0,0 +1,220 @@
+"""
+Embedded SQL over the merged research opportunities
+Ad-hoc analytical queries against the merged output as one table,
+`opportunities`, without loading it into pandas first:
+
+    engine = QueryEngine('research_opportunities_complete.csv')
+    engine.query('''
+        SELECT region, career_stage, median(funding_amount_typical) AS median_funding
+        FROM opportunities
+        WHERE quarter(application_deadline_parsed) = 3
+        GROUP BY region, career_stage ORDER BY median_funding DESC
+    ''').frame
+
+With DuckDB installed the table is a view over the typed Parquet file: only
+the referenced columns are read, WHERE clauses are pushed into the scan and
+queries run on all cores. When there is only the CSV, its typed frame (parsed
+deadlines, duration_numeric, ...) is loaded once into an in-memory table. Every
+other file is off limits to queries and the configuration is locked. Without it, the columns a
+query names are loaded through dataset_store into an in-memory SQLite table
+(stdlib, single-threaded; dates are ISO text, with `median`, `year`,
+`month` and `quarter` added so the common queries run on both).
+
+CLI: python sql_query.py <merged file> "SELECT ..."
+"""
+
+import argparse
+import csv
+import re
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from pathlib import Path
+
+import pandas as pd
+
+import dataset_store
+import eligibility
+
+try:
+    import duckdb
+except ImportError:  # DuckDB is optional; queries fall back to SQLite
+    duckdb = None
+
+TABLE = 'opportunities'
+
+# Rows returned to the caller; larger results are cut (and flagged)
+MAX_ROWS = 10000
+
+# Only read queries: one SELECT (or WITH ... SELECT) statement
+READ_QUERY = re.compile(r'^\s*(?:select|with)\b', re.IGNORECASE)
+
+# String literals, quoted identifiers and comments: a ';' inside them separates nothing
+SQL_LITERALS = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|--[^\n]*|/\*.*?\*/", re.DOTALL)
+
+QueryResult = namedtuple('QueryResult', ['frame', 'truncated', 'seconds'])
+
+# Typed columns computed on load from other columns (the CSV has only the sources)
+DERIVED_SOURCES = {
+    dataset_store.DURATION_COLUMN: dataset_store.DURATION_SOURCE_COLUMNS,
+    eligibility.ELIGIBILITY_COLUMN: eligibility.ELIGIBILITY_SOURCE_COLUMNS,
+}
+
+# What a bad query raises, for either backend
+QUERY_ERRORS = (ValueError, sqlite3.Error) + ((duckdb.Error,) if duckdb is not None else ())
+
+
+def check_query(sql):
+    """The query without a trailing semicolon; ValueError unless it is a single SELECT"""
+    sql = sql.strip().rstrip(';').strip()
+    code = SQL_LITERALS.sub(' ', sql).strip().rstrip(';')
+    if not READ_QUERY.match(code) or ';' in code:
+        raise ValueError("Only a single SELECT query is allowed")
+    return sql
+
+
+def source_columns(source):
+    if source.suffix == '.parquet':
+        return dataset_store.pq.read_schema(str(source)).names
+    return list(pd.read_csv(source, encoding='utf-8', quoting=csv.QUOTE_ALL, nrows=0).columns)
+
+
+def date_part(start, end, convert=int):
+    """SQLite function over ISO date text: the characters [start:end], converted"""
+    def part(value):
+        return None if value is None else convert(str(value)[start:end])
+    return part
+
+
+# SQLite stand-ins for the DuckDB date functions
+DATE_FUNCTIONS = {
+    'year': date_part(0, 4),
+    'month': date_part(5, 7),
+    'quarter': date_part(5, 7, lambda month: (int(month) - 1) // 3 + 1),
+}
+
+
+class Median:
+    """median() for SQLite"""
+
+    def __init__(self):
+        self.values = []
+
+    def step(self, value):
+        if value is not None:
+            self.values.append(value)
+
+    def finalize(self):
+        return float(pd.Series(self.values).median()) if self.values else None
+
+
+class QueryEngine:
+    """One dataset version as the `opportunities` table; safe to share between threads"""
+
+    def __init__(self, dataset_path, threads=None):
+        self.path = Path(dataset_path)
+        self.source = dataset_store.source_path_for(self.path)
+        self.columns = source_columns(self.source)
+        self.backend = 'duckdb' if duckdb is not None else 'sqlite'
+        self.lock = threading.Lock()
+        if duckdb is not None:
+            self.connection = duckdb.connect()
+            if threads:
+                self.connection.execute(f"SET threads = {int(threads)}")
+            location = str(self.source).replace("'", "''")
+            if self.source.suffix == '.parquet':
+                self.connection.execute(f"CREATE VIEW {TABLE} AS SELECT * FROM read_parquet('{location}')")
+            else:
+                # The CSV holds only the source text: the typed columns are
+                # added on load, then the frame is copied into a DuckDB table
+                frame = dataset_store.load_dataset(self.path)
+                self.columns = list(frame.columns)
+                self.connection.register(f'{TABLE}_frame', frame)
+                self.connection.execute(f"CREATE TABLE {TABLE} AS SELECT * FROM {TABLE}_frame")
+                self.connection.unregister(f'{TABLE}_frame')
+            # User SQL may read the dataset and nothing else on disk
+            # (read_csv('/etc/passwd'), glob(...), COPY, ATTACH, INSTALL)
+            self.connection.execute(f"SET allowed_paths = ['{location}']")
+            self.connection.execute("SET enable_external_access = false")
+            self.connection.execute("SET lock_configuration = true")
+        else:
+            self.connection = sqlite3.connect(':memory:', check_same_thread=False)
+            self.connection.create_aggregate('median', 1, Median)
+            for name, function in DATE_FUNCTIONS.items():
+                self.connection.create_function(name, 1, function, deterministic=True)
+            self.loaded = None
+
+    def _load_columns(self, sql):
+        """SQLite: (re)build the table once a query names columns it does not have yet"""
+        suffix = dataset_store.PARSED_SUFFIX
+        named = {col for col in self.columns if re.search(rf'\b{re.escape(col)}(?:{suffix})?\b', sql)}
+        for derived, sources in DERIVED_SOURCES.items():
+            if re.search(rf'\b{derived}\b', sql):
+                named.update(col for col in sources if col in self.columns)
+        loaded = set() if self.loaded is None else set(self.loaded.columns)
+        if self.loaded is not None and named <= loaded:
+            return
+        # Typed columns (parsed deadlines, duration_numeric, ...) come with their sources
+        wanted = sorted(named | loaded) or self.columns[:1]
+        self.loaded = dataset_store.load_dataset(self.path, columns=wanted)
+        self.loaded.to_sql(TABLE, self.connection, if_exists='replace', index=False)
+
+    def query(self, sql, limit=MAX_ROWS):
+        """Run one SELECT; at most `limit` rows come back"""
+        sql = check_query(sql)
+        started = time.perf_counter()
+        if duckdb is not None:
+            # A cursor is a separate connection to the same database, so
+            # concurrent sessions do not share query state
+            cursor = self.connection.cursor()
+            cursor.execute(sql)
+            rows = cursor.fetchmany(limit + 1)
+            names = [column[0] for column in cursor.description]
+            cursor.close()
+        else:
+            with self.lock:
+                self._load_columns(sql)
+                cursor = self.connection.execute(sql)
+                rows = cursor.fetchmany(limit + 1)
+                names = [column[0] for column in cursor.description]
+        frame = pd.DataFrame.from_records(rows[:limit], columns=names)
+        return QueryResult(frame, len(rows) > limit, time.perf_counter() - started)
+
+    def close(self):
+        self.connection.close()
+
+
+def query(sql, dataset_path, limit=MAX_ROWS):
+    """One-off query (e.g. from Manual.ipynb): the result frame"""
+    engine = QueryEngine(dataset_path)
+    try:
+        return engine.query(sql, limit).frame
+    finally:
+        engine.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a SQL query against the merged dataset (table: opportunities)")
+    parser.add_argument('dataset', help="Merged dataset (CSV or Parquet)")
+    parser.add_argument('sql', help="A SELECT query")
+    parser.add_argument('--limit', type=int, default=50)
+    args = parser.parse_args(argv)
+
+    engine = QueryEngine(args.dataset)
+    try:
+        result = engine.query(args.sql, args.limit)
+    except QUERY_ERRORS as error:
+        print(f"✗ {error}")
+        return 1
+    finally:
+        engine.close()
+    with pd.option_context('display.max_columns', None, 'display.width', 200):
+        print(result.frame.to_string(index=False))
+    print(f"{len(result.frame)} row(s){' (truncated)' if result.truncated else ''} "
+          f"in {result.seconds * 1000:.1f} ms [{engine.backend}]")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
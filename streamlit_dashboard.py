@@ -9,9 +9,20 @@ import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import numpy as np
-from pathlib import Path
+import os
 from datetime import datetime
-import re
+
+import dashboard_data
+import dataset_watch
+import deadlines
+import export_data
+import instrumentation
+import recommend
+import result_cache
+import similar
+import sql_query
+import table_view
+import text_search
 
 # Page configuration
 st.set_page_config(
@@ -53,119 +64,175 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
-@st.cache_data
+DATASET_PATH = r'D:\D1\WTF\Hakathon\Data Batches\research_opportunities_complete.csv'
+
+# Instrumentation (see instrumentation.py): the Performance tab is shown with
+# ?admin=1 or DASHBOARD_ADMIN=1; metrics can go to a Prometheus text file, a
+# local /metrics endpoint and a JSON-lines log, each enabled by its variable
+ADMIN_MODE = os.environ.get('DASHBOARD_ADMIN') == '1'
+TRACE_ALLOCATIONS = os.environ.get('DASHBOARD_TRACE_ALLOC') == '1'
+METRICS_FILE = os.environ.get('DASHBOARD_METRICS_FILE')
+METRICS_PORT = int(os.environ.get('DASHBOARD_METRICS_PORT', 0))
+PERF_LOG = os.environ.get('DASHBOARD_PERF_LOG')
+
+@st.cache_resource
+def dataset_watcher():
+    """Loads the dataset once per process and hot-reloads it when merge_batches.py publishes a new version"""
+    # Results computed from a previous version are never served again: the
+    # caches depending on the data are emptied on every swap
+    dependent_caches = [load_result_cache(), load_export_cache()]
+    def drop_dependent_caches(old, new):
+        for cache in dependent_caches:
+            cache.clear()
+    watcher = dataset_watch.DatasetWatcher(DATASET_PATH, dashboard_data.load_dataset_version,
+                                          on_swap=drop_dependent_caches, expired=dashboard_data.expired)
+    return watcher.start()
+
+def current_dataset():
+    """
+    The dataset version this script run uses. It is pinned at the start of
+    the run (see main), so a reload finishing mid-run never mixes versions.
+    """
+    if 'dataset' not in st.session_state:
+        st.session_state['dataset'] = dataset_watcher().current()
+    return st.session_state['dataset']
+
+def pin_dataset():
+    """Pin the latest loaded version for this run; True if it changed since the session's last run"""
+    previous = st.session_state.get('dataset')
+    st.session_state['dataset'] = dataset_watcher().current()
+    return previous is not None and previous.version != st.session_state['dataset'].version
+
 def load_data():
-    """Load and cache the dataset"""
-    csv_path = r'D:\D1\WTF\Hakathon\Data Batches\research_opportunities_complete.csv'
-    
-    if not Path(csv_path).exists():
-        return None, "Dataset not found. Please run merge_batches.py first!"
-    
-    try:
-        df = pd.read_csv(csv_path, encoding='utf-8', quoting=1)
-        
-        # Parse deadline dates
-        deadline_cols = [col for col in df.columns if 'deadline' in col.lower()]
-        for col in deadline_cols:
-            try:
-                df[f'{col}_parsed'] = pd.to_datetime(df[col], errors='coerce')
-            except:
-                pass
-        
-        # Convert funding amounts to numeric
-        for col in ['funding_amount_min', 'funding_amount_max', 'funding_amount_avg']:
-            if col in df.columns:
-                df[col] = pd.to_numeric(df[col], errors='coerce')
-        
-        # Parse duration to numeric (extract years/months)
-        if 'duration' in df.columns:
-            df['duration_numeric'] = df['duration'].apply(extract_duration_numeric)
-        
-        return df, None
-    except Exception as e:
-        return None, f"Error loading dataset: {str(e)}"
+    """The pinned dataset, shared read-only by every session"""
+    dataset = current_dataset()
+    if dataset.error is None:
+        return dataset.value['df'], None
+    if isinstance(dataset.error, FileNotFoundError):
+        return None, str(dataset.error)
+    return None, f"Error loading dataset: {str(dataset.error)}"
 
-def extract_duration_numeric(duration_str):
-    """Extract numeric duration from string (in months)"""
-    if pd.isna(duration_str):
-        return None
-    
-    duration_str = str(duration_str).lower()
-    
-    # Extract years
-    years_match = re.search(r'(\d+)\s*year', duration_str)
-    years = int(years_match.group(1)) if years_match else 0
-    
-    # Extract months
-    months_match = re.search(r'(\d+)\s*month', duration_str)
-    months = int(months_match.group(1)) if months_match else 0
-    
-    total_months = (years * 12) + months
-    return total_months if total_months > 0 else None
+def dataset_resource(name):
+    dataset = current_dataset()
+    return None if dataset.error is not None else dataset.value[name]
+
+def load_aggregation_cube():
+    """Count cube over the chart dimensions, built once per dataset version"""
+    return dataset_resource('cube')
+
+@st.cache_resource
+def load_result_cache():
+    """LRU cache of per-filter-state results, shared by every session"""
+    return result_cache.LRUCache()
 
-def create_metric_cards(df):
+@st.cache_resource
+def load_recorder():
+    """Process-wide timing/memory recorder, with the configured exports"""
+    recorder = instrumentation.Recorder(trace_allocations=TRACE_ALLOCATIONS, log_path=PERF_LOG)
+    recorder.register_cache('results', load_result_cache().stats)
+    recorder.register_cache('exports', load_export_cache().files.stats)
+    if METRICS_PORT:
+        recorder.serve(METRICS_PORT)
+    return recorder
+
+def compute_metrics(df, rows):
+    """Values of the metric cards for the filtered rows (positions in the shared frame)"""
+    avg_funding = df['funding_amount_avg'].take(rows).median() if 'funding_amount_avg' in df.columns else None
+    return {
+        'total': len(rows),
+        'countries': df['country'].take(rows).nunique() if 'country' in df.columns else 0,
+        'median_funding': f"${avg_funding:,.0f}" if avg_funding is not None and pd.notna(avg_funding) else "N/A",
+        'types': df['opportunity_type'].take(rows).nunique() if 'opportunity_type' in df.columns else 0,
+    }
+
+def create_metric_cards(df, rows, filter_key=None):
     """Display key metrics in cards"""
+    metrics = load_result_cache().get_or_compute(('metrics', filter_key), lambda: compute_metrics(df, rows))
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
         st.metric(
             label="🎓 Total Opportunities",
-            value=f"{len(df):,}"
+            value=f"{metrics['total']:,}"
         )
     
     with col2:
-        unique_countries = df['country'].nunique() if 'country' in df.columns else 0
         st.metric(
             label="🌍 Countries",
-            value=f"{unique_countries}"
+            value=f"{metrics['countries']}"
         )
     
     with col3:
-        if 'funding_amount_avg' in df.columns:
-            avg_funding = df['funding_amount_avg'].median()
-            st.metric(
-                label="💰 Median Funding",
-                value=f"${avg_funding:,.0f}" if pd.notna(avg_funding) else "N/A"
-            )
-        else:
-            st.metric(label="💰 Median Funding", value="N/A")
+        st.metric(label="💰 Median Funding", value=metrics['median_funding'])
     
     with col4:
-        unique_types = df['opportunity_type'].nunique() if 'opportunity_type' in df.columns else 0
         st.metric(
             label="📋 Opportunity Types",
-            value=f"{unique_types}"
+            value=f"{metrics['types']}"
         )
 
+def load_filter_index():
+    """Bitmap filter index over the pinned dataset, built once per dataset version"""
+    return dataset_resource('filter_index')
+
+def load_eligibility_index():
+    """Per-country bitsets of eligible rows for the pinned dataset, built once per dataset version"""
+    return dataset_resource('eligibility_index')
+
+def load_deadline_index():
+    """Sorted deadline dates of the pinned dataset, built once per dataset version"""
+    return dataset_resource('deadline_index')
+
+def load_recommender():
+    """Profile matching encodings of the pinned dataset, built once per dataset version"""
+    return dataset_resource('recommender')
+
 def apply_filters(df):
     """Apply sidebar filters to the dataset"""
     st.sidebar.markdown("## 🔍 Filters")
     
-    filtered_df = df.copy()
+    # Filters are intersections of precomputed bitsets; the result is the
+    # selected row positions, which the views index the shared frame with
+    index = load_filter_index()
+    version = current_dataset().value
+    selected = index.full
+    state = {}
+    recorder = load_recorder()
+    
+    def narrow(selected, name, value, now=None):
+        """One filter step (see dashboard_data.filter_bitset): intersect the selection, recording the rows going in and out"""
+        bitset = dashboard_data.filter_bitset(version, name, value, now)
+        if bitset is None:
+            return selected
+        narrowed = selected & bitset
+        recorder.filter_rows(name, index.count(selected), index.count(narrowed))
+        return narrowed
     
     # Location filter
-    if 'country' in df.columns:
+    if index.has('country'):
         st.sidebar.markdown("### 🌍 Location")
-        countries = ['All'] + sorted(df['country'].dropna().unique().tolist())
+        countries = ['All'] + index.values('country')
         selected_country = st.sidebar.selectbox("Country", countries)
         
         if selected_country != 'All':
-            filtered_df = filtered_df[filtered_df['country'] == selected_country]
+            selected = narrow(selected, 'country', selected_country)
+        state['country'] = selected_country
     
     # Region filter
-    if 'region' in df.columns:
-        regions = ['All'] + sorted(df['region'].dropna().unique().tolist())
+    if index.has('region'):
+        regions = ['All'] + index.values('region')
         selected_region = st.sidebar.selectbox("Region", regions)
         
         if selected_region != 'All':
-            filtered_df = filtered_df[filtered_df['region'] == selected_region]
+            selected = narrow(selected, 'region', selected_region)
+        state['region'] = selected_region
     
     # Duration filter
     st.sidebar.markdown("### ⏱️ Duration")
-    if 'duration_numeric' in filtered_df.columns:
-        duration_values = filtered_df['duration_numeric'].dropna()
-        if len(duration_values) > 0:
-            min_dur, max_dur = int(duration_values.min()), int(duration_values.max())
+    if index.has('duration_numeric'):
+        duration_bounds = index.bounds('duration_numeric', selected)
+        if duration_bounds:
+            min_dur, max_dur = int(np.floor(duration_bounds[0])), int(np.ceil(duration_bounds[1]))
             
             duration_range = st.sidebar.slider(
                 "Duration (months)",
@@ -174,25 +241,20 @@ def apply_filters(df):
                 value=(min_dur, max_dur)
             )
             
-            filtered_df = filtered_df[
-                (filtered_df['duration_numeric'].isna()) |
-                ((filtered_df['duration_numeric'] >= duration_range[0]) &
-                 (filtered_df['duration_numeric'] <= duration_range[1]))
-            ]
+            # The full slider range keeps every row: not a filter
+            if duration_range != (min_dur, max_dur):
+                selected = narrow(selected, 'duration', duration_range)
+                state['duration'] = duration_range
     
     # Funding amount filter
     st.sidebar.markdown("### 💰 Funding Amount")
-    funding_col = None
-    for col in ['funding_amount_avg', 'funding_amount_min', 'funding_amount_max']:
-        if col in filtered_df.columns:
-            funding_col = col
-            break
+    funding_col = dashboard_data.funding_column(index)
     
     if funding_col:
-        funding_values = filtered_df[funding_col].dropna()
-        if len(funding_values) > 0:
-            min_fund = int(funding_values.min())
-            max_fund = int(funding_values.max())
+        funding_bounds = index.bounds(funding_col, selected)
+        if funding_bounds:
+            min_fund = int(funding_bounds[0])
+            max_fund = int(funding_bounds[1])
             
             funding_range = st.sidebar.slider(
                 "Funding Amount (USD)",
@@ -203,63 +265,68 @@ def apply_filters(df):
                 format="$%d"
             )
             
-            filtered_df = filtered_df[
-                (filtered_df[funding_col].isna()) |
-                ((filtered_df[funding_col] >= funding_range[0]) &
-                 (filtered_df[funding_col] <= funding_range[1]))
-            ]
+            if funding_range[0] > funding_bounds[0] or funding_range[1] < funding_bounds[1]:
+                selected = narrow(selected, 'funding', funding_range)
+                state['funding'] = (funding_col, *funding_range)
     
     # Field of study filter
-    if 'field_of_study' in df.columns:
+    if index.has('field_of_study'):
         st.sidebar.markdown("### 📚 Field of Study")
-        fields = ['All'] + sorted(df['field_of_study'].dropna().unique().tolist())
+        fields = ['All'] + index.values('field_of_study')
         selected_field = st.sidebar.selectbox("Field", fields)
         
         if selected_field != 'All':
-            filtered_df = filtered_df[filtered_df['field_of_study'] == selected_field]
+            selected = narrow(selected, 'field_of_study', selected_field)
+        state['field_of_study'] = selected_field
     
     # Career stage filter
-    if 'career_stage' in df.columns:
+    if index.has('career_stage'):
         st.sidebar.markdown("### 👨‍🎓 Career Stage")
-        stages = ['All'] + sorted(df['career_stage'].dropna().unique().tolist())
+        stages = ['All'] + index.values('career_stage')
         selected_stage = st.sidebar.selectbox("Career Stage", stages)
         
         if selected_stage != 'All':
-            filtered_df = filtered_df[filtered_df['career_stage'] == selected_stage]
+            selected = narrow(selected, 'career_stage', selected_stage)
+        state['career_stage'] = selected_stage
     
     # Opportunity type filter
-    if 'opportunity_type' in df.columns:
+    if index.has('opportunity_type'):
         st.sidebar.markdown("### 📋 Opportunity Type")
-        types = ['All'] + sorted(df['opportunity_type'].dropna().unique().tolist())
+        types = ['All'] + index.values('opportunity_type')
         selected_type = st.sidebar.selectbox("Type", types)
         
         if selected_type != 'All':
-            filtered_df = filtered_df[filtered_df['opportunity_type'] == selected_type]
+            selected = narrow(selected, 'opportunity_type', selected_type)
+        state['opportunity_type'] = selected_type
+    
+    # Nationality filter: one precomputed bitset per country
+    eligible = load_eligibility_index()
+    if eligible is not None:
+        st.sidebar.markdown("### 🛂 Eligibility")
+        nationality = st.sidebar.selectbox("My nationality", ['Any'] + eligible.countries)
+        
+        if nationality != 'Any':
+            include_unclear = st.sidebar.checkbox("Include unclear eligibility", value=True,
+                                                  help="Keep programmes whose eligibility text names no nationality")
+            selected = narrow(selected, 'nationality', (nationality, include_unclear))
+            state['nationality'] = (nationality, include_unclear)
     
     # Deadline filter
     st.sidebar.markdown("### 📅 Deadline")
-    deadline_filter = st.sidebar.radio(
-        "Show deadlines",
-        ["All", "Upcoming (2026)", "Past deadlines", "No deadline info"]
-    )
+    deadline_filter = st.sidebar.radio("Show deadlines", dashboard_data.DEADLINE_FILTERS)
     
-    if deadline_filter != "All":
-        deadline_col = None
-        for col in filtered_df.columns:
-            if 'deadline' in col.lower() and '_parsed' in col:
-                deadline_col = col
-                break
-        
-        if deadline_col:
-            if deadline_filter == "Upcoming (2026)":
-                filtered_df = filtered_df[
-                    (filtered_df[deadline_col] >= datetime.now()) &
-                    (filtered_df[deadline_col].dt.year == 2026)
-                ]
-            elif deadline_filter == "Past deadlines":
-                filtered_df = filtered_df[filtered_df[deadline_col] < datetime.now()]
-            elif deadline_filter == "No deadline info":
-                filtered_df = filtered_df[filtered_df[deadline_col].isna()]
+    state['deadline'] = deadline_filter
+    if deadline_filter != "All" and dashboard_data.deadline_column(df):
+        now = datetime.now()
+        selected = narrow(selected, 'deadline', deadline_filter, now)
+        state['deadline'] = dashboard_data.deadline_state(deadline_filter, now)
+    
+    # Row set per canonical filter state, shared across sessions; the
+    # dataset version is part of the key so results never cross a reload
+    state['dataset_version'] = current_dataset().version
+    filter_key = result_cache.canonical_key(state)
+    cache = load_result_cache()
+    rows = cache.get_or_compute(('rows', filter_key), lambda: index.rows(selected))
     
     # Display active filters count
     num_filters = 0
@@ -268,18 +335,95 @@ def apply_filters(df):
     if selected_field != 'All': num_filters += 1
     if 'selected_stage' in locals() and selected_stage != 'All': num_filters += 1
     if 'selected_type' in locals() and selected_type != 'All': num_filters += 1
+    if 'nationality' in locals() and nationality != 'Any': num_filters += 1
     if deadline_filter != "All": num_filters += 1
     
     st.sidebar.markdown("---")
-    st.sidebar.info(f"🔍 **{num_filters}** active filters\n\n📊 **{len(filtered_df):,}** opportunities match")
+    st.sidebar.info(f"🔍 **{num_filters}** active filters\n\n📊 **{len(rows):,}** opportunities match")
+    
+    cache_stats = cache.stats()
+    st.sidebar.caption(f"Result cache: {cache_stats['hits']:,} hits / {cache_stats['misses']:,} misses "
+                       f"({cache_stats['entries']}/{cache_stats['max_entries']} entries)")
     
     # Reset filters button
     if st.sidebar.button("🔄 Reset All Filters"):
         st.rerun()
     
-    return filtered_df
+    return rows, filter_key
+
+def load_record_store():
+    """Records keyed by opportunity_id with a name search index, built once per dataset version"""
+    return dataset_resource('record_store')
+
+def load_search_index():
+    """Full-text index written by merge_batches.py, loaded with its dataset version"""
+    return dataset_resource('search_index')
+
+def load_sql_engine():
+    """SQL over the merged file of the pinned dataset version (see sql_query.py)"""
+    return dataset_resource('sql_engine')
+
+def load_similar_index():
+    """TF-IDF similarity index written by merge_batches.py (None when missing or stale)"""
+    return dataset_resource('similar_index')
+
+def apply_search(df, rows, filter_key):
+    """Full-text search box; matches are restricted to the filtered rows and ranked by relevance"""
+    query = st.text_input("🔎 Search opportunities",
+                          placeholder="e.g. postdoctoral Africa, women in science, engineering PhD",
+                          key="search_query").strip()
+    if not query:
+        return rows, filter_key
+    
+    index = load_search_index()
+    if index is None:
+        st.warning("⚠️ Search index not found or out of date. Re-run merge_batches.py to build it.")
+        return rows, filter_key
+    
+    search_key = filter_key + (('search', ' '.join(text_search.tokenize(query))),)
+    def run_search():
+        allowed = np.zeros(len(df), dtype=bool)
+        allowed[rows] = True
+        return index.search(query, allowed)
+    return load_result_cache().get_or_compute(('rows', search_key), run_search), search_key
 
-def create_visualizations(df):
+@st.cache_resource
+def load_export_cache():
+    """Export files per filter state and format, shared by every session"""
+    return export_data.ExportCache()
+
+def show_chart(filter_key, name, build):
+    """
+    Render one chart. The figure is built on a cache miss and kept as a
+    plain dict per filter state, so reruns and other sessions reuse it.
+    """
+    def build_figure():
+        fig = build()
+        return fig.to_dict() if fig is not None else None
+    
+    with load_recorder().span(name, kind='chart'):
+        figure = load_result_cache().get_or_compute(('chart', name, filter_key), build_figure)
+        if figure is not None:
+            st.plotly_chart(figure, use_container_width=True)
+
+def cube_state(filter_key):
+    """The filter state a cube roll-up answers: the key without the dataset version"""
+    if filter_key is None:
+        return None
+    return {name: value for name, value in filter_key if name != 'dataset_version'}
+
+def chart_counts(df, rows, filter_key, col):
+    """
+    value_counts of one chart dimension over the filtered rows: rolled up
+    from the aggregation cube when the filters allow it, scanned otherwise
+    """
+    cube = load_aggregation_cube()
+    state = cube_state(filter_key)
+    if cube is not None and state is not None and col in cube.dimensions and cube.supports(state):
+        return cube.value_counts(col, state)
+    return df[col].take(rows).value_counts().loc[lambda counts: counts > 0]
+
+def create_visualizations(df, rows, filter_key=None):
     """Create interactive visualizations"""
     
     # Geographic distribution
@@ -288,35 +432,41 @@ def create_visualizations(df):
     
     with col1:
         if 'country' in df.columns:
-            country_counts = df['country'].value_counts().head(15).reset_index()
-            country_counts.columns = ['Country', 'Count']
+            def country_chart():
+                country_counts = chart_counts(df, rows, filter_key, 'country').head(15).reset_index()
+                country_counts.columns = ['Country', 'Count']
+                
+                fig = px.bar(
+                    country_counts,
+                    x='Count',
+                    y='Country',
+                    orientation='h',
+                    title="Top 15 Countries",
+                    color='Count',
+                    color_continuous_scale='Blues'
+                )
+                fig.update_layout(height=500, showlegend=False)
+                return fig
             
-            fig = px.bar(
-                country_counts,
-                x='Count',
-                y='Country',
-                orientation='h',
-                title="Top 15 Countries",
-                color='Count',
-                color_continuous_scale='Blues'
-            )
-            fig.update_layout(height=500, showlegend=False)
-            st.plotly_chart(fig, use_container_width=True)
+            show_chart(filter_key, 'country', country_chart)
     
     with col2:
         if 'region' in df.columns:
-            region_counts = df['region'].value_counts().reset_index()
-            region_counts.columns = ['Region', 'Count']
+            def region_chart():
+                region_counts = chart_counts(df, rows, filter_key, 'region').reset_index()
+                region_counts.columns = ['Region', 'Count']
+                
+                fig = px.pie(
+                    region_counts,
+                    values='Count',
+                    names='Region',
+                    title="Regional Distribution",
+                    color_discrete_sequence=px.colors.qualitative.Set3
+                )
+                fig.update_layout(height=500)
+                return fig
             
-            fig = px.pie(
-                region_counts,
-                values='Count',
-                names='Region',
-                title="Regional Distribution",
-                color_discrete_sequence=px.colors.qualitative.Set3
-            )
-            fig.update_layout(height=500)
-            st.plotly_chart(fig, use_container_width=True)
+            show_chart(filter_key, 'region', region_chart)
     
     # Funding and opportunity analysis
     st.markdown("### 💰 Funding & Opportunities")
@@ -324,24 +474,29 @@ def create_visualizations(df):
     
     with col1:
         if 'opportunity_type' in df.columns:
-            type_counts = df['opportunity_type'].value_counts().reset_index()
-            type_counts.columns = ['Type', 'Count']
+            def type_chart():
+                type_counts = chart_counts(df, rows, filter_key, 'opportunity_type').reset_index()
+                type_counts.columns = ['Type', 'Count']
+                
+                fig = px.bar(
+                    type_counts,
+                    x='Type',
+                    y='Count',
+                    title="Opportunity Types",
+                    color='Count',
+                    color_continuous_scale='Viridis'
+                )
+                fig.update_layout(height=400, showlegend=False)
+                return fig
             
-            fig = px.bar(
-                type_counts,
-                x='Type',
-                y='Count',
-                title="Opportunity Types",
-                color='Count',
-                color_continuous_scale='Viridis'
-            )
-            fig.update_layout(height=400, showlegend=False)
-            st.plotly_chart(fig, use_container_width=True)
+            show_chart(filter_key, 'opportunity_type', type_chart)
     
     with col2:
         if 'funding_amount_avg' in df.columns:
-            funding_data = df[df['funding_amount_avg'].notna()].copy()
-            if len(funding_data) > 0:
+            def funding_chart():
+                funding_data = df['funding_amount_avg'].take(rows).dropna().to_frame()
+                if len(funding_data) == 0:
+                    return None
                 fig = px.histogram(
                     funding_data,
                     x='funding_amount_avg',
@@ -351,7 +506,9 @@ def create_visualizations(df):
                     color_discrete_sequence=['#ff7f0e']
                 )
                 fig.update_layout(height=400, showlegend=False)
-                st.plotly_chart(fig, use_container_width=True)
+                return fig
+            
+            show_chart(filter_key, 'funding', funding_chart)
     
     # Career stage and field analysis
     st.markdown("### 🎓 Career Stage & Field Analysis")
@@ -359,51 +516,58 @@ def create_visualizations(df):
     
     with col1:
         if 'career_stage' in df.columns:
-            stage_counts = df['career_stage'].value_counts().reset_index()
-            stage_counts.columns = ['Career Stage', 'Count']
+            def stage_chart():
+                stage_counts = chart_counts(df, rows, filter_key, 'career_stage').reset_index()
+                stage_counts.columns = ['Career Stage', 'Count']
+                
+                fig = px.bar(
+                    stage_counts,
+                    x='Count',
+                    y='Career Stage',
+                    orientation='h',
+                    title="Career Stage Distribution",
+                    color='Count',
+                    color_continuous_scale='Purples'
+                )
+                fig.update_layout(height=400, showlegend=False)
+                return fig
             
-            fig = px.bar(
-                stage_counts,
-                x='Count',
-                y='Career Stage',
-                orientation='h',
-                title="Career Stage Distribution",
-                color='Count',
-                color_continuous_scale='Purples'
-            )
-            fig.update_layout(height=400, showlegend=False)
-            st.plotly_chart(fig, use_container_width=True)
+            show_chart(filter_key, 'career_stage', stage_chart)
     
     with col2:
         if 'field_of_study' in df.columns:
-            field_counts = df['field_of_study'].value_counts().head(10).reset_index()
-            field_counts.columns = ['Field', 'Count']
+            def field_chart():
+                field_counts = chart_counts(df, rows, filter_key, 'field_of_study').head(10).reset_index()
+                field_counts.columns = ['Field', 'Count']
+                
+                fig = px.pie(
+                    field_counts,
+                    values='Count',
+                    names='Field',
+                    title="Top 10 Fields of Study",
+                    color_discrete_sequence=px.colors.qualitative.Pastel
+                )
+                fig.update_layout(height=400)
+                return fig
             
-            fig = px.pie(
-                field_counts,
-                values='Count',
-                names='Field',
-                title="Top 10 Fields of Study",
-                color_discrete_sequence=px.colors.qualitative.Pastel
-            )
-            fig.update_layout(height=400)
-            st.plotly_chart(fig, use_container_width=True)
+            show_chart(filter_key, 'field_of_study', field_chart)
     
     # Timeline analysis
     st.markdown("### 📅 Deadline Timeline")
-    deadline_col = None
-    for col in df.columns:
-        if 'deadline' in col.lower() and '_parsed' in col:
-            deadline_col = col
-            break
+    deadline_col = dashboard_data.deadline_column(df)
     
     if deadline_col:
-        deadline_data = df[df[deadline_col].notna()].copy()
-        if len(deadline_data) > 0:
-            deadline_data['Month'] = deadline_data[deadline_col].dt.month
-            deadline_data['Year'] = deadline_data[deadline_col].dt.year
-            
-            monthly_counts = deadline_data.groupby(['Year', 'Month']).size().reset_index(name='Count')
+        def deadline_chart():
+            cube = load_aggregation_cube()
+            state = cube_state(filter_key)
+            if cube is not None and cube.has_deadline and state is not None and cube.supports(state):
+                monthly_counts = cube.deadline_months(state)
+            else:
+                deadlines = df[deadline_col].take(rows).dropna()
+                deadline_data = pd.DataFrame({'Month': deadlines.dt.month, 'Year': deadlines.dt.year})
+                monthly_counts = deadline_data.groupby(['Year', 'Month']).size().reset_index(name='Count')
+            if len(monthly_counts) == 0:
+                return None
             
             fig = px.line(
                 monthly_counts,
@@ -421,89 +585,142 @@ def create_visualizations(df):
                          'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
             )
             fig.update_layout(height=400)
-            st.plotly_chart(fig, use_container_width=True)
+            return fig
+        
+        show_chart(filter_key, 'deadlines', deadline_chart)
     
     # Competitiveness analysis
     if 'acceptance_rate_category' in df.columns:
         st.markdown("### 🎯 Competitiveness Analysis")
         
-        comp_counts = df['acceptance_rate_category'].value_counts().reset_index()
-        comp_counts.columns = ['Category', 'Count']
+        def competitiveness_chart():
+            comp_counts = chart_counts(df, rows, filter_key, 'acceptance_rate_category').reset_index()
+            comp_counts.columns = ['Category', 'Count']
+            
+            fig = px.pie(
+                comp_counts,
+                values='Count',
+                names='Category',
+                title="Acceptance Rate Categories",
+                color_discrete_sequence=px.colors.sequential.RdBu
+            )
+            fig.update_layout(height=400)
+            return fig
         
-        fig = px.pie(
-            comp_counts,
-            values='Count',
-            names='Category',
-            title="Acceptance Rate Categories",
-            color_discrete_sequence=px.colors.sequential.RdBu
-        )
-        fig.update_layout(height=400)
-        st.plotly_chart(fig, use_container_width=True)
+        show_chart(filter_key, 'competitiveness', competitiveness_chart)
 
-def display_data_table(df):
+def display_data_table(df, rows, filter_key=None):
     """Display interactive data table"""
     st.markdown("### 📊 Detailed Opportunities Table")
     
     # Select columns to display
-    display_cols = []
-    for col in ['opportunity_id', 'program_name', 'institution', 'country', 
-                'opportunity_type', 'funding_amount_avg', 'duration', 
-                'deadline_primary', 'career_stage', 'field_of_study', 'application_url']:
-        if col in df.columns:
-            display_cols.append(col)
+    display_cols = table_view.table_columns(df)
     
     if display_cols:
-        # Display dataframe with formatting
-        display_df = df[display_cols].copy()
+        # Server-side sort and pagination: only the visible page is taken
+        # from the shared frame, formatted and sent to the browser
+        col1, col2, col3 = st.columns([2, 1, 1])
+        with col1:
+            sort_col = st.selectbox("Sort by", ["(none)"] + display_cols, key="table_sort")
+        with col2:
+            ascending = st.radio("Order", ["Ascending", "Descending"], horizontal=True,
+                                 key="table_order") == "Ascending"
+        with col3:
+            page_size = st.selectbox("Rows per page", table_view.PAGE_SIZES, key="table_page_size")
         
-        # Format funding amounts
-        if 'funding_amount_avg' in display_df.columns:
-            display_df['funding_amount_avg'] = display_df['funding_amount_avg'].apply(
-                lambda x: f"${x:,.0f}" if pd.notna(x) else "N/A"
-            )
+        sort_col = None if sort_col == "(none)" else sort_col
+        order = load_result_cache().get_or_compute(
+            ('table_order', filter_key, sort_col, ascending),
+            lambda: table_view.sort_order(df, sort_col, ascending, rows))
         
-        # Make URLs clickable
-        if 'application_url' in display_df.columns:
-            display_df['application_url'] = display_df['application_url'].apply(
-                lambda x: f'<a href="{x}" target="_blank">Apply</a>' if pd.notna(x) else ""
-            )
+        pages = table_view.page_count(len(rows), page_size)
+        page = st.number_input(f"Page (of {pages:,})", min_value=1, max_value=pages, value=1, step=1,
+                               key="table_page")
+        page = min(page, pages)
+        page_positions = table_view.page_rows(order, page, page_size)
+        
+        display_df = table_view.format_page(df[display_cols].take(page_positions))
         
-        # Display with pagination
         st.dataframe(
             display_df,
             use_container_width=True,
             height=600,
             hide_index=True
         )
+        first = (page - 1) * page_size
+        st.caption(f"Showing {first + 1:,}–{first + len(page_positions):,} of {len(rows):,} opportunities")
         
-        # Download button
-        csv = df.to_csv(index=False).encode('utf-8')
+        # Download button: the file is only generated (in chunks, on disk)
+        # when clicked, and reused for the same filters and format
+        formats = export_data.available_formats()
+        export_format = st.selectbox(
+            "Download format", formats,
+            format_func=lambda fmt: export_data.EXPORT_FORMATS[fmt][0],
+            key="export_format"
+        )
+        label, extension, mime = export_data.EXPORT_FORMATS[export_format]
+        exports = load_export_cache()
+        version = current_dataset().version
         st.download_button(
-            label="📥 Download Filtered Data (CSV)",
-            data=csv,
-            file_name=f"filtered_opportunities_{datetime.now().strftime('%Y%m%d')}.csv",
-            mime="text/csv"
+            label=f"📥 Download Filtered Data ({label})",
+            # Every column of the merged file for the filtered rows (the
+            # frame only holds the dashboard's columns)
+            data=lambda: exports.read(DATASET_PATH, rows, filter_key, export_format, version),
+            file_name=f"filtered_opportunities_{datetime.now().strftime('%Y%m%d')}{extension}",
+            mime=mime,
+            on_click="ignore"
         )
 
-def display_opportunity_details(df):
+def display_similar_opportunities(store, position, allowed, filter_key=None):
+    """The filtered programs closest to one program (see similar.py)"""
+    index = load_similar_index()
+    if index is None:
+        return
+    
+    rows, scores = load_result_cache().get_or_compute(
+        ('similar', filter_key, position), lambda: index.neighbours(position, similar.MAX_NEIGHBOURS, allowed))
+    
+    st.markdown("**🔗 Similar Opportunities:**")
+    if len(rows) == 0:
+        st.caption("No similar programs among the filtered results.")
+        return
+    columns = [col for col in ['opportunity_id', store.name_col, 'institution', 'country', 'opportunity_type']
+               if col and col in store.df.columns]
+    st.dataframe(
+        store.df[columns].take(rows).assign(similarity=scores * 100),
+        use_container_width=True,
+        hide_index=True,
+        column_config={'similarity': st.column_config.ProgressColumn("Similarity", format="%.0f%%",
+                                                                     min_value=0, max_value=100)},
+    )
+
+def display_opportunity_details(df, rows, filter_key=None):
     """Display individual opportunity details"""
     st.markdown("### 🔍 Opportunity Details")
     
-    if 'program_name' in df.columns and len(df) > 0:
-        program_names = df['program_name'].dropna().tolist()
+    store = load_record_store()
+    
+    if store is not None and store.name_col and len(rows) > 0:
+        # Type-ahead over the name index, restricted to the filtered rows;
+        # the selection is an opportunity_id, so duplicate names stay distinct
+        query = st.text_input("Search programs by name:", key="details_query")
+        allowed = np.zeros(len(store), dtype=bool)
+        allowed[rows] = True
+        matches = store.search(query, allowed)
         
-        selected_program = st.selectbox(
+        selected_id = st.selectbox(
             "Select a program to view details:",
-            options=["Select..."] + program_names
+            options=["Select..."] + matches,
+            format_func=lambda opportunity_id: opportunity_id if opportunity_id == "Select..." else store.label(opportunity_id)
         )
         
-        if selected_program != "Select...":
-            opportunity = df[df['program_name'] == selected_program].iloc[0]
+        if selected_id != "Select...":
+            opportunity = store.record(selected_id)
             
             col1, col2 = st.columns(2)
             
             with col1:
-                st.markdown(f"**🎓 Program:** {opportunity.get('program_name', 'N/A')}")
+                st.markdown(f"**🎓 Program:** {opportunity.get(store.name_col, 'N/A')}")
                 st.markdown(f"**🏛️ Institution:** {opportunity.get('institution', 'N/A')}")
                 st.markdown(f"**🌍 Country:** {opportunity.get('country', 'N/A')}")
                 st.markdown(f"**📋 Type:** {opportunity.get('opportunity_type', 'N/A')}")
@@ -529,16 +746,150 @@ def display_opportunity_details(df):
             if 'eligibility_criteria' in opportunity and pd.notna(opportunity['eligibility_criteria']):
                 st.markdown("**✅ Eligibility:**")
                 st.success(opportunity['eligibility_criteria'])
+            
+            display_similar_opportunities(store, store.position_of[selected_id], allowed, filter_key)
 
-def main():
-    """Main application function"""
+def display_recommendations(df, rows, filter_key=None):
+    """Filtered opportunities ranked for a researcher profile (see recommend.py)"""
+    st.markdown("### ⭐ Recommended for You")
+    
+    recommender = load_recommender()
+    if recommender is None:
+        return
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        nationality = st.selectbox("Nationality", ['Any'] + recommender.eligibility.countries, key="rec_nationality")
+        career_stage = st.selectbox("Career stage", ['Any'] + recommend.CAREER_STAGES, key="rec_stage")
+    with col2:
+        field = st.selectbox("Field of study", ['Any'] + recommender.fields, key="rec_field",
+                             format_func=lambda field: field[:1].upper() + field[1:])
+        funding = st.number_input("Desired funding ($, 0 = any)", min_value=0, value=0, step=5000, key="rec_funding")
+    with col3:
+        duration = st.number_input("Desired duration (months, 0 = any)", min_value=0, value=0, key="rec_duration")
+        horizon = st.number_input("Applying within (days, 0 = any)", min_value=0, value=90, key="rec_horizon")
+    k = st.slider("Number of recommendations", 5, 50, 10, key="rec_k")
+    
+    profile = recommend.Profile(
+        nationality=None if nationality == 'Any' else nationality,
+        career_stage=None if career_stage == 'Any' else career_stage,
+        field_of_study=None if field == 'Any' else field,
+        funding=funding or None, duration=duration or None, horizon_days=horizon or None,
+    )
+    
+    # Ranked among the filtered rows
+    ranked_rows, scores = load_result_cache().get_or_compute(
+        ('recommend', filter_key, tuple(profile), k),
+        lambda: recommender.top_k(profile, k, rows))
+    
+    if len(ranked_rows) == 0:
+        st.warning("⚠️ No filtered opportunities are open to this profile.")
+        return
+    
+    columns = [col for col in ['opportunity_name', 'program_name', 'institution', 'country', 'opportunity_type',
+                               'career_stage', 'field_of_study', deadlines.DEADLINE_NEXT_COLUMN]
+               if col in df.columns]
+    ranked = df[columns].take(ranked_rows).assign(match_score=scores * 100)
+    st.dataframe(
+        ranked,
+        use_container_width=True,
+        hide_index=True,
+        column_config={'match_score': st.column_config.ProgressColumn("Match", format="%.0f%%",
+                                                                      min_value=0, max_value=100)},
+    )
+
+SQL_EXAMPLE = """SELECT region, count(*) AS opportunities, median(duration_numeric) AS median_months
+FROM opportunities
+GROUP BY region
+ORDER BY opportunities DESC"""
+
+def display_sql():
+    """Ad-hoc SQL over the whole merged dataset (not the sidebar filters)"""
+    st.markdown("### 🧮 SQL Query")
+    
+    engine = load_sql_engine()
+    if engine is None:
+        return
+    
+    st.caption(f"One table, `{sql_query.TABLE}`, over the whole merged dataset ({engine.backend}); "
+               f"only SELECT queries, at most {sql_query.MAX_ROWS:,} rows shown.")
+    with st.expander("Columns"):
+        st.code(", ".join(engine.columns), language=None)
+    sql = st.text_area("Query", value=SQL_EXAMPLE, height=150, key="sql_query")
+    
+    if not st.button("▶️ Run", key="sql_run") and st.session_state.get('sql_last') != sql:
+        return
+    st.session_state['sql_last'] = sql
+    
+    try:
+        result = load_result_cache().get_or_compute(
+            ('sql', current_dataset().version, sql.strip()), lambda: engine.query(sql))
+    except sql_query.QUERY_ERRORS as error:
+        st.error(f"❌ {error}")
+        return
+    
+    st.dataframe(result.frame, use_container_width=True, hide_index=True)
+    st.caption(f"{len(result.frame):,} row(s){' (truncated)' if result.truncated else ''} "
+               f"in {result.seconds * 1000:,.0f} ms")
+
+def display_performance(recorder):
+    """Admin view of the instrumentation: the session's last run, totals, caches and filters"""
+    st.markdown("### ⏱️ Last Run")
+    run = st.session_state.get('last_run')
+    if run is None:
+        st.info("Timings appear after the first complete run of this session.")
+    else:
+        spans = pd.DataFrame([{
+            'Stage': '\u2003' * span['depth'] + span['name'],
+            'Kind': span['kind'],
+            'Time (ms)': round(span['seconds'] * 1000, 1),
+            'RSS Δ (MB)': None if span['rss_delta'] is None else round(span['rss_delta'] / 1e6, 1),
+            'Alloc peak (MB)': None if span['alloc_peak'] is None else round(span['alloc_peak'] / 1e6, 1),
+        } for span in sorted(run['spans'], key=lambda span: (span['offset'], span['depth']))])
+        st.caption(f"Total {run['seconds'] * 1000:,.0f} ms")
+        st.dataframe(spans, use_container_width=True, hide_index=True)
+        
+        if run['filters']:
+            st.markdown("**Filter rows (in → out)**")
+            st.dataframe(pd.DataFrame(run['filters']).rename(
+                columns={'name': 'Filter', 'rows_in': 'Rows in', 'rows_out': 'Rows out'}),
+                use_container_width=True, hide_index=True)
+    
+    st.markdown("### 💾 Caches")
+    cache_stats = recorder.cache_stats()
+    columns = st.columns(max(1, len(cache_stats)))
+    for column, (name, stats) in zip(columns, cache_stats.items()):
+        with column:
+            st.metric(f"{name.title()} hit rate", f"{stats['hit_rate']:.0%}",
+                      help=f"{stats['hits']:,} hits, {stats['misses']:,} misses, "
+                           f"{stats['evictions']:,} evictions, {stats['entries']} entries")
+    
+    st.markdown("### 📈 All Runs (this process)")
+    summary = pd.DataFrame(recorder.span_summary())
+    if len(summary) > 0:
+        st.dataframe(summary.round(2), use_container_width=True, hide_index=True)
+    
+    st.download_button("📥 Prometheus metrics", data=recorder.prometheus_text(),
+                       file_name="dashboard_metrics.prom", mime="text/plain", on_click="ignore")
+    exports = [f"file `{METRICS_FILE}`" if METRICS_FILE else None,
+               f"http://127.0.0.1:{METRICS_PORT}/metrics" if METRICS_PORT else None,
+               f"log `{PERF_LOG}`" if PERF_LOG else None]
+    exports = [export for export in exports if export]
+    st.caption("Exporting to " + ", ".join(exports) if exports else
+               "Set DASHBOARD_METRICS_FILE, DASHBOARD_METRICS_PORT or DASHBOARD_PERF_LOG to export metrics.")
+
+def render_page(recorder):
+    """The page, one span per stage"""
     
     # Header
     st.markdown('<p class="main-header">🎓 Research Opportunities Explorer</p>', unsafe_allow_html=True)
     st.markdown('<p class="sub-header">Discover and Filter Global Funding Opportunities</p>', unsafe_allow_html=True)
     
-    # Load data
-    df, error = load_data()
+    # Load data: the latest version published by merge_batches.py
+    with recorder.span('load_data'):
+        if pin_dataset():
+            st.toast("🔄 Dataset updated to the latest merge")
+        df, error = load_data()
     
     if error:
         st.error(f"❌ {error}")
@@ -550,34 +901,61 @@ def main():
         return
     
     # Sidebar filters
-    filtered_df = apply_filters(df)
+    with recorder.span('apply_filters'):
+        rows, filter_key = apply_filters(df)
+    
+    # Full-text search within the filter results
+    with recorder.span('apply_search'):
+        rows, filter_key = apply_search(df, rows, filter_key)
     
     # Main content
-    create_metric_cards(filtered_df)
+    with recorder.span('metric_cards'):
+        create_metric_cards(df, rows, filter_key)
     
     st.markdown("---")
     
     # Tabs for different views
-    tab1, tab2, tab3, tab4 = st.tabs(["📊 Visualizations", "📋 Data Table", "🔍 Details", "ℹ️ About"])
+    admin = ADMIN_MODE or st.query_params.get('admin') == '1'
+    tab_names = ["📊 Visualizations", "📋 Data Table", "🔍 Details", "⭐ Recommended for You", "🧮 SQL", "ℹ️ About"]
+    tabs = st.tabs(tab_names + (["⚙️ Performance"] if admin else []))
+    tab1, tab2, tab3, tab_recommend, tab_sql, tab4 = tabs[:6]
     
     with tab1:
-        if len(filtered_df) > 0:
-            create_visualizations(filtered_df)
+        if len(rows) > 0:
+            with recorder.span('create_visualizations'):
+                create_visualizations(df, rows, filter_key)
         else:
             st.warning("⚠️ No opportunities match the current filters. Try adjusting your criteria.")
     
     with tab2:
-        if len(filtered_df) > 0:
-            display_data_table(filtered_df)
+        if len(rows) > 0:
+            with recorder.span('display_data_table'):
+                display_data_table(df, rows, filter_key)
         else:
             st.warning("⚠️ No opportunities match the current filters.")
     
     with tab3:
-        if len(filtered_df) > 0:
-            display_opportunity_details(filtered_df)
+        if len(rows) > 0:
+            with recorder.span('display_opportunity_details'):
+                display_opportunity_details(df, rows, filter_key)
         else:
             st.warning("⚠️ No opportunities match the current filters.")
     
+    with tab_recommend:
+        if len(rows) > 0:
+            with recorder.span('display_recommendations'):
+                display_recommendations(df, rows, filter_key)
+        else:
+            st.warning("⚠️ No opportunities match the current filters.")
+    
+    with tab_sql:
+        with recorder.span('display_sql'):
+            display_sql()
+    
+    if admin:
+        with tabs[6]:
+            display_performance(recorder)
+    
     with tab4:
         st.markdown("""
         ## About This Dashboard
@@ -589,6 +967,8 @@ def main():
         - 📊 **Interactive Visualizations**: Explore data through dynamic charts
         - 📋 **Detailed Tables**: View and download filtered results
         - 🎯 **Opportunity Details**: Deep dive into individual programs
+        - ⭐ **Recommendations**: Opportunities ranked for your nationality, career stage and field
+        - 🧮 **SQL**: Ad-hoc queries over the whole dataset
         
         ### Data Sources:
         This dashboard uses data compiled from:
@@ -614,5 +994,14 @@ def main():
         **Last Updated:** 2026-02-13
         """)
 
+def main():
+    """Main application function; every run is recorded (see instrumentation.py)"""
+    recorder = load_recorder()
+    with recorder.run() as run:
+        render_page(recorder)
+    st.session_state['last_run'] = run
+    if METRICS_FILE:
+        recorder.write_prometheus(METRICS_FILE)
+
 if __name__ == "__main__":
     main()
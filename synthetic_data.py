@@ -0,0 +1,188 @@
+"""
+Synthetic batch generator for benchmarks
+Writes research_opportunities_batch1..5.csv with the column layouts of the
+real batches in `Data Batches/` at any size (10^3 to 10^7 rows), so
+merge_batches.py and everything downstream can be measured at scale.
+
+Values are sampled column by column from the real batches (missing values
+keep their real share), with unique ids and the messy parts the pipeline
+has to cope with:
+  - free text with embedded commas, doubled ("escaped") quotes and newlines
+  - duration strings: "24", "2-3 years", "up to 36 months", "6 weeks", ...
+  - deadline strings: ISO dates, "December 5, 2026", "05/12/2026",
+    "Mid-October 2026", "Rolling", ...
+  - a small share of rows with unquoted commas (wrong field count), like the
+    hand-written batches, which only the tolerant parser accepts
+"""
+
+import argparse
+import csv
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import dataset_store
+import merge_batches
+
+SOURCE_DIR = Path(__file__).resolve().parent / 'Data Batches'
+
+CHUNK_ROWS = 100000
+
+# Share of rows with an unquoted comma in one text field
+BAD_ROW_RATE = 0.0005
+
+# Share of free-text values given commas, quotes or a line break
+MESSY_TEXT_RATE = 0.2
+
+TEXT_COLUMNS = ['notes', 'special_features', 'selection_criteria', 'required_documents',
+                'eligibility_criteria', 'description', 'funding_covers']
+
+AMOUNT_COLUMNS = ['funding_amount_min', 'funding_amount_max', 'funding_amount_typical',
+                  'award_amount_min', 'award_amount_max', 'stipend_amount']
+
+DURATION_STRINGS = [
+    '12', '24', '36', '48', '12 months', '18 months', '2 years', '1.5 years', '3 years',
+    '2-3 years', '18-24 months', '3 to 5 years', 'up to 36 months', 'Up to 2 years',
+    '6 weeks', '10 weeks', '1 year 6 months', '2 years 6 months',
+    'Varies by program (typically 24)', '12 months (renewable)', 'Not specified', 'Varies',
+]
+
+DEADLINE_WORDS = ['Rolling', 'TBA', 'Varies', 'Not specified', 'Rolling basis', 'Annual - varies']
+
+# strftime patterns the deadline columns are written with
+DEADLINE_FORMATS = ['%Y-%m-%d', '%Y-%m-%d', '%B %d, %Y', '%B %d %Y', '%d/%m/%Y', '%m/%d/%Y',
+                    '%b %Y', '%B %Y', 'Mid-%B %Y', 'Early %B %Y', 'Late %B %Y']
+
+MESSY_SUFFIXES = [
+    ', including "bridge" funding',
+    ' (see ""FAQ"", section 2)',
+    ', renewable, subject to review',
+    '\nApplications reviewed in two rounds',
+    '; known as "the flagship award"',
+]
+
+
+def read_layouts(source_dir=SOURCE_DIR):
+    """Column layout and value pools of each real batch, in batch order"""
+    layouts = []
+    for filename in merge_batches.batch_files:
+        df = pd.read_csv(Path(source_dir) / filename, encoding='utf-8', dtype=str, engine='python',
+                         on_bad_lines='skip', **merge_batches.CSV_READ_OPTIONS['alternative'])
+        pools = {col: df[col].to_numpy(dtype=object) for col in df.columns}
+        layouts.append((list(df.columns), pools))
+    return layouts
+
+
+def deadline_strings(rng, n):
+    """Dates between 2025 and 2027 in mixed formats, plus undated values"""
+    days = rng.integers(0, 3 * 365, n)
+    dates = pd.Timestamp('2025-01-01') + pd.to_timedelta(days, unit='D')
+    styles = rng.integers(0, len(DEADLINE_FORMATS) + 1, n)
+    values = np.empty(n, dtype=object)
+    for style, fmt in enumerate(DEADLINE_FORMATS):
+        selected = styles == style
+        values[selected] = dates[selected].strftime(fmt)
+    undated = styles == len(DEADLINE_FORMATS)
+    values[undated] = rng.choice(np.array(DEADLINE_WORDS, dtype=object), int(undated.sum()))
+    return values
+
+
+def amount_strings(rng, pool, n):
+    """Mostly plain amounts, the rest sampled from the real (partly textual) values"""
+    values = (rng.integers(2, 200, n) * 500).astype(str).astype(object)
+    real = rng.random(n) < 0.3
+    values[real] = pool[rng.integers(0, len(pool), int(real.sum()))]
+    return values
+
+
+def messy_text(rng, values):
+    messy = (rng.random(len(values)) < MESSY_TEXT_RATE) & pd.notna(values)
+    suffixes = rng.choice(np.array(MESSY_SUFFIXES, dtype=object), int(messy.sum()))
+    values = values.copy()
+    values[messy] = values[messy] + suffixes
+    return values
+
+
+def generate_chunk(rng, columns, pools, prefix, start, n):
+    """`n` rows of one batch layout, ids numbered from `start`"""
+    data = {}
+    for col in columns:
+        pool = pools[col]
+        if col == 'opportunity_id':
+            data[col] = np.char.add(prefix, np.char.zfill(np.arange(start, start + n).astype(str), 8))
+        elif col in ('opportunity_name', 'program_name'):
+            names = pd.Series(pool[rng.integers(0, len(pool), n)]).fillna('Programme')
+            data[col] = (names + ' ' + rng.integers(1, 50, n).astype(str)).to_numpy(dtype=object)
+        elif col in dataset_store.DURATION_SOURCE_COLUMNS:
+            data[col] = rng.choice(np.array(DURATION_STRINGS + list(pool[pd.notna(pool)]), dtype=object), n)
+        elif 'deadline' in col.lower():
+            data[col] = deadline_strings(rng, n)
+        elif col in AMOUNT_COLUMNS:
+            data[col] = amount_strings(rng, pool, n)
+        else:
+            values = pool[rng.integers(0, len(pool), n)]
+            data[col] = messy_text(rng, values) if col in TEXT_COLUMNS else values
+    return pd.DataFrame(data, columns=columns)
+
+
+def bad_lines(rng, chunk, rate=BAD_ROW_RATE):
+    """Some rows written without quoting, with an extra comma in a text field"""
+    bad = rng.random(len(chunk)) < rate
+    if not bad.any():
+        return chunk, []
+    lines = []
+    text_col = next((col for col in TEXT_COLUMNS if col in chunk.columns), chunk.columns[-1])
+    for _, row in chunk[bad].iterrows():
+        values = ['' if pd.isna(v) else str(v).replace('"', '').replace('\n', ' ') for v in row]
+        values[chunk.columns.get_loc(text_col)] += ', unquoted clause'
+        lines.append(','.join(values))
+    return chunk[~bad], lines
+
+
+def write_batch(path, columns, pools, prefix, rows, rng, chunk_rows=CHUNK_ROWS):
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        f.write(','.join(columns) + '\n')
+        for start in range(0, rows, chunk_rows):
+            chunk = generate_chunk(rng, columns, pools, prefix, start, min(chunk_rows, rows - start))
+            chunk, lines = bad_lines(rng, chunk)
+            f.write(chunk.to_csv(index=False, header=False, quoting=csv.QUOTE_MINIMAL, lineterminator='\n'))
+            for line in lines:
+                f.write(line + '\n')
+
+
+def generate(output_dir, rows, seed=0, source_dir=SOURCE_DIR):
+    """Write the five batch files with `rows` rows in total; returns their paths"""
+    os.makedirs(output_dir, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    layouts = read_layouts(source_dir)
+    sizes = np.full(len(layouts), rows // len(layouts))
+    sizes[:rows % len(layouts)] += 1
+    paths = []
+    for number, ((columns, pools), size) in enumerate(zip(layouts, sizes), 1):
+        path = os.path.join(output_dir, merge_batches.batch_files[number - 1])
+        write_batch(path, columns, pools, f'SYN{number}_', int(size), rng)
+        paths.append(path)
+    return paths
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate synthetic batch CSVs for benchmarks")
+    parser.add_argument('output_dir', help="Directory for research_opportunities_batch1..5.csv")
+    parser.add_argument('--rows', type=int, default=100000, help="Total rows over the five batches")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--source-dir', default=SOURCE_DIR, help="Real batches the layouts and values come from")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    paths = generate(args.output_dir, args.rows, args.seed, args.source_dir)
+    size = sum(os.path.getsize(path) for path in paths)
+    print(f"✓ {args.rows:,} rows in {len(paths)} batch files ({size / 1e6:.1f} MB) "
+          f"in {time.perf_counter() - started:.2f}s: {args.output_dir}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
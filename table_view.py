@@ -0,0 +1,60 @@
+"""
+Paginated view of the filtered opportunities table
+Sorting produces a row order once per (filter state, column, direction);
+only the rows of the visible page are taken from the frame and formatted
+"""
+
+import math
+
+import numpy as np
+import pandas as pd
+
+PAGE_SIZES = [25, 50, 100, 250]
+
+TABLE_COLUMNS = ['opportunity_id', 'program_name', 'institution', 'country',
+                 'opportunity_type', 'funding_amount_avg', 'duration',
+                 'deadline_primary', 'career_stage', 'field_of_study', 'application_url']
+
+
+def table_columns(df):
+    return [col for col in TABLE_COLUMNS if col in df.columns]
+
+
+def sort_order(df, column=None, ascending=True, rows=None):
+    """
+    Positions of `rows` (every row when None) in `df`, sorted by `column`
+    (missing values last); `rows` unchanged when unsorted
+    """
+    rows = np.arange(len(df)) if rows is None else np.asarray(rows)
+    if column is None or column not in df.columns:
+        return rows
+    values = df[column].take(rows).reset_index(drop=True)
+    return rows[values.sort_values(ascending=ascending, na_position='last', kind='stable').index.to_numpy()]
+
+
+def page_count(rows, page_size):
+    return max(1, math.ceil(rows / page_size))
+
+
+def page_rows(order, page, page_size):
+    """Positions shown on a 1-based page"""
+    start = (page - 1) * page_size
+    return order[start:start + page_size]
+
+
+def format_page(page_df):
+    """Display formatting, applied to one page only"""
+    page_df = page_df.copy()
+
+    # Format funding amounts
+    if 'funding_amount_avg' in page_df.columns:
+        funding = page_df['funding_amount_avg']
+        page_df['funding_amount_avg'] = funding.map(lambda x: f"${x:,.0f}", na_action='ignore').fillna("N/A")
+
+    # Make URLs clickable
+    if 'application_url' in page_df.columns:
+        urls = page_df['application_url']
+        page_df['application_url'] = ('<a href="' + urls.astype(str) + '" target="_blank">Apply</a>').where(
+            urls.notna(), "")
+
+    return page_df
@@ -0,0 +1,52 @@
+import csv
+
+import pandas as pd
+import pytest
+
+import dataset_store
+import similar
+import text_search
+
+COUNTRIES = [('Canada', 'North America'), ('Germany', 'Europe'), ('Japan', 'Asia'), ('Chile', 'South America')]
+FIELDS = ['Engineering', 'Life Sciences', 'Economics']
+TYPES = ['Scholarship', 'Fellowship', 'Grant']
+
+
+def opportunities_frame(rows=120):
+    """A merged dataset in the layout merge_batches.py writes (all text)"""
+    records = []
+    for i in range(rows):
+        country, region = COUNTRIES[i % len(COUNTRIES)]
+        field = FIELDS[i % len(FIELDS)]
+        records.append({
+            'opportunity_id': f'OP{i:04d}',
+            'opportunity_name': f'{country} {field} {TYPES[i % len(TYPES)]} {i}',
+            'institution': f'University of {country} {i % 5}',
+            'country': country,
+            'region': region,
+            'opportunity_type': TYPES[i % len(TYPES)],
+            'career_stage': 'PhD' if i % 2 else 'Postdoctoral',
+            'field_of_study': field,
+            'duration': f'{12 + i % 4 * 12} months',
+            'funding_amount_avg': str(10000 + 1000 * (i % 7)) if i % 10 else None,
+            'deadline_primary': f'2026-{i % 12 + 1:02d}-15',
+            'description': f'Funding for {field.lower()} research in {country}, cohort {i % 3}',
+            'eligibility_criteria': f'Open to {COUNTRIES[(i + 1) % len(COUNTRIES)][0]} nationals',
+        })
+    return pd.DataFrame(records)
+
+
+def write_merged(path, frame):
+    """Write a merged CSV with its search and similarity indexes and a version stamp"""
+    frame.to_csv(path, index=False, encoding='utf-8', quoting=csv.QUOTE_ALL)
+    version = dataset_store.new_version()
+    text_search.build_index(path, version=version)
+    similar.build_index(path, version=version)
+    dataset_store.write_version_stamp(path, len(frame), version)
+    return path
+
+
+@pytest.fixture(scope='module')
+def merged_dataset(tmp_path_factory):
+    directory = tmp_path_factory.mktemp('merged')
+    return write_merged(directory / 'research_opportunities_complete.csv', opportunities_frame())
@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import agg_cube
+
+TODAY = pd.Timestamp('2026-06-15')
+
+
+@pytest.fixture(scope='module')
+def frame():
+    rng = np.random.default_rng(7)
+    n = 2000
+    pick = lambda values: pd.Series(rng.choice(np.array(values, dtype=object), n))
+    df = pd.DataFrame({
+        'country': pick(['Canada', 'Chile', 'Germany', 'Japan', None]),
+        'region': pick(['Asia', 'Europe', 'North America', None]),
+        'opportunity_type': pick(['Grant', 'Fellowship', 'Scholarship']),
+        'career_stage': pick(['PhD', 'Postdoctoral', None]),
+        'field_of_study': pick(['Economics', 'Engineering', 'Life Sciences', 'Physics']),
+        'deadline_next': pd.to_datetime('2025-09-01') + pd.to_timedelta(rng.integers(0, 600, n), unit='D'),
+    })
+    df.loc[rng.random(n) < 0.1, 'deadline_next'] = pd.NaT
+    return df
+
+
+def rows_matching(df, state):
+    mask = pd.Series(True, index=df.index)
+    for name, value in state.items():
+        if name != 'deadline':
+            mask &= df[name] == value
+        elif value == "No deadline info":
+            mask &= df['deadline_next'].isna()
+        elif value[0] == "Past deadlines":
+            mask &= df['deadline_next'] <= value[1]
+        else:
+            mask &= (df['deadline_next'] > value[1]) & (df['deadline_next'].dt.year == agg_cube.UPCOMING_YEAR)
+    return df[mask]
+
+
+STATES = [
+    {},
+    {'country': 'Chile'},
+    {'region': 'Europe', 'career_stage': 'PhD'},
+    {'deadline': "No deadline info"},
+    {'country': 'Japan', 'deadline': ("Upcoming (2026)", TODAY)},
+    {'opportunity_type': 'Grant', 'deadline': ("Past deadlines", TODAY)},
+    {'country': 'Atlantis'},
+]
+
+
+@pytest.mark.parametrize('state', STATES)
+@pytest.mark.parametrize('dimension', ['country', 'career_stage', 'field_of_study'])
+def test_counts_equal_value_counts_of_the_filtered_rows(frame, state, dimension):
+    cube = agg_cube.AggregationCube(frame, deadline_col='deadline_next')
+    assert cube.supports(state)
+    counts = cube.value_counts(dimension, state)
+    expected = rows_matching(frame, state)[dimension].value_counts()
+    assert counts.to_dict() == expected.to_dict()
+    assert counts.is_monotonic_decreasing
+
+
+@pytest.mark.parametrize('state', STATES[:5])
+def test_deadline_months_equal_a_groupby(frame, state):
+    cube = agg_cube.AggregationCube(frame, deadline_col='deadline_next')
+    days = rows_matching(frame, state)['deadline_next'].dropna()
+    expected = days.groupby([days.dt.year.rename('Year'), days.dt.month.rename('Month')]).size()
+    months = cube.deadline_months(state).set_index(['Year', 'Month'])['Count']
+    assert months.to_dict() == expected.to_dict()
+
+
+def test_numeric_filters_need_the_rows(frame):
+    cube = agg_cube.AggregationCube(frame, deadline_col='deadline_next')
+    assert not cube.supports({'funding': (0, 1000)})
+    assert not cube.supports({'deadline': ("Next 30 days", TODAY)})
+    assert cube.rows == len(frame)
@@ -0,0 +1,121 @@
+import base64
+import gzip
+import json
+import urllib.error
+import urllib.request
+
+import pytest
+
+import api_server
+
+
+@pytest.fixture(scope='module')
+def server(merged_dataset):
+    server = api_server.serve(merged_dataset, port=0, background=True)
+    yield server
+    server.shutdown()
+    server.server_close()
+    server.api.watcher.stop()
+
+
+def get(server, path, headers=None):
+    """(status, headers, body bytes) of one GET on the test server"""
+    url = f'http://127.0.0.1:{server.server_address[1]}{path}'
+    request = urllib.request.Request(url, headers=headers or {})
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status, response.headers, response.read()
+    except urllib.error.HTTPError as error:
+        return error.code, error.headers, error.read()
+
+
+def get_json(server, path, headers=None):
+    status, _, body = get(server, path, headers)
+    return status, json.loads(body)
+
+
+def test_health(server, merged_dataset):
+    status, payload = get_json(server, '/health')
+    assert status == 200
+    assert payload['rows'] == 120
+
+
+def test_pages_cover_the_result_once(server):
+    ids, path = [], '/opportunities?region=Europe&limit=7'
+    while True:
+        status, payload = get_json(server, path)
+        assert status == 200 and payload['total'] == 30
+        ids += [record['opportunity_id'] for record in payload['data']]
+        if payload['next_cursor'] is None:
+            break
+        path = f"/opportunities?region=Europe&limit=7&cursor={payload['next_cursor']}"
+    assert len(ids) == len(set(ids)) == 30
+    assert all(int(opportunity_id[2:]) % 4 == 1 for opportunity_id in ids)
+
+
+def test_cursors_are_bound_to_their_query(server):
+    _, payload = get_json(server, '/opportunities?country=Japan&limit=5')
+    cursor = payload['next_cursor']
+    assert get(server, f'/opportunities?country=Chile&limit=5&cursor={cursor}')[0] == 410
+    assert get(server, '/opportunities?country=Japan&cursor=not-a-cursor')[0] == 400
+
+    # A well-formed cursor for this query with an offset outside the result
+    fields = json.loads(base64.urlsafe_b64decode(cursor))
+    for offset in (-5, 1000):
+        crafted = base64.urlsafe_b64encode(json.dumps({**fields, 'offset': offset}).encode()).decode()
+        assert get(server, f'/opportunities?country=Japan&limit=5&cursor={crafted}')[0] == 400
+
+
+def test_etag_answers_304(server):
+    status, headers, body = get(server, '/opportunities?limit=3')
+    assert status == 200 and body
+    status, headers_304, body_304 = get(server, '/opportunities?limit=3', {'If-None-Match': headers['ETag']})
+    assert status == 304 and body_304 == b''
+    assert headers_304['ETag'] == headers['ETag']
+
+
+def test_gzip_is_a_separate_representation(server):
+    _, plain_headers, plain = get(server, '/opportunities?limit=50')
+    status, headers, body = get(server, '/opportunities?limit=50', {'Accept-Encoding': 'gzip'})
+    assert status == 200 and headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(body) == plain
+    assert headers['ETag'] != plain_headers['ETag']
+    assert get(server, '/opportunities?limit=50', {'Accept-Encoding': 'gzip',
+                                                  'If-None-Match': headers['ETag']})[0] == 304
+    # The identity tag does not validate the gzip representation
+    assert get(server, '/opportunities?limit=50', {'Accept-Encoding': 'gzip',
+                                                  'If-None-Match': plain_headers['ETag']})[0] == 200
+
+
+@pytest.mark.parametrize('path, status', [
+    ('/nothing-here', 404),
+    ('/opportunities/OP9999', 404),
+    ('/opportunities?limit=many', 400),
+    ('/opportunities?duration_min=long', 400),
+    ('/opportunities?deadline=Someday', 400),
+    ('/aggregate?by=no_such_column', 400),
+    ('/aggregate?by=country&value=country', 400),
+])
+def test_errors(server, path, status):
+    got, payload = get_json(server, path)
+    assert got == status
+    assert 'error' in payload
+
+
+def test_record_search_and_similar(server):
+    status, payload = get_json(server, '/opportunities/OP0005')
+    assert status == 200 and payload['data']['opportunity_id'] == 'OP0005'
+
+    _, payload = get_json(server, '/opportunities?q=economics%20japan&limit=500')
+    assert payload['total'] > 0
+    assert all(record['country'] == 'Japan' for record in payload['data'][:5])
+
+    status, payload = get_json(server, '/opportunities/OP0005/similar?limit=3')
+    assert status == 200 and payload['count'] == 3
+    assert 'OP0005' not in [record['opportunity_id'] for record in payload['data']]
+
+
+def test_aggregate_matches_the_filtered_rows(server):
+    _, payload = get_json(server, '/aggregate?by=country&opportunity_type=Grant')
+    counts = {group['value']: group['count'] for group in payload['groups']}
+    assert counts == {'Canada': 10, 'Germany': 10, 'Japan': 10, 'Chile': 10}
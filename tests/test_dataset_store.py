@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import dataset_store
+
+
+@pytest.mark.parametrize('text, months', [
+    ("24", 24),
+    ("2-3 years", 30),
+    ("1.5 years", 18),
+    ("up to 36 months", 36),
+    ("2 years 6 months", 30),
+    ("4-year program", 48),
+    ("Year 1: 12 months", 12),
+    ("10 months (Year 1)", 10),
+])
+def test_parse_duration_months(text, months):
+    assert dataset_store.parse_duration_months(pd.Series([text]))[0] == pytest.approx(months)
+
+
+def test_shared_snapshot_maps_numeric_columns_read_only(tmp_path):
+    path = tmp_path / 'research_opportunities_complete.csv'
+    pd.DataFrame({'opportunity_id': ['A', 'B', 'C'], 'country': ['Chile', None, 'Chile'],
+                  'funding_amount_avg': ['1000', None, '2500']}).to_csv(path, index=False)
+    first = dataset_store.load_shared(path)
+    second = dataset_store.load_shared(path)
+
+    # Views of the mapped file, not private copies
+    assert not np.asarray(second['funding_amount_avg'].array).flags.writeable
+    pd.testing.assert_frame_equal(first, second)
+    assert second['funding_amount_avg'].take([2, 0]).tolist() == [2500.0, 1000.0]
+
+
+def test_compacted_values_equal_the_original():
+    rng = np.random.default_rng(5)
+    n = 1000
+    df = pd.DataFrame({
+        'country': pd.Series(rng.choice(np.array(['Chile', 'Japan', 'Canada', None], dtype=object), n),
+                             dtype=object),
+        'description': [f'Programme {i}' for i in range(n)],
+        'visa_support': pd.Series(rng.choice(np.array(['Yes', 'No', ' yes', None], dtype=object), n),
+                                  dtype=object),
+        'funding_amount_avg': rng.integers(0, 50, n) * 500.0,
+        'funding_exact': rng.random(n) * 1e6,
+        'positions': rng.integers(0, 200, n),
+        'offset': rng.integers(-3, 3, n),
+        'deadline_parsed': pd.to_datetime('2026-01-01') + pd.to_timedelta(rng.integers(0, 365, n), unit='D'),
+    }, index=pd.RangeIndex(50, 50 + n))
+    df.loc[df.index[::7], 'funding_amount_avg'] = np.nan
+    compact = dataset_store.compact_frame(df)
+
+    assert list(compact.columns) == list(df.columns)
+    assert compact.index.equals(df.index)
+    assert isinstance(compact['country'].dtype, pd.CategoricalDtype)
+    assert compact['description'].dtype == df['description'].dtype
+    assert compact['funding_amount_avg'].dtype == np.float32
+    assert compact['funding_exact'].dtype == np.float64
+    assert compact['positions'].dtype == np.uint8 and compact['offset'].dtype == np.int8
+    assert compact.memory_usage(deep=True).sum() < df.memory_usage(deep=True).sum()
+
+    flags = df['visa_support'].str.strip().str.lower().map(dataset_store.FLAG_VALUES)
+    expected = df.assign(visa_support=flags)
+    for col in df.columns:
+        # Missing stays missing (NaN, None or NA depending on the dtype)
+        values = lambda series: series.astype(object).where(series.notna(), None)
+        pd.testing.assert_series_equal(values(compact[col]), values(expected[col]))
@@ -0,0 +1,94 @@
+import csv
+import time
+
+import pandas as pd
+
+import dataset_store
+import dataset_watch
+from conftest import opportunities_frame, write_merged
+
+
+def load(path):
+    df = dataset_store.load_dataset(path)
+    if df['opportunity_id'].str.startswith('BROKEN').any():
+        raise ValueError("broken batch")
+    return df
+
+
+def publish(path, frame):
+    frame.to_csv(path, index=False, quoting=csv.QUOTE_ALL)
+    return dataset_store.write_version_stamp(path, len(frame))
+
+
+def test_a_new_version_is_swapped_in(tmp_path):
+    path = write_merged(tmp_path / 'research_opportunities_complete.csv', opportunities_frame(40))
+    swaps = []
+    watcher = dataset_watch.DatasetWatcher(path, load, on_swap=lambda old, new: swaps.append((old, new)))
+    assert watcher.check()
+    first = watcher.current()
+    assert first.version == dataset_store.dataset_version(path) and len(first.value) == 40
+    assert not watcher.check()
+
+    version = publish(path, opportunities_frame(50))
+    assert watcher.check()
+    assert watcher.current().version == version and len(watcher.current().value) == 50
+    assert swaps == [(first, watcher.current())]
+    assert watcher.reloads == 1
+
+
+def test_a_failed_load_keeps_the_old_version(tmp_path, capsys):
+    path = write_merged(tmp_path / 'research_opportunities_complete.csv', opportunities_frame(40))
+    calls = []
+    watcher = dataset_watch.DatasetWatcher(path, lambda path: calls.append(path) or load(path))
+    watcher.check()
+    working = watcher.current()
+
+    broken = publish(path, opportunities_frame(45).assign(opportunity_id=lambda df: 'BROKEN' + df['opportunity_id']))
+    assert not watcher.check()
+    assert watcher.current() is working and watcher.current().error is None
+    assert watcher.failed_version == broken
+    assert "failed to load, keeping" in capsys.readouterr().out
+    # Not retried until another version is published
+    assert not watcher.check()
+    assert len(calls) == 2
+
+    fixed = publish(path, opportunities_frame(45))
+    assert watcher.check()
+    assert watcher.current().version == fixed and len(watcher.current().value) == 45
+
+
+def test_without_a_working_version_the_error_is_served(tmp_path):
+    path = tmp_path / 'research_opportunities_complete.csv'
+    watcher = dataset_watch.DatasetWatcher(path, load)
+    assert watcher.check()
+    assert watcher.current().value is None and watcher.current().error is not None
+
+    publish(path, opportunities_frame(10))
+    assert watcher.check()
+    assert watcher.current().error is None and len(watcher.current().value) == 10
+
+
+def test_an_expired_version_is_rebuilt(tmp_path):
+    path = write_merged(tmp_path / 'research_opportunities_complete.csv', opportunities_frame(10))
+    days = iter(['2026-12-31', '2027-01-01'])
+    watcher = dataset_watch.DatasetWatcher(path, lambda path: {'day': next(days)},
+                                           expired=lambda value: value['day'] < '2027-01-01')
+    watcher.check()
+    first = watcher.current()
+    assert watcher.check()
+    assert watcher.current().value == {'day': '2027-01-01'} and watcher.current().version == first.version
+    assert not watcher.check()
+
+
+def test_the_background_thread_picks_up_a_merge(tmp_path):
+    path = write_merged(tmp_path / 'research_opportunities_complete.csv', opportunities_frame(20))
+    watcher = dataset_watch.DatasetWatcher(path, load, interval=0.01).start()
+    try:
+        version = publish(path, opportunities_frame(30))
+        deadline = time.monotonic() + 10
+        while watcher.current().version != version and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert isinstance(watcher.current().value, pd.DataFrame)
+        assert len(watcher.current().value) == 30
+    finally:
+        watcher.stop()
@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+
+import deadlines
+
+REFERENCE = '2026-12-20'
+
+
+def dates(*values):
+    return np.array([np.datetime64(value) if value else np.datetime64('NaT') for value in values],
+                    dtype='datetime64[ns]')
+
+
+def annual_frame():
+    return pd.DataFrame({'deadline': [
+        'January 10 annually',
+        'March 31 2026 annually',
+        'December 31 yearly',
+        'March 31 2025',
+        'Rolling',
+        None,
+    ]})
+
+
+def test_annual_deadlines_recur_across_the_year_boundary():
+    index = deadlines.DeadlineIndex(annual_frame(), reference=REFERENCE)
+    # Yearless January comes after December; a stated past year rolls forward
+    np.testing.assert_array_equal(index.next_deadlines(REFERENCE),
+                                  dates('2027-01-10', '2027-03-31', '2026-12-31', '2025-03-31', None, None))
+    assert index.upcoming(30, start=REFERENCE).tolist() == [0, 2]
+    assert index.rolling.tolist() == [False, False, False, False, True, False]
+
+
+def test_an_index_built_in_december_stays_right_in_the_new_year():
+    index = deadlines.DeadlineIndex(annual_frame(), reference=REFERENCE)
+    np.testing.assert_array_equal(index.next_deadlines('2027-02-01'),
+                                  dates('2028-01-10', '2027-03-31', '2027-12-31', '2025-03-31', None, None))
+    assert index.upcoming(20, start='2027-12-25').tolist() == [0, 2]
+    # A one-off past deadline is not brought back
+    assert 3 not in index.after('2026-01-01')
+
+
+def test_each_column_keeps_its_own_date_format():
+    df = pd.DataFrame({
+        'deadline_us': ['12/25/2026', '04/05/2026', 'by 04/05/2026 or later', None],
+        'deadline_eu': ['25/12/2026', '04/05/2026', 'by 04/05/2026', None],
+        'deadline_text': ['2026-03-01', 'Mid-October 2026', 'December 15 2025 OR January 2 2026', 'Rolling'],
+    })
+    formats = {}
+    assert deadlines.parse_deadlines(df['deadline_us'], 'deadline_us', REFERENCE, formats).tolist()[:3] == \
+        [pd.Timestamp('2026-12-25'), pd.Timestamp('2026-04-05'), pd.Timestamp('2026-04-05')]
+    assert deadlines.parse_deadlines(df['deadline_eu'], 'deadline_eu', REFERENCE, formats).tolist()[:3] == \
+        [pd.Timestamp('2026-12-25'), pd.Timestamp('2026-05-04'), pd.Timestamp('2026-05-04')]
+    assert formats == {'deadline_us': '%m/%d/%Y', 'deadline_eu': '%d/%m/%Y'}
+
+    # Every date of every column is indexed; the next one wins per row
+    index = deadlines.DeadlineIndex(df, reference='2026-01-01')
+    np.testing.assert_array_equal(index.next_deadlines('2026-01-01'),
+                                  dates('2026-03-01', '2026-04-05', '2026-01-02', None))
+    np.testing.assert_array_equal(index.next_deadlines('2026-04-06'),
+                                  dates('2026-12-25', '2026-05-04', '2026-05-04', None))
+    assert index.between('2025-12-01', '2026-01-01').tolist() == [2]
+    assert index.rolling.tolist() == [False, False, False, True]
+
+
+def test_normalize_deadlines_adds_the_derived_columns():
+    df = annual_frame()
+    deadlines.normalize_deadlines(df, reference=REFERENCE)
+    assert df[deadlines.DEADLINE_NEXT_COLUMN].iloc[0] == pd.Timestamp('2027-01-10')
+    assert df[deadlines.DEADLINE_ROLLING_COLUMN].tolist() == [False, False, False, False, True, False]
+    assert not deadlines.is_deadline_column(deadlines.DEADLINE_NEXT_COLUMN)
@@ -0,0 +1,60 @@
+import csv
+
+import pandas as pd
+
+import dedup
+
+
+def write_dataset(path, rows):
+    pd.DataFrame(rows).to_csv(path, index=False, quoting=csv.QUOTE_ALL)
+    return path
+
+
+def clusters_of(path):
+    index = dedup.DedupIndex()
+    for chunk in pd.read_csv(path, dtype=str, chunksize=2):
+        index.add(chunk)
+    return dedup.find_clusters(index.finish())
+
+
+def test_rows_without_key_fields_are_not_duplicates(tmp_path):
+    path = write_dataset(tmp_path / 'merged.csv', [
+        {'opportunity_id': 'a', 'opportunity_name': None, 'institution_name': None, 'official_website': None},
+        {'opportunity_id': 'b', 'opportunity_name': None, 'institution_name': None, 'official_website': None},
+    ])
+    assert clusters_of(path).empty
+
+    output = tmp_path / 'deduplicated.csv'
+    dedup.write_deduplicated(path, output, clusters_of(path))
+    assert pd.read_csv(output, dtype=str)['opportunity_id'].tolist() == ['a', 'b']
+
+
+def test_exact_and_near_duplicates_merge_into_the_canonical_record(tmp_path):
+    path = write_dataset(tmp_path / 'merged.csv', [
+        {'opportunity_id': 'a', 'opportunity_name': 'Vanier Canada Graduate Scholarships',
+         'institution_name': 'Government of Canada', 'official_website': 'https://vanier.gc.ca/',
+         'country': None, 'deadline': 'November 1', 'funding_info': 'Full tuition'},
+        {'opportunity_id': 'b', 'opportunity_name': 'Other Programme',
+         'institution_name': 'Elsewhere', 'official_website': 'https://other.org',
+         'country': 'Chile', 'deadline': None},
+        {'opportunity_id': 'c', 'opportunity_name': 'Vanier Canada Graduate Scholarship',
+         'institution_name': 'Government of Canada', 'official_website': 'http://www.vanier.gc.ca',
+         'country': 'Canada', 'deadline': 'November 3'},
+        {'opportunity_id': 'd', 'opportunity_name': 'vanier canada graduate scholarships',
+         'institution_name': 'Government of Canada', 'official_website': 'vanier.gc.ca',
+         'country': 'Canada', 'deadline': None},
+    ])
+    clusters = clusters_of(path)
+    assert clusters['position'].tolist() == [0, 2, 3]
+    assert set(clusters['cluster_id']) == {'a'}
+    assert clusters.set_index('opportunity_id')['match'].to_dict() == {'a': 'canonical', 'c': 'near',
+                                                                       'd': 'exact_key'}
+
+    output = tmp_path / 'deduplicated.csv'
+    dedup.write_deduplicated(path, output, clusters)
+    rows = pd.read_csv(output, dtype=str).set_index('opportunity_id')
+    assert rows.index.tolist() == ['a', 'b']
+    # The canonical member's values win; gaps are filled from the other members
+    assert rows.loc['a', 'deadline'] == 'November 1'
+    assert rows.loc['a', 'country'] == 'Canada'
+    assert rows.loc['a', 'merged_opportunity_ids'] == 'a | c | d'
@@ -0,0 +1,21 @@
+import eligibility
+
+
+def countries(text):
+    return eligibility.resolve(eligibility.parse_eligibility(text))
+
+
+def test_eu_eea_is_a_union():
+    assert {'Norway', 'Iceland', 'Liechtenstein', 'France'} <= countries("EU/EEA nationals")
+    assert {'Norway', 'Switzerland', 'Germany'} <= countries("EU, EEA and Swiss nationals")
+
+
+def test_enumeration_narrows_the_wider_place():
+    assert eligibility.parse_eligibility("African nationals only: Benin Ghana") == "Benin, Ghana"
+    assert eligibility.parse_eligibility("African nationals only (Sub-Saharan Africa)") == "Sub-Saharan Africa"
+
+
+def test_us_abbreviation():
+    assert eligibility.parse_eligibility("Open to all except US citizens") == "All - United States"
+    assert eligibility.parse_eligibility("US citizens only") == "United States"
+    assert eligibility.parse_eligibility("Open to all of us") == "All"
@@ -0,0 +1,219 @@
+import csv
+import os
+
+import pandas as pd
+import pytest
+
+import merge_batches
+import text_search
+
+
+def batch_frame(number, rows=40):
+    """One batch; ids interleave with the other batches', text has commas, quotes and newlines"""
+    records = []
+    for i in range(rows):
+        records.append({
+            'opportunity_id': f'OP{i * 5 + number:04d}',
+            'opportunity_name': f'Programme {number}-{i}, "Excellence" track',
+            'country': ['Canada', 'Germany', 'Japan'][i % 3],
+            'description': f'First line of {number}-{i}\nsecond line with "quotes", commas\n\nand a gap',
+            'duration': f'{12 + i % 3 * 12} months',
+        })
+    if number == 3:
+        # A batch with one more column, and a row the sort cannot place
+        for record in records:
+            record['region'] = 'Asia'
+        records.append({'opportunity_id': None, 'opportunity_name': 'No id', 'description': 'x\ny'})
+    return pd.DataFrame(records)
+
+
+def write_batch(path, frame, style):
+    """Batches use both quote styles: backslash-escaped and doubled"""
+    if style == 'escaped':
+        frame.to_csv(path, index=False, quoting=csv.QUOTE_ALL, escapechar='\\', doublequote=False)
+    else:
+        frame.to_csv(path, index=False, quoting=csv.QUOTE_ALL)
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    for number, filename in enumerate(merge_batches.batch_files, 1):
+        write_batch(tmp_path / filename, batch_frame(number), 'escaped' if number % 2 else 'doubled')
+    return tmp_path
+
+
+@pytest.fixture
+def tiny_chunks(monkeypatch):
+    """Byte ranges of a few records: every batch spills many sorted runs"""
+    monkeypatch.setattr(merge_batches, 'RANGE_BYTES', 400)
+
+
+def baseline_merge(data_dir):
+    """What the original one-shot script produced: read every batch whole, concat, sort"""
+    frames = [pd.read_csv(os.path.join(data_dir, filename), encoding='utf-8', dtype=str, engine='python',
+                          **merge_batches.CSV_READ_OPTIONS['default'])
+              for filename in merge_batches.batch_files]
+    return pd.concat(frames, ignore_index=True).sort_values('opportunity_id', kind='mergesort',
+                                                           ignore_index=True)
+
+
+def read_output(data_dir):
+    return pd.read_csv(os.path.join(data_dir, merge_batches.OUTPUT_FILENAME), encoding='utf-8', dtype=str)
+
+
+def merge(data_dir, *args):
+    assert merge_batches.main(['--data-dir', str(data_dir), '--format', 'csv', '--chunk-size', '5', *args]) == 0
+    return read_output(data_dir)
+
+
+@pytest.mark.parametrize('workers', ['1', '2'])
+def test_streaming_merge_equals_the_baseline(data_dir, tiny_chunks, workers):
+    merged = merge(data_dir, '--workers', workers)
+    pd.testing.assert_frame_equal(merged, baseline_merge(data_dir))
+    assert merged['description'].str.contains('\n\n').sum() == 200
+    assert pd.isna(merged['opportunity_id'].iloc[-1])
+    # The index built during the merge belongs to the version it published
+    assert text_search.load_index(data_dir / merge_batches.OUTPUT_FILENAME) is not None
+
+
+def test_merged_blocks_are_sorted_across_runs(tmp_path):
+    runs = []
+    for n in range(4):
+        path = tmp_path / f'run{n}.csv'
+        merge_batches.write_run(pd.DataFrame({'opportunity_id': [f'OP{i:04d}' for i in range(n, 3000, 4)]}), path)
+        runs.append(str(path))
+    runs = merge_batches.reduce_runs(runs, ['opportunity_id'], str(tmp_path), chunksize=10, fan_in=2)
+    assert len(runs) == 2
+    ids = pd.concat(merge_batches.iter_merged_blocks(runs, chunksize=10))['opportunity_id'].tolist()
+    assert ids == [f'OP{i:04d}' for i in range(3000)]
+
+
+def tricky_frame(style, rows=60):
+    """Fields with doubled quotes and newlines; escaped batches also end fields in backslashes"""
+    texts = ['say "hi"\nthen leave', '""', 'x,\n\n"y"', '"\n"', 'plain']
+    if style == 'escaped':
+        texts += ['C:\\data\\', 'a \\"quoted\\" path', 'x,\n\n"y"\\', '\\']
+    return pd.DataFrame({
+        'opportunity_id': [f'OP{i:04d}' for i in range(rows)],
+        'description': [texts[i % len(texts)] for i in range(rows)],
+        'notes': [texts[(i * 3) % len(texts)] for i in range(rows)],
+    })
+
+
+@pytest.mark.parametrize('style', ['escaped', 'doubled'])
+@pytest.mark.parametrize('range_bytes', [1, 40, 97, 256, 1 << 20])
+def test_byte_ranges_end_on_record_boundaries(tmp_path, style, range_bytes):
+    path = tmp_path / 'batch.csv'
+    write_batch(path, tricky_frame(style), style)
+    whole = pd.read_csv(path, encoding='utf-8', dtype=str, engine='python', **merge_batches.CSV_READ_OPTIONS['default'])
+
+    ranges = merge_batches.split_byte_ranges(path, range_bytes)
+    assert ranges[0][0] == 0 and ranges[-1][1] == os.path.getsize(path)
+    assert all(end == start for (_, end), (start, _) in zip(ranges, ranges[1:]))
+    header = merge_batches.read_byte_range(path, *ranges[0])
+    parts = [merge_batches.parse_range(header, merge_batches.read_byte_range(path, *byte_range), 'python')
+             for byte_range in ranges[1:]]
+    pd.testing.assert_frame_equal(pd.concat(parts, ignore_index=True), whole)
+
+
+@pytest.mark.parametrize('workers', [1, 3, 5])
+def test_parallel_ingest_reads_every_row(data_dir, tiny_chunks, tmp_path, workers):
+    filepaths = [str(data_dir / filename) for filename in merge_batches.batch_files]
+    spill_dir = tmp_path / f'runs{workers}'
+    spill_dir.mkdir()
+    results = merge_batches.ingest_batches(filepaths, str(spill_dir), chunksize=5, workers=workers)
+    for filepath, result in zip(filepaths, results):
+        runs = result['sorted_runs'] + result['unkeyed_runs']
+        rows = pd.concat([pd.read_csv(run, dtype=str) for run in runs], ignore_index=True)
+        whole = pd.read_csv(filepath, encoding='utf-8', dtype=str, engine='python',
+                            **merge_batches.CSV_READ_OPTIONS['default'])
+        key = list(whole.columns)
+        pd.testing.assert_frame_equal(rows.sort_values(key, ignore_index=True),
+                                      whole.sort_values(key, ignore_index=True))
+
+
+def write_ranged_batches(directory, filenames, edited=None):
+    """Batches whose id ranges do not overlap, so incremental merges splice segments"""
+    for number, filename in enumerate(filenames, 1):
+        frame = batch_frame(number).assign(opportunity_id=lambda df: df['opportunity_id'].where(
+            df['opportunity_id'].isna(), [f'B{number}-{i:03d}' for i in range(len(df))]))
+        if filename == edited:
+            frame.loc[3, 'description'] = 'Edited\n"description"'
+            frame = frame.drop(index=5)
+        write_batch(directory / filename, frame, 'escaped' if number % 2 else 'doubled')
+
+
+def outputs(data_dir):
+    csv_file = data_dir / merge_batches.OUTPUT_FILENAME
+    parquet = pd.read_parquet(data_dir / 'research_opportunities_complete.parquet')
+    return csv_file.read_bytes(), parquet
+
+
+def assert_same_outputs(incremental_dir, full_dir):
+    csv_bytes, parquet = outputs(incremental_dir)
+    full_csv_bytes, full_parquet = outputs(full_dir)
+    assert csv_bytes == full_csv_bytes
+    pd.testing.assert_frame_equal(parquet, full_parquet)
+
+
+def full_rebuild(tmp_path, incremental_dir):
+    full_dir = tmp_path / 'full'
+    full_dir.mkdir()
+    for filename in merge_batches.batch_files:
+        if (incremental_dir / filename).exists():
+            (full_dir / filename).write_bytes((incremental_dir / filename).read_bytes())
+    assert merge_batches.main(['--data-dir', str(full_dir), '--chunk-size', '5']) == 0
+    return full_dir
+
+
+@pytest.mark.parametrize('ranged', [True, False], ids=['spliced', 'overlapping'])
+def test_incremental_merge_equals_a_full_rebuild(tmp_path, tiny_chunks, capsys, ranged):
+    data_dir = tmp_path / 'data'
+    data_dir.mkdir()
+    if ranged:
+        write_ranged_batches(data_dir, merge_batches.batch_files)
+    else:
+        for number, filename in enumerate(merge_batches.batch_files, 1):
+            write_batch(data_dir / filename, batch_frame(number), 'escaped' if number % 2 else 'doubled')
+    assert merge_batches.main(['--data-dir', str(data_dir), '--chunk-size', '5', '--incremental']) == 0
+
+    edited = merge_batches.batch_files[1]
+    if ranged:
+        write_ranged_batches(data_dir, merge_batches.batch_files, edited=edited)
+    else:
+        frame = batch_frame(2)
+        frame.loc[3, 'description'] = 'Edited\n"description"'
+        write_batch(data_dir / edited, frame.drop(index=5), 'doubled')
+    capsys.readouterr()
+    assert merge_batches.main(['--data-dir', str(data_dir), '--chunk-size', '5', '--incremental']) == 0
+    log = capsys.readouterr().out
+    assert "1 changed batch(es) re-ingested, 4 reused" in log
+    if ranged:
+        assert "5/6 output segment(s) spliced" in log
+
+    assert_same_outputs(data_dir, full_rebuild(tmp_path, data_dir))
+
+
+def test_incremental_merge_after_removing_and_renaming_batches(tmp_path, tiny_chunks, monkeypatch, capsys):
+    data_dir = tmp_path / 'data'
+    data_dir.mkdir()
+    write_ranged_batches(data_dir, merge_batches.batch_files)
+    assert merge_batches.main(['--data-dir', str(data_dir), '--chunk-size', '5', '--incremental']) == 0
+
+    # Batch 5 is gone; batch 4 now lives under a new name
+    (data_dir / merge_batches.batch_files[4]).unlink()
+    renamed = 'research_opportunities_batch4_renamed.csv'
+    (data_dir / merge_batches.batch_files[3]).rename(data_dir / renamed)
+    monkeypatch.setattr(merge_batches, 'batch_files', merge_batches.batch_files[:3] + [renamed])
+    capsys.readouterr()
+    assert merge_batches.main(['--data-dir', str(data_dir), '--chunk-size', '5', '--incremental']) == 0
+    log = capsys.readouterr().out
+    assert "1 changed batch(es) re-ingested, 3 reused" in log
+
+    incremental = pd.read_csv(data_dir / merge_batches.OUTPUT_FILENAME, dtype=str)
+    assert not incremental['opportunity_id'].str.startswith('B5-', na=False).any()
+    assert_same_outputs(data_dir, full_rebuild(tmp_path, data_dir))
+
+    # Runs of batches no longer merged are dropped from the cache
+    manifest = merge_batches.load_manifest(data_dir / merge_batches.CACHE_DIRNAME)
+    assert sorted(manifest['batches']) == sorted(merge_batches.batch_files)
@@ -0,0 +1,123 @@
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import deadlines
+import eligibility
+import recommend
+
+REFERENCE = pd.Timestamp('2026-03-01')
+
+PROFILES = [
+    recommend.Profile(nationality='Germany', career_stage='PhD', field_of_study='Economics',
+                      funding=30000, duration=24, horizon_days=60),
+    recommend.Profile(nationality='Kenya', funding=12000, horizon_days=30),
+    recommend.Profile(career_stage='Postdoc', field_of_study='Engineering', duration=36),
+    recommend.Profile(),
+]
+
+
+@pytest.fixture(scope='module')
+def frame():
+    rng = np.random.default_rng(17)
+    n = 400
+    pick = lambda values: rng.choice(np.array(values, dtype=object), n)
+    df = pd.DataFrame({
+        'career_stage': pick(['PhD', 'Postdoctoral', None]),
+        'field_of_study': pick(['Economics', 'Engineering', 'Life Sciences', None]),
+        'funding_amount_avg': np.round(rng.uniform(1000, 50000, n)),
+        'duration_numeric': rng.choice([6.0, 12.0, 24.0, 36.0, 48.0, np.nan], n),
+        'nationality_eligibility': pick(['Citizens of Germany', 'Open to nationals of Germany and Japan',
+                                         'All nationalities', 'Must hold Kenyan citizenship', None]),
+        deadlines.DEADLINE_NEXT_COLUMN: REFERENCE + pd.to_timedelta(rng.integers(-30, 120, n), unit='D'),
+        deadlines.DEADLINE_ROLLING_COLUMN: rng.random(n) < 0.05,
+    })
+    df.loc[rng.random(n) < 0.1, 'funding_amount_avg'] = np.nan
+    df.loc[rng.random(n) < 0.1, deadlines.DEADLINE_NEXT_COLUMN] = pd.NaT
+    eligibility.add_eligibility_column(df)
+    return df
+
+
+def brute_score(row, profile):
+    """One row's score, criterion by criterion, as the module docstrings describe it"""
+    weighted = []
+    if profile.career_stage:
+        stage = row['career_stage']
+        weighted.append((recommend.WEIGHTS['career_stage'], recommend.UNKNOWN_SCORE if pd.isna(stage)
+                         else float({'PhD': 'PhD', 'Postdoctoral': 'Postdoc'}[stage] == profile.career_stage)))
+    if profile.field_of_study:
+        field = row['field_of_study']
+        weighted.append((recommend.WEIGHTS['field_of_study'], recommend.UNKNOWN_SCORE if pd.isna(field)
+                         else float(field == profile.field_of_study)))
+    if profile.funding:
+        funding = row['funding_amount_avg']
+        weighted.append((recommend.WEIGHTS['funding'], recommend.UNKNOWN_SCORE if math.isnan(funding)
+                         else min(funding / profile.funding, 1)))
+    if profile.duration:
+        duration = row['duration_numeric']
+        weighted.append((recommend.WEIGHTS['duration'], recommend.UNKNOWN_SCORE if math.isnan(duration)
+                         else 1 / (1 + abs(math.log2(duration) - math.log2(profile.duration)))))
+    if profile.horizon_days:
+        days = (row[deadlines.DEADLINE_NEXT_COLUMN] - REFERENCE).days
+        if row[deadlines.DEADLINE_ROLLING_COLUMN]:
+            part = 1.0
+        elif pd.isna(row[deadlines.DEADLINE_NEXT_COLUMN]):
+            part = recommend.NO_DEADLINE_SCORE
+        else:
+            part = 0.0 if days < 0 else min(max(2 - days / profile.horizon_days, 0), 1)
+        weighted.append((recommend.WEIGHTS['deadline'], part))
+    score = sum(w * part for w, part in weighted) / sum(w for w, _ in weighted) if weighted else 1.0
+
+    if profile.nationality:
+        text = row['nationality_eligibility']
+        if pd.isna(text):
+            score *= recommend.UNKNOWN_ELIGIBILITY
+        elif text != 'All nationalities' and profile.nationality not in eligibility.parse_eligibility(text):
+            score = 0.0
+    return score
+
+
+def brute_force(df, profile, rows=None):
+    rows = np.arange(len(df)) if rows is None else rows
+    return pd.Series([brute_score(df.iloc[row], profile) for row in rows], index=rows)
+
+
+@pytest.mark.parametrize('profile', PROFILES)
+def test_scores_match_a_row_by_row_computation(frame, profile):
+    recommender = recommend.Recommender(frame, reference=REFERENCE)
+    np.testing.assert_allclose(recommender.score(profile), brute_force(frame, profile).to_numpy(), atol=1e-5)
+
+
+@pytest.mark.parametrize('profile', PROFILES)
+@pytest.mark.parametrize('k', [1, 10, 50])
+def test_top_k_equals_a_brute_force_ranking(frame, profile, k):
+    recommender = recommend.Recommender(frame, reference=REFERENCE)
+    rows = np.flatnonzero(frame['field_of_study'].notna().to_numpy())
+    expected = brute_force(frame, profile, rows)
+    expected = expected[expected > 0].sort_values(ascending=False, kind='stable')
+
+    top_rows, top_scores = recommender.top_k(profile, k, rows)
+    assert len(top_rows) == min(k, len(expected)) == len(set(top_rows))
+    np.testing.assert_allclose(top_scores, expected.to_numpy()[:k], atol=1e-5)
+    np.testing.assert_allclose(expected[top_rows].to_numpy(), top_scores, atol=1e-5)
+    # Ties aside, the same rows: everything scoring above the k-th is in
+    clear = expected.index[expected.to_numpy() > top_scores[-1] + 1e-5]
+    assert set(clear) <= set(top_rows)
+
+
+def test_chunked_batches_equal_single_profiles(frame, monkeypatch):
+    monkeypatch.setattr(recommend, 'CHUNK_CELLS', len(frame))
+    recommender = recommend.Recommender(frame, reference=REFERENCE)
+    batch_rows, batch_scores = recommender.top_k_batch(PROFILES, k=5)
+    for p, profile in enumerate(PROFILES):
+        rows, scores = recommender.top_k(profile, k=5)
+        np.testing.assert_allclose(batch_scores[p][:len(rows)], scores)
+        assert (batch_rows[p][len(rows):] == -1).all()
+
+    # Nobody is eligible: nothing is recommended
+    texts = frame['nationality_eligibility']
+    named = np.flatnonzero((texts.notna() & (texts != 'All nationalities')).to_numpy())
+    rows, scores = recommender.top_k(recommend.Profile(nationality='Chile'), k=5, rows=named)
+    assert len(rows) == 0 and len(scores) == 0
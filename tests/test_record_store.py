@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+
+import record_store
+
+
+def store_of(records):
+    df = pd.DataFrame(records, columns=['opportunity_id', 'program_name', 'country'])
+    return record_store.RecordStore(df.set_index(pd.Index(range(100, 100 + len(df)))))
+
+
+RECORDS = [
+    ('OP0001', 'Marie Curie Fellowship', 'Belgium'),
+    ('OP0002', 'École Normale Supérieure PhD', 'France'),
+    ('OP0003', 'Curie Institute Scholarship', 'France'),
+    ('OP0002', 'Duplicate id', 'Spain'),
+    (None, 'No id at all', 'Chile'),
+    ('OP0006', 'Marie Curie Fellowship', 'Poland'),
+    ('OP0007', None, 'Japan'),
+]
+
+
+def test_lookup_by_id():
+    store = store_of(RECORDS)
+    for position, (opportunity_id, name, country) in enumerate(RECORDS[:3]):
+        record = store.record(opportunity_id)
+        assert record['program_name'] == name and record['country'] == country
+        assert record.name == 100 + position
+    # The first record with an id wins; unknown and missing ids find nothing
+    assert store.record('OP0002')['country'] == 'France'
+    assert store.record('OP9999') is None
+    assert store.record(None) is None
+    assert len(store) == len(RECORDS)
+
+
+def test_names_map_to_every_id():
+    store = store_of(RECORDS)
+    assert store.ids_for_name('Marie Curie Fellowship') == ['OP0001', 'OP0006']
+    assert store.label('OP0007') == 'N/A (OP0007)'
+    assert store.label('OP0003') == 'Curie Institute Scholarship (OP0003)'
+
+
+def test_search_ranks_prefix_then_word_then_substring():
+    store = store_of(RECORDS)
+    assert store.search('curie') == ['OP0003', 'OP0001', 'OP0006']
+    assert store.search('ecole norm') == ['OP0002']
+    assert store.search('URI') == ['OP0001', 'OP0003', 'OP0006']
+    assert store.search('zz') == []
+
+    allowed = np.array([True, True, False, True, True, False, True])
+    assert store.search('curie', allowed=allowed) == ['OP0001']
+    assert store.search('', allowed=allowed, limit=3) == ['OP0001', 'OP0002', 'OP0002']
+
+
+def test_substring_search_matches_a_scan():
+    rng = np.random.default_rng(11)
+    words = ['data', 'science', 'marine', 'biology', 'quantum', 'computing', 'research', 'award']
+    names = [' '.join(rng.choice(words, 3)) for _ in range(300)]
+    store = store_of([(f'OP{i:04d}', name, None) for i, name in enumerate(names)])
+    for query in ['ence', 'arine bio', 'tum', 'data sci', 'rch award']:
+        expected = {f'OP{i:04d}' for i, name in enumerate(names) if query in name}
+        assert set(store.search(query, limit=len(names))) == expected
@@ -0,0 +1,54 @@
+import threading
+
+import numpy as np
+
+import result_cache
+
+
+def test_least_recently_used_entry_is_evicted():
+    evicted = []
+    cache = result_cache.LRUCache(max_entries=2, on_evict=lambda key, value: evicted.append((key, value)))
+    cache.get_or_compute('a', lambda: 1)
+    cache.get_or_compute('b', lambda: 2)
+    # A hit makes 'a' the most recently used, so 'b' goes first
+    assert cache.get_or_compute('a', lambda: 'recomputed') == 1
+    cache.get_or_compute('c', lambda: 3)
+    assert evicted == [('b', 2)]
+    assert list(cache.entries) == ['a', 'c']
+
+    assert cache.get_or_compute('b', lambda: 'recomputed') == 'recomputed'
+    assert evicted == [('b', 2), ('a', 1)]
+    cache.clear()
+    assert evicted[2:] == [('c', 3), ('b', 'recomputed')]
+
+
+def test_hits_and_misses_are_counted():
+    cache = result_cache.LRUCache(max_entries=2)
+    calls = []
+    for key in ['x', 'x', 'y', 'x', 'z', 'y']:
+        cache.get_or_compute(key, lambda: calls.append(key) or key.upper())
+    # z evicts y (x was used more recently), so y is computed again
+    assert calls == ['x', 'y', 'z', 'y']
+    assert cache.stats() == {'entries': 2, 'max_entries': 2, 'hits': 2, 'misses': 4, 'evictions': 2,
+                             'hit_rate': 2 / 6}
+
+
+def test_concurrent_hits_see_one_value():
+    cache = result_cache.LRUCache()
+    cache.get_or_compute('key', lambda: object())
+    seen = []
+    threads = [threading.Thread(target=lambda: seen.append(cache.get_or_compute('key', object)))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len({id(value) for value in seen}) == 1
+    assert cache.stats()['hits'] == 8
+
+
+def test_equivalent_filter_states_share_a_key():
+    first = result_cache.canonical_key({'country': ['Chile', 'Japan'], 'region': 'All', 'funding': (np.int64(5), 10)})
+    second = result_cache.canonical_key({'funding': (5, 10), 'country': ('Chile', 'Japan'), 'search': None})
+    assert first == second
+    assert hash(first) == hash(second)
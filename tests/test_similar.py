@@ -0,0 +1,56 @@
+import csv
+
+import numpy as np
+import pandas as pd
+
+import dashboard_data
+import dataset_store
+import similar
+from conftest import opportunities_frame, write_merged
+
+UNIQUE_TEXT = 'Marine glaciology expedition to the Antarctic ice shelf with ship time and sediment coring'
+
+
+def frame_with_near_copy():
+    """Row 7 gets a description of its own; row 120 repeats it with one word changed"""
+    frame = opportunities_frame()
+    frame.loc[7, 'description'] = UNIQUE_TEXT
+    copy = frame.loc[[7]].assign(opportunity_id='OP0120', description=UNIQUE_TEXT.replace('ship', 'boat'))
+    return pd.concat([frame, copy], ignore_index=True)
+
+
+def test_a_near_identical_record_ranks_first(tmp_path):
+    path = write_merged(tmp_path / 'research_opportunities_complete.csv', frame_with_near_copy())
+    index = similar.load_index(path)
+    rows, scores = index.neighbours(7, k=5)
+    assert rows[0] == 120 and scores[0] > 0.8
+    assert 7 not in rows
+    assert list(scores) == sorted(scores, reverse=True)
+    assert index.neighbours(120, k=1)[0].tolist() == [7]
+
+    # Filtered out, the copy is not suggested
+    allowed = np.ones(index.rows, dtype=bool)
+    allowed[120] = False
+    assert 120 not in index.neighbours(7, k=5, allowed=allowed)[0]
+
+
+def test_scores_are_cosine_similarities(merged_dataset):
+    index = similar.load_index(merged_dataset)
+    vectors = np.zeros((index.rows, len(index.terms)), dtype=np.float32)
+    for row in range(index.rows):
+        start, end = index.indptr[row], index.indptr[row + 1]
+        vectors[row, index.indices[start:end]] = index.weights[start:end]
+    assert np.allclose(np.linalg.norm(vectors, axis=1), 1, atol=1e-5)
+    for row in (0, 5, 119):
+        assert np.allclose(index.scores(row), vectors @ vectors[row], atol=1e-5)
+
+
+def test_an_edit_that_keeps_the_row_count_makes_the_index_stale(tmp_path):
+    path = write_merged(tmp_path / 'research_opportunities_complete.csv', opportunities_frame())
+    assert similar.load_index(path) is not None
+
+    frame = frame_with_near_copy().drop(index=119)
+    frame.to_csv(path, index=False, encoding='utf-8', quoting=csv.QUOTE_ALL)
+    dataset_store.write_version_stamp(path, len(frame))
+    assert similar.load_index(path) is None
+    assert dashboard_data.load_dataset_version(path)['similar_index'] is None
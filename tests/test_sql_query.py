@@ -0,0 +1,66 @@
+import pandas as pd
+import pytest
+
+import sql_query
+
+duckdb = pytest.importorskip('duckdb')
+
+
+@pytest.fixture
+def engine(tmp_path):
+    path = tmp_path / 'research_opportunities_complete.csv'
+    pd.DataFrame({'opportunity_id': ['A', 'B'], 'region': ['Europe', 'Asia'],
+                  'duration': ['2 years', '6 months'],
+                  'application_deadline': ['2026-03-01', '2026-11-15']}).to_csv(path, index=False)
+    engine = sql_query.QueryEngine(path)
+    yield engine
+    engine.close()
+
+
+def test_queries_the_dataset(engine):
+    assert engine.backend == 'duckdb'
+    assert engine.query("SELECT count(*) AS n FROM opportunities").frame['n'][0] == 2
+
+
+@pytest.mark.parametrize('sql', [
+    "SELECT * FROM read_csv('/etc/passwd')",
+    "SELECT * FROM read_text('/etc/passwd')",
+    "SELECT * FROM glob('/*')",
+])
+def test_other_files_are_off_limits(engine, sql):
+    with pytest.raises(duckdb.Error):
+        engine.query(sql)
+
+
+def test_configuration_is_locked(engine):
+    with pytest.raises(ValueError):
+        engine.query("SET enable_external_access = true")
+    with pytest.raises(duckdb.Error):
+        engine.connection.execute("SET enable_external_access = true")
+
+
+@pytest.mark.parametrize('sql', [
+    "SELECT count(*) AS n FROM opportunities WHERE region LIKE '%;%'",
+    "SELECT count(*) AS n FROM opportunities WHERE region <> 'a'';b'; ",
+    "-- count; every row\nSELECT count(*) AS n FROM opportunities /* ; */",
+])
+def test_semicolons_inside_literals_and_comments(engine, sql):
+    assert engine.query(sql).frame['n'][0] in (0, 2)
+
+
+@pytest.mark.parametrize('sql', [
+    "SELECT 1; SELECT 2",
+    "SELECT ';'; DROP VIEW opportunities",
+    "DELETE FROM opportunities",
+])
+def test_only_one_select(engine, sql):
+    with pytest.raises(ValueError):
+        engine.query(sql)
+
+
+def test_csv_view_has_the_typed_columns(engine):
+    frame = engine.query("SELECT region, median(duration_numeric) AS months, "
+                         "quarter(application_deadline_parsed) AS q FROM opportunities "
+                         "GROUP BY region, q ORDER BY region").frame
+    assert frame.to_dict('list') == {'region': ['Asia', 'Europe'], 'months': [6.0, 24.0], 'q': [4, 1]}
+    assert 'duration_numeric' in engine.columns
@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import table_view
+
+
+@pytest.fixture(scope='module')
+def frame():
+    rng = np.random.default_rng(3)
+    n = 503
+    df = pd.DataFrame({
+        'opportunity_id': [f'OP{i:04d}' for i in range(n)],
+        'country': pd.Series(rng.choice(np.array(['Chile', 'Japan', 'Canada', None], dtype=object), n),
+                             dtype='category'),
+        'funding_amount_avg': rng.integers(1, 40, n) * 1000.0,
+        'deadline_primary': pd.to_datetime('2026-01-01') + pd.to_timedelta(rng.integers(0, 30, n), unit='D'),
+    }, index=pd.RangeIndex(1000, 1000 + n))
+    df.loc[df.index[::9], 'funding_amount_avg'] = np.nan
+    df.loc[df.index[::11], 'deadline_primary'] = pd.NaT
+    return df
+
+
+@pytest.mark.parametrize('column', ['country', 'funding_amount_avg', 'deadline_primary', 'opportunity_id'])
+@pytest.mark.parametrize('ascending', [True, False])
+@pytest.mark.parametrize('page_size', table_view.PAGE_SIZES)
+def test_pages_equal_slices_of_sort_values(frame, column, ascending, page_size):
+    # A filtered subset, as the dashboard passes it (positions, in row order)
+    rows = np.flatnonzero(frame['funding_amount_avg'].fillna(0).to_numpy() % 3000 != 0)
+    expected = frame.iloc[rows].sort_values(column, ascending=ascending, na_position='last', kind='stable')
+
+    order = table_view.sort_order(frame, column, ascending, rows)
+    pages = table_view.page_count(len(order), page_size)
+    shown = pd.concat([frame.take(table_view.page_rows(order, page, page_size)) for page in range(1, pages + 1)])
+    pd.testing.assert_frame_equal(shown, expected)
+    assert len(table_view.page_rows(order, pages, page_size)) == len(rows) - (pages - 1) * page_size
+
+
+def test_unsorted_keeps_row_order(frame):
+    rows = np.array([5, 3, 400])
+    assert table_view.sort_order(frame, None, True, rows).tolist() == [5, 3, 400]
+    assert table_view.sort_order(frame, 'no_such_column').tolist() == list(range(len(frame)))
+    assert table_view.page_count(0, 25) == 1
+
+
+def test_only_the_page_is_formatted(frame):
+    page = frame.assign(application_url=None).take([0, 1])
+    page.iloc[1, page.columns.get_loc('application_url')] = 'https://example.org'
+    formatted = table_view.format_page(page)
+    assert formatted['funding_amount_avg'].tolist() == ['N/A', f"${frame['funding_amount_avg'].iloc[1]:,.0f}"]
+    assert formatted['application_url'].tolist() == ['', '<a href="https://example.org" target="_blank">Apply</a>']
+    assert page['funding_amount_avg'].isna().iloc[0]
@@ -0,0 +1,56 @@
+import csv
+
+import numpy as np
+
+import dashboard_data
+import dataset_store
+import text_search
+from conftest import opportunities_frame, write_merged
+
+
+def test_rows_matching_every_term_rank_first(merged_dataset):
+    index = text_search.load_index(merged_dataset)
+    rows = index.search('economics japan')
+    # Japan is every 4th row from 2, Economics every 3rd from 2
+    assert sorted(rows[:10]) == list(range(2, 120, 12))
+    assert len(rows) > 10
+
+
+def test_search_keeps_to_the_allowed_rows(merged_dataset):
+    index = text_search.load_index(merged_dataset)
+    allowed = np.arange(index.rows) >= 60
+    rows = index.search('economics japan', allowed=allowed)
+    assert len(rows) and allowed[rows].all()
+    assert list(rows[:5]) == [62, 74, 86, 98, 110]
+
+
+def test_terms_are_stemmed_and_stopwords_dropped():
+    assert text_search.tokenize('The Fellowships for Engineering') == text_search.tokenize('fellowship engineering')
+
+
+def test_an_edit_that_keeps_the_row_count_makes_the_index_stale(tmp_path):
+    path = write_merged(tmp_path / 'research_opportunities_complete.csv', opportunities_frame())
+    assert text_search.load_index(path) is not None
+
+    # A new merge with as many rows, published without rebuilding the index
+    frame = opportunities_frame()
+    frame.loc[0, 'description'] = 'Quantum chemistry'
+    frame.to_csv(path, index=False, encoding='utf-8', quoting=csv.QUOTE_ALL)
+    dataset_store.write_version_stamp(path, len(frame))
+    assert text_search.load_index(path) is None
+    assert dashboard_data.load_dataset_version(path)['search_index'] is None
+
+    text_search.build_index(path)
+    assert text_search.load_index(path).search('quantum').tolist() == [0]
+
+
+def test_without_a_stamp_the_index_follows_the_file(tmp_path):
+    path = tmp_path / 'hand_written.csv'
+    opportunities_frame().to_csv(path, index=False, quoting=csv.QUOTE_ALL)
+    text_search.build_index(path)
+    assert text_search.load_index(path) is not None
+
+    frame = opportunities_frame()
+    frame.loc[0, 'description'] = 'Quantum chemistry'
+    frame.to_csv(path, index=False, quoting=csv.QUOTE_ALL)
+    assert text_search.load_index(path) is None
@@ -0,0 +1,229 @@
+"""
+Full-text search over the merged research opportunities
+BM25-ranked inverted index over names, institutions, descriptions,
+eligibility and fields of study. Built by merge_batches.py next to the
+merged dataset (`*.search.npz`) and loaded lazily by the dashboard. The
+index records the dataset version it was built from and is only loaded for
+that version.
+
+Postings are stored CSR-style: terms sorted, and for term t the documents
+docs[offsets[t]:offsets[t+1]] with their term frequencies. A query adds one
+vectorized BM25 contribution per query term into a dense score array.
+"""
+
+import argparse
+import re
+import time
+import unicodedata
+from pathlib import Path
+
+import numpy as np
+
+import dataset_store
+import record_store
+
+# Text columns indexed when present (names differ between batch layouts)
+SEARCH_COLUMNS = [
+    'opportunity_name', 'program_name', 'institution', 'institution_name',
+    'description', 'notes', 'special_features',
+    'eligibility_criteria', 'nationality_eligibility', 'citizenship_requirements',
+    'field_of_study',
+]
+
+INDEX_SUFFIX = '.search.npz'
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+MAX_RESULTS = 1000
+
+STOPWORDS = {
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'for', 'from', 'in', 'is',
+    'it', 'of', 'on', 'or', 'that', 'the', 'to', 'with',
+}
+
+SUFFIXES = ['ational', 'ization', 'ations', 'ation', 'ments', 'ment', 'ings', 'ing',
+            'ies', 'ied', 'ers', 'er', 'ed', 'es', 's']
+
+
+def index_path_for(dataset_path):
+    """The search index that sits next to a merged CSV/Parquet file"""
+    path = Path(dataset_path)
+    return path.with_name(path.stem + INDEX_SUFFIX)
+
+
+def stem(word):
+    """Light suffix-stripping stemmer: 'fellowships' -> 'fellowship', 'studies' -> 'stud'"""
+    if len(word) <= 4 or word.isdigit():
+        return word
+    for suffix in SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            if suffix in ('s', 'es') and word.endswith('ss'):
+                return word
+            return word[:-len(suffix)]
+    return word
+
+
+def tokenize(text):
+    """Lowercase ASCII words without stopwords, stemmed"""
+    if not text:
+        return []
+    text = unicodedata.normalize('NFKD', text).encode('ascii', 'ignore').decode().lower()
+    return [stem(word) for word in re.findall(r'[a-z0-9]+', text) if word not in STOPWORDS]
+
+
+def document_texts(chunk):
+    columns = [col for col in SEARCH_COLUMNS if col in chunk.columns]
+    if not columns:
+        return [''] * len(chunk)
+    return chunk[columns].fillna('').astype(str).agg(' '.join, axis=1).tolist()
+
+
+class SearchIndex:
+    def __init__(self, terms, offsets, docs, freqs, doc_lengths, version=None):
+        self.terms = terms
+        self.offsets = offsets
+        self.docs = docs
+        self.freqs = freqs
+        self.doc_lengths = doc_lengths
+        self.rows = len(doc_lengths)
+        self.avg_length = float(doc_lengths.mean()) if self.rows else 0.0
+        # BM25 length normalization per document, fixed once the index is built
+        self.norm = K1 * (1 - B + B * doc_lengths / max(self.avg_length, 1e-9))
+        # The dataset version the postings were built from (see dataset_store.dataset_version)
+        self.version = version
+
+    @classmethod
+    def build(cls, chunks):
+        """Index documents streamed as DataFrame chunks (rows numbered in order)"""
+        vocabulary = {}
+        term_ids, doc_ids, freqs, lengths = [], [], [], []
+        row = 0
+        for chunk in chunks:
+            for text in document_texts(chunk):
+                tokens = tokenize(text)
+                lengths.append(len(tokens))
+                counts = {}
+                for token in tokens:
+                    counts[token] = counts.get(token, 0) + 1
+                for token, count in counts.items():
+                    term_ids.append(vocabulary.setdefault(token, len(vocabulary)))
+                    doc_ids.append(row)
+                    freqs.append(count)
+                row += 1
+
+        # Renumber terms alphabetically, then group postings by term
+        terms = np.array(sorted(vocabulary), dtype=str)
+        rank = np.empty(len(vocabulary), dtype=np.int64)
+        rank[[vocabulary[term] for term in terms]] = np.arange(len(terms))
+        term_ids = rank[np.array(term_ids, dtype=np.int64)]
+        order = np.argsort(term_ids, kind='stable')
+        offsets = np.searchsorted(term_ids[order], np.arange(len(terms) + 1)).astype(np.int64)
+        return cls(terms, offsets,
+                   np.array(doc_ids, dtype=np.int32)[order],
+                   np.array(freqs, dtype=np.int32)[order],
+                   np.array(lengths, dtype=np.int32))
+
+    def save(self, path):
+        tmp_path = Path(f'{path}.tmp.npz')
+        np.savez(tmp_path, terms=self.terms, offsets=self.offsets, docs=self.docs,
+                 freqs=self.freqs, doc_lengths=self.doc_lengths, version=self.version or '')
+        tmp_path.replace(path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            version = str(data['version']) if 'version' in data.files else ''
+            return cls(data['terms'], data['offsets'], data['docs'], data['freqs'], data['doc_lengths'],
+                       version or None)
+
+    def postings(self, term):
+        position = np.searchsorted(self.terms, term)
+        if position >= len(self.terms) or self.terms[position] != term:
+            return None, None
+        start, end = self.offsets[position], self.offsets[position + 1]
+        return self.docs[start:end], self.freqs[start:end]
+
+    def scores(self, query):
+        """Dense BM25 score per row for a query string"""
+        scores = np.zeros(self.rows, dtype=np.float32)
+        for term in set(tokenize(query)):
+            docs, freqs = self.postings(term)
+            if docs is None:
+                continue
+            idf = np.log(1 + (self.rows - len(docs) + 0.5) / (len(docs) + 0.5))
+            scores[docs] += idf * freqs * (K1 + 1) / (freqs + self.norm[docs])
+        return scores
+
+    def search(self, query, allowed=None, limit=MAX_RESULTS):
+        """Row positions matching `query`, best first; `allowed` is a boolean row mask"""
+        scores = self.scores(query)
+        if allowed is not None:
+            scores[~allowed] = 0
+        matches = np.flatnonzero(scores > 0)
+        if len(matches) > limit:
+            matches = matches[np.argpartition(-scores[matches], limit - 1)[:limit]]
+        return matches[np.argsort(-scores[matches], kind='stable')]
+
+
+def build_index(dataset_path, chunksize=50000, version=None):
+    """
+    Build and save the search index for a merged dataset; returns its path.
+    It is tagged with `version`, by default the dataset's current one.
+    """
+    started = time.perf_counter()
+    chunks = dataset_store.iter_dataset_chunks(dataset_path, columns=SEARCH_COLUMNS, chunksize=chunksize)
+    index = SearchIndex.build(chunks)
+    index.version = version or dataset_store.dataset_version(dataset_path)
+    path = index_path_for(dataset_path)
+    index.save(path)
+    print(f"✓ Search index saved: {path} ({len(index.terms):,} terms, {index.rows:,} documents, "
+          f"{time.perf_counter() - started:.2f}s)")
+    return path
+
+
+def load_index(dataset_path, version=None):
+    """
+    The saved index for a dataset version (the current one by default), or
+    None if missing or built from another version: an edit that keeps the
+    row count still makes the index stale
+    """
+    path = index_path_for(dataset_path)
+    if not path.exists():
+        return None
+    index = SearchIndex.load(path)
+    if index.version is None or index.version != (version or dataset_store.dataset_version(dataset_path)):
+        return None
+    return index
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or query the full-text search index")
+    parser.add_argument('dataset', help="Merged dataset (CSV or Parquet)")
+    parser.add_argument('query', nargs='?', help="Search instead of building")
+    parser.add_argument('--limit', type=int, default=10)
+    args = parser.parse_args(argv)
+
+    if not args.query:
+        build_index(args.dataset)
+        return 0
+
+    index = load_index(args.dataset)
+    if index is None:
+        print("✗ No search index for this dataset version, build it first")
+        return 1
+    started = time.perf_counter()
+    rows = index.search(args.query, limit=args.limit)
+    elapsed = (time.perf_counter() - started) * 1000
+    names = dataset_store.load_dataset(args.dataset, columns=['opportunity_id'] + record_store.NAME_COLUMNS)
+    name_col = record_store.name_column(names)
+    for row in rows:
+        name = names[name_col].iloc[row] if name_col else ''
+        print(f"  {names['opportunity_id'].iloc[row]}: {name}")
+    print(f"{len(rows)} result(s) in {elapsed:.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())